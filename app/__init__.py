@@ -45,8 +45,13 @@ def create_app(config_name: str = "development") -> Flask:
     except OSError:
         pass
 
+    # Per-role pool sizes and the read-only bind for reports/list pages
+    from .db_routing import configure_read_bind, init_read_bind
+    configure_read_bind(app)
+
     # Initialize extensions
     db.init_app(app)
+    init_read_bind(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -56,17 +61,46 @@ def create_app(config_name: str = "development") -> Flask:
     # Enable CSRF protection
     csrf.init_app(app)
 
-    # Flask-Login user loader
+    # Flask-Login user loader: cached identity snapshots, not User rows
     @login_manager.user_loader
     def load_user(user_id):
-        from app.models import User
+        from .user_cache import user_cache
         try:
-            return User.query.get(int(user_id))
+            return user_cache.get(int(user_id))
         except Exception:
             return None
 
-    # SQLite PRAGMA configuration via SQLAlchemy event hooks
-    _configure_sqlite_pragmas(app)
+    # SQLite PRAGMA configuration (preset + overrides) via SQLAlchemy event hooks
+    from .sqlite_pragmas import init_sqlite_pragmas
+    init_sqlite_pragmas(app)
+
+    # Serialized (BEGIN IMMEDIATE / FOR UPDATE) write transactions for circulation
+    from .transactions import init_write_transactions
+    init_write_transactions(app)
+
+    # Per-request SQL statement counting (budgets asserted when enabled)
+    from .query_counter import init_query_counter
+    init_query_counter(app)
+
+    # Opt-in SQL timing: Server-Timing header, per-request log line, N+1 and slow queries
+    from .sql_instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+
+    # Report result cache, invalidated when a commit writes report tables
+    from .reports.cache import init_report_cache
+    init_report_cache(app)
+
+    # library_stats counters: triggers on SQLite, session hooks elsewhere
+    from .library_stats import init_library_stats
+    init_library_stats(app)
+
+    # Token-bucket rate limits for @rate_limit views
+    from .rate_limit import init_rate_limit
+    init_rate_limit(app)
+
+    # current_user identity cache, invalidated when a commit writes the user
+    from .user_cache import init_user_cache
+    init_user_cache(app)
 
     # Register blueprints
     app.register_blueprint(main_bp)
@@ -93,23 +127,6 @@ def create_app(config_name: str = "development") -> Flask:
     return app
 
 
-def _configure_sqlite_pragmas(app: Flask) -> None:
-    """Configure SQLite-specific PRAGMAs for performance and integrity."""
-    from sqlalchemy import event
-    from sqlalchemy.engine import Engine
-    import sqlite3
-
-    @event.listens_for(Engine, "connect")
-    def set_sqlite_pragma(dbapi_connection, connection_record):
-        # Only apply to SQLite connections
-        if isinstance(dbapi_connection, sqlite3.Connection):  # pragma: no cover
-            cursor = dbapi_connection.cursor()
-            cursor.execute("PRAGMA journal_mode=WAL;")
-            cursor.execute("PRAGMA foreign_keys=ON;")
-            cursor.execute("PRAGMA synchronous=NORMAL;")
-            cursor.close()
-
-
 def register_error_handlers(app: Flask) -> None:
     @app.errorhandler(CSRFError)
     def handle_csrf_error(error):
@@ -140,7 +157,7 @@ def register_error_handlers(app: Flask) -> None:
 
     @app.errorhandler(429)
     def too_many_requests(error):
-        return render_template("errors/429.html"), 429
+        return render_template("errors/429.html"), 429, error.get_headers()
 
     # Generic exception handler in production only
     if not app.config.get('DEBUG', False):
@@ -160,7 +177,7 @@ def register_error_handlers(app: Flask) -> None:
                     if code == 404:
                         return render_template("errors/404.html"), 404
                     if code == 429:
-                        return render_template("errors/429.html"), 429
+                        return render_template("errors/429.html"), 429, error.get_headers()
                     return render_template("errors/500.html"), code
                 # Log and return 500 for non-HTTP exceptions
                 app.logger.error("Unhandled exception: %s", error, exc_info=True)
@@ -328,6 +345,7 @@ def register_cli_commands(app: Flask) -> None:
                                     updated += 1
                         except Exception:
                             pass
+                    Book.reconcile_active_loan_counts()
                     db.session.commit()
                     click.echo(f"Created {len(sample)} loans with varied fine statuses for testing (updated {updated})")
         if created:
@@ -335,6 +353,204 @@ def register_cli_commands(app: Flask) -> None:
         click.echo("Seed complete. Default credentials (change in production):\n"
                    "  admin / admin123\n  librarian / librarian123\n  member / member123")
 
+    @app.cli.command("reconcile-availability")
+    def reconcile_availability():
+        """Recompute Book.active_loan_count from the loans table and fix drift."""
+        from app.models import Book
+        with app.app_context():
+            fixed = Book.reconcile_active_loan_counts()
+            db.session.commit()
+        click.echo(f"Reconciled availability counters ({fixed} book(s) corrected).")
+
+    @app.cli.command("reconcile-stats")
+    def reconcile_stats():
+        """Recompute the library_stats dashboard counters from the live tables."""
+        from app.library_stats import reconcile_library_stats
+        with app.app_context():
+            drift = reconcile_library_stats()
+        for field, (stored, actual) in drift.items():
+            click.echo(f"{field}: {stored} -> {actual}")
+        click.echo(f"Reconciled library stats ({len(drift)} counter(s) corrected).")
+
+    @app.cli.command("accrue-fines")
+    @click.option("--as-of", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+                  help="Accrue as if today were this date (YYYY-MM-DD).")
+    def accrue_fines_cmd(as_of):
+        """Recompute fines on all overdue borrowed loans with one set-based UPDATE."""
+        from app.circulation.fines import accrue_fines
+        with app.app_context():
+            result = accrue_fines(as_of.date() if as_of else None)
+        click.echo(f"Accrued fines as of {result.as_of}: {result.rows} loan(s) updated in {result.elapsed:.3f}s.")
+
+    @app.cli.command("stress-checkout")
+    @click.option("--threads", default=8, show_default=True, help="Concurrent borrowers per round.")
+    @click.option("--copies", default=2, show_default=True, help="Copies of the contested book.")
+    @click.option("--rounds", default=5, show_default=True)
+    def stress_checkout(threads, copies, rounds):
+        """Race concurrent checkouts for the last copies and verify none is over-issued.
+
+        Creates and then deletes its own book/member rows in the configured database.
+        """
+        from app.circulation.stress import run_checkout_stress
+        from app.transactions import write_metrics
+        try:
+            results = run_checkout_stress(app, threads=threads, copies=copies, rounds=rounds)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        for res in results:
+            status = "ok" if res["passed"] else "FAILED"
+            click.echo(
+                f"round {res['round']}: issued {res['issued']}/{copies}, refused {res['refused']}, "
+                f"returned {res['returned']}, conflicts {res['conflicts']}, "
+                f"statements per checkout {res['checkout_statements']} ... {status}"
+            )
+            for err in res["errors"]:
+                click.echo(f"  error: {err}")
+        metrics = write_metrics.snapshot()
+        click.echo(
+            f"transactions {metrics['transactions']}, retries {metrics['retries']}, failures {metrics['failures']}, "
+            f"lock wait total {metrics['lock_wait_total_ms']:.1f} ms (max {metrics['lock_wait_max_ms']:.1f} ms)"
+        )
+        if not all(res["passed"] for res in results):
+            raise click.ClickException("Over-issue, counter drift or extra checkout statements detected.")
+
+    @app.cli.command("bench-login")
+    @click.option("--threads", default=8, show_default=True, help="Concurrent signing-in clients.")
+    @click.option("--logins", default=64, show_default=True, help="Total sign-ins.")
+    def bench_login(threads, logins):
+        """Measure login throughput and the latency of other requests meanwhile.
+
+        Creates and then deletes its own users in the configured database.
+        """
+        from app.auth.bench import run_login_benchmark
+        with app.app_context():
+            from app.passwords import configured_method
+            method = configured_method()
+        workers = app.config.get("PASSWORD_HASH_WORKERS", 2)
+        pool = f"{workers} {app.config.get('PASSWORD_HASH_EXECUTOR', 'thread')} worker(s)" if workers > 0 else "request thread"
+        click.echo(f"Hashing {method} on {pool}; {threads} client(s), {logins} login(s).")
+        res = run_login_benchmark(app, threads=threads, logins=logins)
+        click.echo(
+            f"{res['logins']} login(s) in {res['seconds']}s ({res['per_second']}/s), failed {res['failed']}; "
+            f"login p50 {res['login_p50_ms']} ms, p95 {res['login_p95_ms']} ms"
+        )
+        click.echo(
+            f"other requests meanwhile: {res['probe_requests']}, p50 {res['probe_p50_ms']} ms, p95 {res['probe_p95_ms']} ms"
+        )
+
+    @app.cli.command("bench-rate-limit")
+    @click.option("--checks", default=100000, show_default=True)
+    @click.option("--clients", default=1000, show_default=True, help="Distinct client keys to spread checks over.")
+    def bench_rate_limit(checks, clients):
+        """Time one rate-limit check against the configured store."""
+        import time
+        from app.rate_limit import limiter
+        keys = [f"bench|ip:10.0.{i // 256}.{i % 256}" for i in range(clients)]
+        started = time.perf_counter()
+        for i in range(checks):
+            limiter.hit(keys[i % clients], 1_000_000, 1_000_000.0)
+        elapsed = time.perf_counter() - started
+        click.echo(f"{checks} check(s) on the {limiter.storage_name} store: {elapsed / checks * 1e6:.1f} µs per check.")
+        limiter.store.clear()
+
+    @app.cli.command("sqlite-pragmas")
+    def sqlite_pragmas_cmd():
+        """Show the SQLite pragmas in effect on a pooled connection."""
+        from app.extensions import db
+        from app.sqlite_pragmas import effective_pragmas
+        with app.app_context():
+            if db.engine.dialect.name != "sqlite":
+                raise click.ClickException("The configured database is not SQLite.")
+            raw = db.engine.raw_connection()
+            try:
+                values = effective_pragmas(raw.driver_connection)
+            finally:
+                raw.close()
+        click.echo(f"preset: {app.config.get('SQLITE_PRAGMA_PRESET')}")
+        for name, value in values.items():
+            click.echo(f"{name}: {value}")
+
+    @app.cli.command("bench-sqlite-presets")
+    @click.option("--preset", "presets", multiple=True, help="Preset to run (repeatable; default all).")
+    @click.option("--repeat", default=5, show_default=True, help="Warm runs per query (median reported).")
+    @click.option("--queries", "show_queries", is_flag=True, help="Print per-query times.")
+    def bench_sqlite_presets(presets, repeat, show_queries):
+        """Time catalog search and report queries under each SQLite pragma preset."""
+        from app.extensions import db
+        from app.sqlite_pragmas import PRESETS, benchmark_presets, benchmark_queries
+        unknown = [p for p in presets if p not in PRESETS]
+        if unknown:
+            raise click.ClickException(f"Unknown preset(s): {', '.join(unknown)} (use {', '.join(PRESETS)}).")
+        with app.app_context():
+            engine = db.engine
+            if engine.dialect.name != "sqlite" or not engine.url.database or engine.url.database == ":memory:":
+                raise click.ClickException("Needs a file-backed SQLite database.")
+            queries = benchmark_queries(engine.dialect)
+            path = engine.url.database
+        results = benchmark_presets(path, queries, presets or None, repeat=repeat,
+                                    busy_timeout_ms=int(app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)))
+        for res in results:
+            click.echo(f"{res['preset']:<12} first run {res['first_total_ms']:>9.1f} ms   warm {res['warm_total_ms']:>9.1f} ms")
+            if show_queries:
+                for row in res["queries"]:
+                    click.echo(f"  {row['label']:<40} {row['first_ms']:>9.2f} {row['warm_ms']:>9.2f}")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_cmd():
+        """Create (if needed) and repopulate the FTS5 catalog search index."""
+        from app.catalog.search import rebuild_search_index
+        with app.app_context():
+            ok = rebuild_search_index()
+        if ok:
+            click.echo("Catalog search index rebuilt.")
+        else:
+            click.echo("FTS5 is not available on this database; catalog search uses ILIKE.")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_cmd():
+        """Recompute the daily circulation rollup tables from the loans table."""
+        from app.reports.rollups import rebuild_rollups, rollups_enabled
+        with app.app_context():
+            counts = rebuild_rollups()
+            enabled = rollups_enabled()
+        click.echo(", ".join(f"{table}: {n} row(s)" for table, n in counts.items()))
+        if not enabled:
+            click.echo("Rollup triggers are SQLite-only; reports read the loans table directly on this database.")
+
+    @app.cli.command("clear-report-cache")
+    def clear_report_cache_cmd():
+        """Drop every cached report result (shared sqlite backend or this process)."""
+        from app.reports.cache import report_cache
+        report_cache.clear()
+        click.echo(f"Report cache cleared ({report_cache.backend_name} backend).")
+
+    @app.cli.command("explain-hot-queries")
+    @click.option("--no-compare", is_flag=True, help="Only show plans for the current schema.")
+    @click.option("--sql", "show_sql", is_flag=True, help="Print the SQL for each query.")
+    def explain_hot_queries_cmd(no_compare, show_sql):
+        """Print EXPLAIN QUERY PLAN for the hot loan queries, before/after the indexes."""
+        from app.explain import explain_hot_queries, is_full_scan
+        with app.app_context():
+            try:
+                results = explain_hot_queries(compare=not no_compare)
+            except RuntimeError as exc:
+                raise click.ClickException(str(exc))
+        remaining = 0
+        for res in results:
+            click.echo(f"\n== {res['label']}")
+            if show_sql:
+                click.echo(f"   {res['sql']}")
+            for stage in ('before', 'after'):
+                plan = res[stage]
+                if plan is None:
+                    continue
+                for detail in plan:
+                    flag = "  <-- full scan" if is_full_scan(detail) else ""
+                    click.echo(f"   {stage:>6}: {detail}{flag}")
+            if any(is_full_scan(d) for d in res['after']):
+                remaining += 1
+        click.echo(f"\n{len(results)} queries checked, {remaining} still using a full table scan.")
+
     @app.cli.command("reset-db")
     def reset_db():
         """Drop and recreate the database (DANGEROUS)."""
@@ -0,0 +1,105 @@
+"""Login throughput benchmark used by ``flask bench-login``.
+
+Creates throwaway users, then has ``threads`` clients post to ``auth.login``
+at once until ``logins`` sign-ins have been made. Meanwhile one more client
+keeps fetching the login page, which needs no hashing, to show what a burst
+of logins does to unrelated requests. Run it once with
+``PASSWORD_HASH_WORKERS=0`` (hashing on the request thread) and once with a
+pool to compare. The users are deleted afterwards.
+"""
+import threading
+import time
+import uuid
+
+from flask import Flask
+
+from app.extensions import db
+from app.models import User, UserRole
+
+PASSWORD = 'bench-password-123'
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def _create_users(count: int) -> tuple[list[str], list[int]]:
+    tag = uuid.uuid4().hex[:8]
+    users = []
+    for i in range(count):
+        user = User(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.invalid',
+                    full_name=f'Bench {tag} {i}', role=UserRole.MEMBER)
+        user.set_password(PASSWORD)
+        users.append(user)
+    db.session.add_all(users)
+    db.session.commit()
+    return [u.username for u in users], [u.id for u in users]
+
+
+def run_login_benchmark(app: Flask, threads: int = 8, logins: int = 64) -> dict:
+    """Sign in ``logins`` times from ``threads`` clients; returns timings in ms."""
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['RATE_LIMIT_ENABLED'] = False
+    with app.app_context():
+        usernames, user_ids = _create_users(threads)
+    remaining = [logins]
+    lock = threading.Lock()
+    latencies, probes, failures = [], [], []
+    done = threading.Event()
+    barrier = threading.Barrier(threads + 1)
+
+    def sign_in(username):
+        client = app.test_client()
+        barrier.wait()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            response = client.post('/auth/login', data={'username': username, 'password': PASSWORD})
+            elapsed = (time.perf_counter() - started) * 1000
+            client.get('/auth/logout')
+            with lock:
+                (latencies if response.status_code == 302 else failures).append(elapsed)
+
+    def probe():
+        client = app.test_client()
+        barrier.wait()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/auth/login')
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    try:
+        workers = [threading.Thread(target=sign_in, args=(u,)) for u in usernames]
+        prober = threading.Thread(target=probe)
+        prober.start()
+        for t in workers:
+            t.start()
+        started = time.perf_counter()
+        for t in workers:
+            t.join()
+        wall = time.perf_counter() - started
+        done.set()
+        prober.join()
+    finally:
+        with app.app_context():
+            User.query.filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+            db.session.commit()
+
+    return {
+        'logins': len(latencies),
+        'failed': len(failures),
+        'seconds': round(wall, 3),
+        'per_second': round(len(latencies) / wall, 1) if wall else 0.0,
+        'login_p50_ms': round(_percentile(latencies, 50), 1),
+        'login_p95_ms': round(_percentile(latencies, 95), 1),
+        'probe_requests': len(probes),
+        'probe_p50_ms': round(_percentile(probes, 50), 1),
+        'probe_p95_ms': round(_percentile(probes, 95), 1),
+    }
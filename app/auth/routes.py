@@ -6,7 +6,12 @@ from flask_login import login_user, logout_user, current_user, login_required
 from app.auth import bp
 from app.extensions import db
 from app.models import User, UserRole
+from app.passwords import PasswordHasherBusy
+from app.rate_limit import rate_limit
+from app.user_cache import user_cache
+from .decorators import admin_required
 from .forms import LoginForm, RegisterForm, ProfileForm, ChangePasswordForm
+from .services import authenticate
 
 
 def _safe_redirect_target(next_url: str, default: str):
@@ -16,14 +21,19 @@ def _safe_redirect_target(next_url: str, default: str):
 
 
 @bp.route("/login", methods=["GET", "POST"])
+@rate_limit("10/minute", by="ip", methods=["POST"])
 def login():
     if current_user.is_authenticated:
         return redirect(url_for("main.index"))
 
     form = LoginForm()
     if form.validate_on_submit():
-        user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data) and user.is_active:
+        try:
+            user = authenticate(form.username.data, form.password.data)
+        except PasswordHasherBusy:
+            flash("Sign-in is busy right now. Please try again in a moment.", "warning")
+            return render_template("auth/login.html", form=form), 503
+        if user:
             login_user(user, remember=form.remember_me.data)
             flash("Signed in successfully.", "success")
             next_url = request.args.get("next")
@@ -53,7 +63,11 @@ def register():
             full_name=form.full_name.data,
             role=UserRole.MEMBER,
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except PasswordHasherBusy:
+            flash("Registration is busy right now. Please try again in a moment.", "warning")
+            return render_template("auth/register.html", form=form), 503
         db.session.add(user)
         db.session.commit()
         flash("Registration successful. You can now sign in.", "success")
@@ -64,30 +78,45 @@ def register():
 @bp.route("/profile", methods=["GET", "POST"])
 @login_required
 def profile():
+    # current_user is a cached snapshot; edits go through the row
+    user = db.session.get(User, current_user.id)
     form = ProfileForm()
     if form.validate_on_submit():
-        current_user.full_name = form.full_name.data
-        current_user.email = form.email.data
+        user.full_name = form.full_name.data
+        user.email = form.email.data
         db.session.commit()
         flash("Profile updated.", "success")
         return redirect(url_for("auth.profile"))
 
     if request.method == "GET":
-        form.full_name.data = current_user.full_name
-        form.email.data = current_user.email
-    return render_template("auth/profile.html", form=form, user=current_user)
+        form.full_name.data = user.full_name
+        form.email.data = user.email
+    return render_template("auth/profile.html", form=form, user=user)
 
 
 @bp.route("/change-password", methods=["GET", "POST"])
 @login_required
 def change_password():
+    user = db.session.get(User, current_user.id)
     form = ChangePasswordForm()
     if form.validate_on_submit():
-        if not current_user.check_password(form.current_password.data):
-            flash("Current password is incorrect.", "danger")
-        else:
-            current_user.set_password(form.new_password.data)
-            db.session.commit()
-            flash("Password changed successfully.", "success")
-            return redirect(url_for("auth.profile"))
+        try:
+            if not user.check_password(form.current_password.data):
+                flash("Current password is incorrect.", "danger")
+            else:
+                user.set_password(form.new_password.data)
+                db.session.commit()
+                flash("Password changed successfully.", "success")
+                return redirect(url_for("auth.profile"))
+        except PasswordHasherBusy:
+            flash("Changing passwords is busy right now. Please try again in a moment.", "warning")
+            return render_template("auth/change_password.html", form=form), 503
     return render_template("auth/change_password.html", form=form)
+
+
+@bp.route("/api/user-cache-stats")
+@login_required
+@admin_required
+def user_cache_stats():
+    """Signed-in user cache hit/miss counters for this worker process."""
+    return user_cache.snapshot()
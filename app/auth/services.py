@@ -0,0 +1,19 @@
+"""Sign-in logic shared by the login view and ``flask bench-login``."""
+from app.extensions import db
+from app.models import User
+
+
+def authenticate(username: str, password: str) -> User | None:
+    """The active user with these credentials, or None.
+
+    A hash made with other settings than the configured method and cost is
+    replaced while the plain password is at hand. May raise
+    ``PasswordHasherBusy``.
+    """
+    user = User.query.filter_by(username=username).first()
+    if user is None or not user.check_password(password) or not user.is_active:
+        return None
+    if user.password_needs_rehash():
+        user.set_password(password)
+        db.session.commit()
+    return user
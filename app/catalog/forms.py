@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, IntegerField, SelectField, SubmitField
+from wtforms import StringField, TextAreaField, IntegerField, SelectField, SubmitField, BooleanField
 from wtforms.validators import DataRequired, Optional, Length, NumberRange, ValidationError
 from app.models import Book, Category
 
@@ -48,4 +48,5 @@ class SearchForm(FlaskForm):
         choices=[('all', 'All Books'), ('available', 'Available Only'), ('unavailable', 'Unavailable')],
         default='all',
     )
+    highlight = BooleanField('Show matches')
     submit = SubmitField('Search')
@@ -1,47 +1,58 @@
 from flask import render_template, redirect, url_for, flash, request
 from flask_login import login_required
-from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
 
 from app.extensions import db
-from app.models import Book, Category, Loan, LoanStatus
+from app.models import Book, Category
 from app.auth.decorators import librarian_required
+from app.db_routing import read_only
+from app.pagination import paginate_query
+from app.conditional import conditional
+from app.query_counter import query_budget
+from app.rate_limit import rate_limit
 from . import bp
 from .forms import BookForm, CategoryForm, SearchForm
+from .search import apply_search, highlight_snippets
 
 
 # ===== Book Routes =====
 @bp.route('/books')
 @login_required
+@rate_limit('120/minute')
+@query_budget(5)
+@read_only
 def books():
-    page = request.args.get('page', 1, type=int)
     q = request.args.get('query', '', type=str)
     category_id = request.args.get('category_id', 0, type=int)
     availability = request.args.get('availability', 'all', type=str)
+    highlight = request.args.get('highlight', '', type=str) in ('y', '1', 'true', 'on')
 
-    base_query = Book.query
+    base_query = Book.query.options(joinedload(Book.category))
+    ranked = False
     if q:
-        like = f"%{q}%"
-        base_query = base_query.filter(or_(Book.title.ilike(like), Book.author.ilike(like), Book.isbn.ilike(like)))
+        base_query, ranked = apply_search(base_query, q)
     if category_id and category_id != 0:
         base_query = base_query.filter(Book.category_id == category_id)
     if availability == 'available':
-        base_query = base_query.filter(Book.quantity > 0)
+        base_query = base_query.filter(Book.available_quantity > 0)
     elif availability == 'unavailable':
-        base_query = base_query.filter(Book.quantity == 0)
+        base_query = base_query.filter(Book.available_quantity <= 0)
 
-    base_query = base_query.order_by(Book.title.asc())
-    pagination = base_query.paginate(page=page, per_page=20, error_out=False)
+    # Relevance-ranked searches keep numbered pages; rank is not a seekable key
+    pagination = paginate_query(base_query, [Book.title.asc(), Book.id.asc()], per_page=20, allow_keyset=not ranked)
+    snippets = highlight_snippets([b.id for b in pagination.items], q) if (q and ranked and highlight) else {}
 
     # Populate search form
     form = SearchForm(request.args)
     categories = Category.query.order_by(Category.name.asc()).all()
     form.category_id.choices = [(0, 'All Categories')] + [(c.id, c.name) for c in categories]
 
-    return render_template('catalog/books.html', pagination=pagination, form=form, query=q, category_id=category_id, availability=availability)
+    return render_template('catalog/books.html', pagination=pagination, form=form, query=q, category_id=category_id, availability=availability, highlight=highlight, snippets=snippets)
 
 
 @bp.route('/books/<int:book_id>')
 @login_required
+@conditional('books', 'categories')
 def book_detail(book_id):
     book = Book.query.get_or_404(book_id)
     return render_template('catalog/book_detail.html', book=book)
@@ -117,11 +128,7 @@ def delete_book(book_id):
     book = Book.query.get_or_404(book_id)
     title = book.title
     # Prevent deleting books with active loans
-    active_loans = 0
-    try:
-        active_loans = book.loans.filter_by(status=LoanStatus.BORROWED).count()
-    except Exception:
-        active_loans = 0
+    active_loans = book.active_loan_count or 0
     if active_loans > 0:
         flash(f'Cannot delete book "{title}" because it has {active_loans} active loan(s). Please return all copies first.', 'warning')
         return redirect(url_for('catalog.book_detail', book_id=book.id))
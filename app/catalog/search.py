@@ -0,0 +1,131 @@
+"""Catalog full-text search backed by SQLite FTS5, with an ILIKE fallback."""
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import event, text, or_
+
+from app.extensions import db
+from app.models import Book
+
+FTS_TABLE = 'books_fts'
+FTS_COLUMNS = ('title', 'author', 'isbn', 'publisher', 'description')
+
+# Control characters cannot appear in catalog text, so they are safe markers
+# for snippet() output until it has been HTML-escaped.
+_HL_OPEN, _HL_CLOSE = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Per-engine cache of whether the FTS table exists and is usable.
+_fts_enabled: dict = {}
+
+
+def _cols(prefix: str = '') -> str:
+    return ', '.join(f'{prefix}{c}' for c in FTS_COLUMNS)
+
+
+def _ddl_statements() -> list[str]:
+    cols = _cols()
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{cols}, content='books', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON books BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {_cols('new.')}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON books BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {_cols('old.')}); END",
+        # Only re-index when a searchable column changes, so counter updates on
+        # borrow/return do not churn the index.
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {cols} ON books BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {_cols('old.')}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {_cols('new.')}); END",
+    ]
+
+
+def create_search_index(connection) -> bool:
+    """Create the FTS5 table and sync triggers. Returns False if unsupported."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        for stmt in _ddl_statements():
+            connection.exec_driver_sql(stmt)
+    except Exception:
+        # SQLite builds without FTS5 raise "no such module: fts5"
+        return False
+    _fts_enabled.pop(str(connection.engine.url), None)
+    return True
+
+
+@event.listens_for(Book.__table__, 'after_create')
+def _create_search_index_after_books(target, connection, **kw):
+    create_search_index(connection)
+
+
+def rebuild_search_index() -> bool:
+    """Create the index if missing and repopulate it from the books table."""
+    with db.engine.begin() as conn:
+        if not create_search_index(conn):
+            return False
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def fts_enabled() -> bool:
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _fts_enabled:
+        enabled = False
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as conn:
+                enabled = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': FTS_TABLE},
+                ).first() is not None
+        _fts_enabled[key] = enabled
+    return _fts_enabled[key]
+
+
+def build_match_query(q: str) -> str | None:
+    """Turn free text into an FTS5 prefix query: every term must match."""
+    tokens = _TOKEN_RE.findall(q or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{tok}"*' for tok in tokens)
+
+
+def apply_search(query, q: str):
+    """Filter a Book query by free text. Returns (query, ranked)."""
+    match = build_match_query(q) if fts_enabled() else None
+    if match is None:
+        like = f"%{q}%"
+        return query.filter(or_(Book.title.ilike(like), Book.author.ilike(like), Book.isbn.ilike(like))), False
+    hits = (
+        db.select(
+            db.literal_column('rowid').label('book_id'),
+            db.literal_column(f'bm25({FTS_TABLE}, 10.0, 5.0, 5.0, 1.0, 0.5)').label('rank'),
+        )
+        .select_from(db.table(FTS_TABLE))
+        .where(text(f'{FTS_TABLE} MATCH :fts_query').bindparams(fts_query=match))
+        .subquery()
+    )
+    # bm25() is lower-is-better
+    return query.join(hits, hits.c.book_id == Book.id).order_by(hits.c.rank.asc()), True
+
+
+def highlight_snippets(book_ids, q: str, tokens: int = 16) -> dict[int, Markup]:
+    """Return highlighted match snippets for the given books, keyed by id."""
+    match = build_match_query(q) if fts_enabled() else None
+    if match is None or not book_ids:
+        return {}
+    stmt = text(
+        f"SELECT rowid, snippet({FTS_TABLE}, -1, :open, :close, '…', :tokens) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query AND rowid IN :ids"
+    ).bindparams(db.bindparam('ids', expanding=True))
+    rows = db.session.execute(
+        stmt,
+        {'open': _HL_OPEN, 'close': _HL_CLOSE, 'tokens': tokens, 'fts_query': match, 'ids': list(book_ids)},
+    )
+    snippets = {}
+    for book_id, raw in rows:
+        safe = str(escape(raw or ''))
+        snippets[book_id] = Markup(safe.replace(_HL_OPEN, '<mark>').replace(_HL_CLOSE, '</mark>'))
+    return snippets
@@ -1,44 +1,67 @@
 from datetime import date, timedelta
 
+from flask import current_app
 from flask_wtf import FlaskForm
-from wtforms import SelectField, DateField, TextAreaField, SubmitField, HiddenField, StringField, DecimalField
+from wtforms import SelectField, DateField, TextAreaField, SubmitField, HiddenField, StringField, DecimalField, IntegerField
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, Optional, ValidationError, NumberRange
 from decimal import Decimal
 
-from app.models import Book, Member, MemberStatus, Loan, LoanStatus
+from app.models import Loan, LoanStatus
+from .services import CheckoutContext, load_checkout_context, load_loan_for_return, parse_book_identifiers
+
+
+def _check_due_date(due_date):
+    if due_date.data:
+        if due_date.data < date.today():
+            raise ValidationError('Due date cannot be in the past.')
+        if due_date.data > date.today() + timedelta(days=90):
+            raise ValidationError('Due date cannot be more than 90 days in the future.')
+
+
+def _check_batch_size(items):
+    limit = current_app.config.get('BULK_MAX_ITEMS', 50)
+    if len(parse_book_identifiers(items.data)) > limit:
+        raise ValidationError(f'A batch can contain at most {limit} books.')
 
 
 class BorrowForm(FlaskForm):
-    member_id = SelectField('Member', coerce=int, validators=[DataRequired()])
-    book_id = SelectField('Book', coerce=int, validators=[DataRequired()])
+    # The ids are filled in by the typeahead pickers (see /circulation/lookup/*)
+    # and checked against the database in the validators below.
+    member_id = IntegerField('Member', widget=HiddenInput(), validators=[DataRequired(message='Select a member.')])
+    member_search = StringField('Member', validators=[Optional()])
+    book_id = IntegerField('Book', widget=HiddenInput(), validators=[DataRequired(message='Select a book.')])
+    book_search = StringField('Book', validators=[Optional()])
     due_date = DateField('Due Date (optional)', format='%Y-%m-%d', validators=[Optional()])
     notes = TextAreaField('Notes', validators=[Optional()])
     submit = SubmitField('Issue Book')
 
+    @property
+    def checkout_context(self) -> CheckoutContext:
+        """Member, book and eligibility, loaded once and shared by validators and the view."""
+        if getattr(self, '_checkout_context', None) is None:
+            self._checkout_context = load_checkout_context(self.member_id.data, self.book_id.data)
+        return self._checkout_context
+
     def validate_member_id(self, member_id):
-        member = Member.query.get(member_id.data)
-        if not member:
+        ctx = self.checkout_context
+        if not ctx.member:
             raise ValidationError('Invalid member selected.')
-        can_borrow, reason = member.can_borrow()
+        can_borrow, reason = ctx.member.can_borrow(summary=ctx.summary)
         if not can_borrow:
             raise ValidationError(reason or 'Member cannot borrow at this time.')
 
     def validate_book_id(self, book_id):
-        book = Book.query.get(book_id.data)
-        if not book:
+        ctx = self.checkout_context
+        if not ctx.book:
             raise ValidationError('Invalid book selected.')
-        if not book.is_available:
+        if not ctx.book.is_available:
             raise ValidationError('This book is currently unavailable.')
-        existing = Loan.query.filter_by(book_id=book_id.data, member_id=self.member_id.data, status=LoanStatus.BORROWED).first()
-        if existing:
+        if ctx.has_duplicate:
             raise ValidationError('This member already has an active loan for this book.')
 
     def validate_due_date(self, due_date):
-        if due_date.data:
-            if due_date.data < date.today():
-                raise ValidationError('Due date cannot be in the past.')
-            if due_date.data > date.today() + timedelta(days=90):
-                raise ValidationError('Due date cannot be more than 90 days in the future.')
+        _check_due_date(due_date)
 
 
 class ReturnForm(FlaskForm):
@@ -47,26 +70,60 @@ class ReturnForm(FlaskForm):
     notes = TextAreaField('Return Notes', validators=[Optional()])
     submit = SubmitField('Mark as Returned')
 
+    loan = None
+
     def validate_loan_id(self, loan_id):
-        loan = Loan.query.get(loan_id.data)
-        if not loan:
+        # Loaded with its book and member so the view needs no further reads
+        self.loan = load_loan_for_return(loan_id.data)
+        if not self.loan:
             raise ValidationError('Invalid loan selected.')
-        if loan.status != LoanStatus.BORROWED:
+        if self.loan.status != LoanStatus.BORROWED:
             raise ValidationError('This loan has already been returned.')
 
     def validate_return_date(self, return_date):
         if return_date.data:
-            loan = Loan.query.get(self.loan_id.data)
+            loan = self.loan
             if loan and return_date.data < loan.borrow_date:
                 raise ValidationError('Return date cannot be before borrow date.')
             if return_date.data > date.today():
                 raise ValidationError('Return date cannot be in the future.')
 
 
+class BulkCheckoutForm(FlaskForm):
+    member_id = IntegerField('Member', widget=HiddenInput(), validators=[DataRequired(message='Select a member.')])
+    member_search = StringField('Member', validators=[Optional()])
+    items = TextAreaField('Books', validators=[DataRequired(message='Scan or enter at least one book ID or ISBN.')])
+    due_date = DateField('Due Date (optional)', format='%Y-%m-%d', validators=[Optional()])
+    notes = TextAreaField('Notes', validators=[Optional()])
+    submit = SubmitField('Issue Books')
+
+    def validate_items(self, items):
+        _check_batch_size(items)
+
+    def validate_due_date(self, due_date):
+        _check_due_date(due_date)
+
+
+class BulkReturnForm(FlaskForm):
+    member_id = IntegerField('Member', widget=HiddenInput(), validators=[DataRequired(message='Select a member.')])
+    member_search = StringField('Member', validators=[Optional()])
+    items = TextAreaField('Books', validators=[DataRequired(message='Scan or enter at least one book ID or ISBN.')])
+    return_date = DateField('Return Date', format='%Y-%m-%d', validators=[Optional()], default=date.today)
+    submit = SubmitField('Return Books')
+
+    def validate_items(self, items):
+        _check_batch_size(items)
+
+    def validate_return_date(self, return_date):
+        if return_date.data and return_date.data > date.today():
+            raise ValidationError('Return date cannot be in the future.')
+
+
 class LoanSearchForm(FlaskForm):
     query = StringField('Search', validators=[Optional()])
     status = SelectField('Status', coerce=str, validators=[Optional()], default='all')
-    member_id = SelectField('Member', coerce=int, validators=[Optional()], default=0)
+    member_id = IntegerField('Member', widget=HiddenInput(), validators=[Optional()], default=0)
+    member_search = StringField('Member', validators=[Optional()])
     submit = SubmitField('Search')
 
 
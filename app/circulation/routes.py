@@ -3,25 +3,38 @@ from datetime import date
 from flask import render_template, redirect, url_for, flash, request, abort, current_app, render_template_string
 from flask_login import login_required
 from sqlalchemy import or_, func
+from sqlalchemy.orm import contains_eager, joinedload
 from decimal import Decimal
+from werkzeug.datastructures import MultiDict
 
 from app.extensions import db
 from app.auth.decorators import librarian_required
-from app.models import Book, Member, MemberStatus, Loan, LoanStatus
+from app.db_routing import read_only
+from app.pagination import paginate_query
+from app.query_counter import query_budget
+from app.transactions import write_transaction, WriteConflictError
+from app.models import Book, Member, Loan, LoanStatus
 from . import bp
-from .forms import BorrowForm, ReturnForm, LoanSearchForm, FinePaymentForm
+from .forms import BorrowForm, ReturnForm, LoanSearchForm, FinePaymentForm, BulkCheckoutForm, BulkReturnForm
+from .services import (
+    checkout, checkin, bulk_checkout, bulk_checkin, parse_book_identifiers,
+    book_label, member_label, lookup_books, lookup_members, clamp_lookup_limit,
+    CHECKOUT_STATEMENTS,
+)
 
 
 @bp.route('/loans')
 @login_required
 @librarian_required
+@query_budget(6)
+@read_only
 def loans():
-    page = request.args.get('page', 1, type=int)
     q = request.args.get('query', '', type=str)
     status = request.args.get('status', 'all', type=str)
     member_id = request.args.get('member_id', 0, type=int)
 
-    base_query = Loan.query.join(Book).join(Member)
+    # Populate loan.book / loan.member from the join the filters already need
+    base_query = Loan.query.join(Book).join(Member).options(contains_eager(Loan.book), contains_eager(Loan.member))
     if q:
         like = f"%{q}%"
         base_query = base_query.filter(or_(Book.title.ilike(like), Member.name.ilike(like)))
@@ -34,22 +47,42 @@ def loans():
     if member_id and member_id != 0:
         base_query = base_query.filter(Loan.member_id == member_id)
 
-    base_query = base_query.order_by(Loan.borrow_date.desc())
-    pagination = base_query.paginate(page=page, per_page=20, error_out=False)
+    pagination = paginate_query(base_query, [Loan.borrow_date.desc(), Loan.id.desc()], per_page=20)
 
     form = LoanSearchForm(request.args)
-    members = Member.query.filter_by(status=MemberStatus.ACTIVE).order_by(Member.name.asc()).all()
     form.status.choices = [
         ('all', 'All Loans'),
         ('borrowed', 'Active Loans'),
         ('returned', 'Returned'),
         ('overdue', 'Overdue'),
     ]
-    form.member_id.choices = [(0, 'All Members')] + [(m.id, f"{m.name} ({m.member_id})") for m in members]
+    if member_id and not form.member_search.data:
+        member = db.session.get(Member, member_id)
+        form.member_search.data = member_label(member) if member else ''
 
     return render_template('circulation/loans.html', pagination=pagination, form=form, query=q, status=status, member_id=member_id)
 
 
+@bp.route('/lookup/members')
+@login_required
+@librarian_required
+@query_budget(2)
+def lookup_members_json():
+    q = request.args.get('q', '', type=str)
+    limit = clamp_lookup_limit(request.args.get('limit'))
+    return {'results': lookup_members(q, limit=limit)}
+
+
+@bp.route('/lookup/books')
+@login_required
+@librarian_required
+@query_budget(3)
+def lookup_books_json():
+    q = request.args.get('q', '', type=str)
+    limit = clamp_lookup_limit(request.args.get('limit'))
+    return {'results': lookup_books(q, limit=limit)}
+
+
 @bp.route('/loans/<int:loan_id>')
 @login_required
 @librarian_required
@@ -62,42 +95,43 @@ def loan_detail(loan_id: int):
 @bp.route('/borrow', methods=['GET', 'POST'])
 @login_required
 @librarian_required
+# One more for Flask-Login's user lookup when the identity is not cached
+@query_budget(CHECKOUT_STATEMENTS + 1)
 def borrow():
     form = BorrowForm()
 
-    active_members = Member.query.filter_by(status=MemberStatus.ACTIVE).order_by(Member.name.asc()).all()
-    form.member_id.choices = [(m.id, f"{m.name} ({m.member_id})") for m in active_members]
-
-    books = Book.query.order_by(Book.title.asc()).all()
-    # Show all books but validation ensures availability
-    form.book_id.choices = [(b.id, f"{b.title} by {b.author}") for b in books]
-
-    if form.validate_on_submit():
-        member = Member.query.get(form.member_id.data)
-        book = Book.query.get(form.book_id.data)
-        borrow_date = date.today()
-        default_days = current_app.config.get('LOAN_PERIOD_DAYS', 14)
-        due_date = form.due_date.data or Loan.calculate_due_date(borrow_date, default_days)
-        loan = Loan(
-            book_id=book.id,
-            member_id=member.id,
-            borrow_date=borrow_date,
-            due_date=due_date,
-            status=LoanStatus.BORROWED,
-            notes=form.notes.data or None,
-        )
-        db.session.add(loan)
-        db.session.commit()
-        flash(f'Book "{book.title}" issued to {member.name}. Due date: {due_date.strftime("%b %d, %Y")}', 'success')
-        return redirect(url_for('circulation.loan_detail', loan_id=loan.id))
+    def issue():
+        # Runs inside the write transaction, so validation sees the same
+        # availability and eligibility the insert is based on.
+        form._checkout_context = None
+        if not form.validate_on_submit():
+            return None
+        ctx = form.checkout_context
+        loan = checkout(ctx.member, ctx.book, due_date=form.due_date.data, notes=form.notes.data)
+        if loan is None:
+            form.book_id.errors.append('This book is currently unavailable.')
+            return None
+        # Read display values now; commit expires the instances
+        return loan.id, ctx.book.title, ctx.member.name, loan.due_date
+
+    if request.method == 'POST':
+        try:
+            issued = write_transaction(issue)
+        except WriteConflictError as exc:
+            issued = None
+            flash(str(exc), 'danger')
+        if issued:
+            loan_id, book_title, member_name, due_date = issued
+            flash(f'Book "{book_title}" issued to {member_name}. Due date: {due_date.strftime("%b %d, %Y")}', 'success')
+            return redirect(url_for('circulation.loan_detail', loan_id=loan_id))
 
     # Optional: pre-select book if provided via query param
     pre_book_id = request.args.get('book_id', type=int)
     if request.method == 'GET' and pre_book_id:
-        try:
-            form.book_id.data = pre_book_id
-        except Exception:
-            pass
+        book = db.session.get(Book, pre_book_id)
+        if book:
+            form.book_id.data = book.id
+            form.book_search.data = book_label(book)
 
     return render_template('circulation/borrow_form.html', form=form, loan_period_days=current_app.config.get('LOAN_PERIOD_DAYS', 14))
 
@@ -105,9 +139,16 @@ def borrow():
 @bp.route('/return', methods=['GET', 'POST'])
 @login_required
 @librarian_required
+@query_budget(5)
 def return_book():
     if request.method == 'GET':
-        active_loans = Loan.query.filter_by(status=LoanStatus.BORROWED).order_by(Loan.due_date.asc()).all()
+        active_loans = (
+            Loan.query
+            .options(joinedload(Loan.book), joinedload(Loan.member))
+            .filter_by(status=LoanStatus.BORROWED)
+            .order_by(Loan.due_date.asc())
+            .all()
+        )
         return render_template('circulation/return_form.html', active_loans=active_loans, form=None, fine_rate=current_app.config.get('FINE_RATE_PER_DAY', 1.0))
 
     # POST: confirm and process
@@ -119,41 +160,105 @@ def return_book():
     form = ReturnForm()
     form.loan_id.data = int(loan_id)
 
-    if form.validate_on_submit():
-        loan = Loan.query.get_or_404(int(form.loan_id.data))
-        if loan.status != LoanStatus.BORROWED:
-            flash('This loan has already been returned.', 'info')
-            return redirect(url_for('circulation.loans'))
-        loan.mark_returned(form.return_date.data or date.today())
-        if form.notes.data:
-            loan.notes = (loan.notes + '\n' if loan.notes else '') + f"Return: {form.notes.data}"
-        # Calculate and store fine if any
-        loan.update_fine_amount()
-        db.session.commit()
-        if loan.fine_amount and float(loan.fine_amount) > 0:
-            flash(f'Book "{loan.book.title}" returned by {loan.member.name}. Fine assessed: ${loan.fine_amount:.2f} for {loan.days_overdue} day(s) overdue.', 'warning')
+    def process_return():
+        form.loan = None
+        if not form.validate_on_submit():
+            return None
+        loan = form.loan
+        book_title, member_name = loan.book.title, loan.member.name
+        checkin(loan, form.return_date.data or date.today(), notes=form.notes.data)
+        return loan.id, book_title, member_name, loan.fine_amount, (loan.return_date - loan.due_date).days
+
+    try:
+        returned = write_transaction(process_return)
+    except WriteConflictError as exc:
+        returned = None
+        flash(str(exc), 'danger')
+    if returned:
+        loan_id, book_title, member_name, fine_amount, days_late = returned
+        if fine_amount and float(fine_amount) > 0:
+            flash(f'Book "{book_title}" returned by {member_name}. Fine assessed: ${fine_amount:.2f} for {days_late} day(s) overdue.', 'warning')
         else:
-            flash(f'Book "{loan.book.title}" returned by {loan.member.name}.', 'success')
-        return redirect(url_for('circulation.loan_detail', loan_id=loan.id))
+            flash(f'Book "{book_title}" returned by {member_name}.', 'success')
+        return redirect(url_for('circulation.loan_detail', loan_id=loan_id))
 
     # If form didn't validate, render confirmation step with loan displayed
-    loan = Loan.query.get(form.loan_id.data) if form.loan_id.data else None
+    loan = form.loan or (Loan.query.get(form.loan_id.data) if form.loan_id.data else None)
     return render_template('circulation/return_form.html', form=form, loan=loan, active_loans=None, fine_rate=current_app.config.get('FINE_RATE_PER_DAY', 1.0))
 
 
+def _bulk_form(form_class):
+    """Build a batch form from HTML form data or a JSON body (items as a list or string)."""
+    if not request.is_json:
+        return form_class()
+    payload = request.get_json(silent=True) or {}
+    items = payload.get('items') or []
+    data = {k: v for k, v in payload.items() if k != 'items' and v is not None}
+    data['items'] = '\n'.join(map(str, items)) if isinstance(items, list) else str(items)
+    return form_class(formdata=MultiDict(data))
+
+
+def _run_bulk(form, template: str, work, verb: str):
+    results = None
+    if form.validate_on_submit():
+        identifiers = parse_book_identifiers(form.items.data)
+        try:
+            results = write_transaction(lambda: work(identifiers))
+        except WriteConflictError as exc:
+            if request.is_json:
+                return {'error': str(exc)}, 503
+            flash(str(exc), 'danger')
+    elif request.is_json:
+        return {'errors': form.errors}, 400
+
+    if results is not None:
+        done = sum(1 for r in results if r.ok)
+        if request.is_json:
+            return {'member_id': form.member_id.data, verb: done, 'results': [r.to_dict() for r in results]}
+        flash(f'{done} of {len(results)} book(s) {verb}.', 'success' if done == len(results) else 'warning')
+    return render_template(template, form=form, results=results, loan_period_days=current_app.config.get('LOAN_PERIOD_DAYS', 14))
+
+
+@bp.route('/bulk/checkout', methods=['GET', 'POST'])
+@login_required
+@librarian_required
+@query_budget(8)
+def bulk_checkout_view():
+    form = _bulk_form(BulkCheckoutForm)
+    return _run_bulk(
+        form, 'circulation/bulk_checkout.html',
+        lambda identifiers: bulk_checkout(form.member_id.data, identifiers, due_date=form.due_date.data, notes=form.notes.data),
+        'issued',
+    )
+
+
+@bp.route('/bulk/return', methods=['GET', 'POST'])
+@login_required
+@librarian_required
+@query_budget(6)
+def bulk_return_view():
+    form = _bulk_form(BulkReturnForm)
+    return _run_bulk(
+        form, 'circulation/bulk_return.html',
+        lambda identifiers: bulk_checkin(form.member_id.data, identifiers, return_date=form.return_date.data),
+        'returned',
+    )
+
+
 @bp.route('/overdue')
 @login_required
 @librarian_required
+@query_budget(5)
+@read_only
 def overdue():
-    page = request.args.get('page', 1, type=int)
     base_query = (
         Loan.query
         .filter(Loan.status == LoanStatus.BORROWED, Loan.due_date < date.today())
         .join(Book)
         .join(Member)
-        .order_by(Loan.due_date.asc())
+        .options(contains_eager(Loan.book), contains_eager(Loan.member))
     )
-    pagination = base_query.paginate(page=page, per_page=20, error_out=False)
+    pagination = paginate_query(base_query, [Loan.due_date.asc(), Loan.id.asc()], per_page=20, with_total=True)
     total_overdue = pagination.total
     total_fines = (
         db.session.query(func.sum(Loan.fine_amount - Loan.fine_paid))
@@ -219,9 +324,10 @@ def fine_receipt(loan_id: int):
 @bp.route('/member/<int:member_id>/fines')
 @login_required
 @librarian_required
+@query_budget(5)
 def member_fines(member_id: int):
     member = Member.query.get_or_404(member_id)
-    loans_with_fines = member.loans.filter(Loan.fine_amount > 0).order_by(Loan.due_date.desc()).all()
+    loans_with_fines = member.loans.options(joinedload(Loan.book)).filter(Loan.fine_amount > 0).order_by(Loan.due_date.desc()).all()
     total_fines_assessed = sum([float(l.fine_amount) for l in loans_with_fines]) if loans_with_fines else 0.0
     total_fines_paid = sum([float(l.fine_paid) for l in loans_with_fines]) if loans_with_fines else 0.0
     try:
@@ -235,12 +341,21 @@ def member_fines(member_id: int):
 @login_required
 @librarian_required
 def quick_return(loan_id: int):
-    loan = Loan.query.get_or_404(loan_id)
-    if loan.status != LoanStatus.BORROWED:
+    def process_return():
+        loan = Loan.query.filter_by(id=loan_id).with_for_update().first_or_404()
+        if loan.status != LoanStatus.BORROWED:
+            return False
+        checkin(loan, date.today(), assess_fine=False)
+        return True
+
+    try:
+        returned = write_transaction(process_return)
+    except WriteConflictError as exc:
+        flash(str(exc), 'danger')
+        return redirect(url_for('circulation.loans'))
+    if not returned:
         flash('This loan has already been returned.', 'info')
         return redirect(url_for('circulation.loans'))
-    loan.mark_returned(date.today())
-    db.session.commit()
     flash('Book returned successfully.', 'success')
     return redirect(url_for('circulation.loans'))
 
@@ -248,10 +363,10 @@ def quick_return(loan_id: int):
 @bp.route('/member/<int:member_id>/history')
 @login_required
 @librarian_required
+@query_budget(7)
 def member_history(member_id: int):
     member = Member.query.get_or_404(member_id)
-    page = request.args.get('page', 1, type=int)
-    pagination = member.loans.order_by(Loan.borrow_date.desc()).paginate(page=page, per_page=20, error_out=False)
+    pagination = paginate_query(member.loans.options(joinedload(Loan.book)), [Loan.borrow_date.desc(), Loan.id.desc()], per_page=20)
 
     total_borrowed = member.loans.count()
     currently_borrowed = member.loans.filter_by(status=LoanStatus.BORROWED).count()
@@ -263,10 +378,10 @@ def member_history(member_id: int):
 @bp.route('/book/<int:book_id>/history')
 @login_required
 @librarian_required
+@query_budget(6)
 def book_history(book_id: int):
     book = Book.query.get_or_404(book_id)
-    page = request.args.get('page', 1, type=int)
-    pagination = book.loans.order_by(Loan.borrow_date.desc()).paginate(page=page, per_page=20, error_out=False)
+    pagination = paginate_query(book.loans.options(joinedload(Loan.member)), [Loan.borrow_date.desc(), Loan.id.desc()], per_page=20)
 
     total_times_borrowed = book.loans.count()
     currently_on_loan = book.loans.filter_by(status=LoanStatus.BORROWED).count()
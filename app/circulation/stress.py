@@ -0,0 +1,141 @@
+"""Concurrent checkout stress check used by ``flask stress-checkout``.
+
+Each round creates a throwaway book with a few copies and more members than
+copies, then has one thread per member race to borrow it at the same moment
+through the same ``write_transaction`` path the borrow view uses. A round
+passes when no more than ``copies`` loans were issued (exactly ``copies``
+unless some borrowers gave up on lock contention) and the book's counter
+matches its BORROWED loans, both after the race and after every loan has
+been returned concurrently. Every successful checkout must also have run at
+most ``CHECKOUT_STATEMENTS`` SQL statements. All fixture rows are deleted
+afterwards.
+"""
+import threading
+import uuid
+from datetime import date
+
+from flask import Flask
+
+from app.extensions import db
+from app.models import Book, Member, MemberStatus, Loan, LoanStatus
+from app.query_counter import count_queries
+from app.transactions import write_transaction, write_metrics, WriteConflictError
+from .services import load_checkout_context, checkout, checkin, load_loan_for_return, CHECKOUT_STATEMENTS
+
+
+def _create_fixture(copies: int, members: int) -> tuple[int, list[int]]:
+    tag = uuid.uuid4().hex[:8]
+    book = Book(title=f'Stress test {tag}', author='Stress', quantity=copies)
+    people = [
+        Member(member_id=f'STRESS-{tag}-{i}', name=f'Stress {tag} {i}',
+               email=f'stress-{tag}-{i}@example.invalid', status=MemberStatus.ACTIVE)
+        for i in range(members)
+    ]
+    db.session.add(book)
+    db.session.add_all(people)
+    db.session.commit()
+    return book.id, [m.id for m in people]
+
+
+def _drop_fixture(book_id: int, member_ids: list[int]) -> None:
+    Loan.query.filter(Loan.book_id == book_id).delete(synchronize_session=False)
+    Member.query.filter(Member.id.in_(member_ids)).delete(synchronize_session=False)
+    Book.query.filter(Book.id == book_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _race(app: Flask, targets: list, work_for) -> dict:
+    """Run ``work_for(target)`` in one thread per target, released together."""
+    barrier = threading.Barrier(len(targets))
+    outcome = {'ok': 0, 'refused': 0, 'conflicts': 0, 'errors': []}
+    lock = threading.Lock()
+
+    def run(target):
+        with app.app_context():
+            barrier.wait()
+            try:
+                result = write_transaction(lambda: work_for(target))
+                key = 'ok' if result else 'refused'
+            except WriteConflictError:
+                key = 'conflicts'
+            except Exception as exc:  # reported, not raised, so every thread finishes
+                with lock:
+                    outcome['errors'].append(repr(exc))
+                return
+            finally:
+                db.session.remove()
+            with lock:
+                outcome[key] += 1
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in targets]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return outcome
+
+
+def _book_state(book_id: int) -> tuple[int, int, int]:
+    db.session.expire_all()
+    book = db.session.get(Book, book_id)
+    borrowed = Loan.query.filter_by(book_id=book_id, status=LoanStatus.BORROWED).count()
+    return book.quantity, book.active_loan_count, borrowed
+
+
+def run_checkout_stress(app: Flask, threads: int = 8, copies: int = 2, rounds: int = 5) -> list[dict]:
+    """Run the stress rounds; returns one result dict per round."""
+    if threads <= copies:
+        raise ValueError('threads must exceed copies for the race to mean anything.')
+    write_metrics.reset()
+    results = []
+    for round_no in range(1, rounds + 1):
+        with app.app_context():
+            book_id, member_ids = _create_fixture(copies, threads)
+        statement_counts = []
+
+        def borrow(member_id):
+            with count_queries() as counter:
+                ctx = load_checkout_context(member_id, book_id)
+                if not (ctx.book and ctx.book.is_available) or ctx.has_duplicate:
+                    return None
+                loan = checkout(ctx.member, ctx.book, due_date=None)
+            statement_counts.append(counter.count)
+            return loan
+
+        def give_back(loan_id):
+            loan = load_loan_for_return(loan_id)
+            if loan is None or loan.status != LoanStatus.BORROWED:
+                return None
+            checkin(loan, date.today(), assess_fine=False)
+            return True
+
+        try:
+            issued = _race(app, member_ids, borrow)
+            with app.app_context():
+                quantity, counter, borrowed = _book_state(book_id)
+                loan_ids = [l.id for l in Loan.query.filter_by(book_id=book_id, status=LoanStatus.BORROWED)]
+            returned = _race(app, loan_ids, give_back) if loan_ids else {'ok': 0, 'refused': 0, 'conflicts': 0, 'errors': []}
+            with app.app_context():
+                _, counter_after, borrowed_after = _book_state(book_id)
+        finally:
+            with app.app_context():
+                _drop_fixture(book_id, member_ids)
+
+        results.append({
+            'round': round_no,
+            'issued': issued['ok'],
+            'refused': issued['refused'],
+            'conflicts': issued['conflicts'] + returned['conflicts'],
+            'errors': issued['errors'] + returned['errors'],
+            'returned': returned['ok'],
+            'checkout_statements': max(statement_counts, default=0),
+            'passed': (
+                issued['ok'] <= quantity
+                and borrowed == counter == issued['ok']
+                and returned['ok'] == issued['ok']
+                and counter_after == borrowed_after == 0
+                and not issued['errors'] and not returned['errors']
+                and max(statement_counts, default=0) <= CHECKOUT_STATEMENTS
+            ),
+        })
+    return results
@@ -0,0 +1,166 @@
+"""Conditional GET (ETag / Last-Modified) for read-mostly pages and chart data.
+
+Views declare the tables their output depends on with
+``@conditional('loans', 'books')``. On SQLite, triggers bump a per-table
+write counter in ``data_versions`` on every insert, update or delete, whatever
+made it (views, batch endpoints, bulk SQL, another worker). The ETag hashes
+those counters with the URL, the user's session and the day, so reading it
+costs one primary-key lookup. A matching ``If-None-Match`` (or an
+``If-Modified-Since`` no older than the tables' last change) is answered with
+``304 Not Modified`` before the view runs. On other databases the stamp falls
+back to count/max(id)/max(updated_at) per table.
+"""
+import hashlib
+from datetime import date, datetime, time, timezone
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, func, text
+
+from app.extensions import db
+from app.models import Book, Category, DataVersion, Loan, Member
+
+VERSIONED_TABLES = {'loans': Loan, 'books': Book, 'members': Member, 'categories': Category}
+TRIGGER_SUFFIX = 'version'
+
+# Per-engine cache of whether the triggers are installed
+_versions_enabled: dict = {}
+# Last stamp this process saw per (engine, tables), to spot other workers' writes
+_seen: dict = {}
+
+
+def _ddl_statements() -> list[str]:
+    statements = []
+    for table in VERSIONED_TABLES:
+        bump = (
+            f"INSERT INTO data_versions(table_name, version, changed_at) VALUES ('{table}', 1, CURRENT_TIMESTAMP) "
+            f"ON CONFLICT(table_name) DO UPDATE SET version = version + 1, changed_at = CURRENT_TIMESTAMP; "
+        )
+        for suffix, op in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE')):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_{TRIGGER_SUFFIX}_{suffix} AFTER {op} ON {table} BEGIN {bump}END"
+            )
+    return statements
+
+
+def create_version_triggers(connection) -> bool:
+    """Install the write-counter triggers. Returns False on non-SQLite databases."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    for stmt in _ddl_statements():
+        connection.exec_driver_sql(stmt)
+    for table in VERSIONED_TABLES:
+        connection.execute(
+            text("INSERT OR IGNORE INTO data_versions(table_name, version, changed_at) VALUES (:t, 0, CURRENT_TIMESTAMP)"),
+            {'t': table},
+        )
+    _versions_enabled.pop(str(connection.engine.url), None)
+    return True
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_version_triggers_after_create(target, connection, **kw):
+    create_version_triggers(connection)
+
+
+def versions_enabled() -> bool:
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _versions_enabled:
+        enabled = False
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as conn:
+                enabled = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+                    {'name': f'loans_{TRIGGER_SUFFIX}_ai'},
+                ).first() is not None
+        _versions_enabled[key] = enabled
+    return _versions_enabled[key]
+
+
+def data_version(tables) -> tuple[str, datetime]:
+    """(stamp, last modified) for ``tables``; the stamp changes on any write to them."""
+    tables = sorted(tables)
+    if versions_enabled():
+        rows = db.session.execute(
+            db.select(DataVersion.table_name, DataVersion.version, DataVersion.changed_at)
+            .where(DataVersion.table_name.in_(tables))
+        ).all()
+        found = {name: (version, changed_at) for name, version, changed_at in rows}
+        stamp = '.'.join(f'{t}:{found.get(t, (0, None))[0]}' for t in tables)
+        changed = [changed_at for _, changed_at in found.values() if changed_at]
+    else:
+        columns = []
+        for t in tables:
+            model = VERSIONED_TABLES[t]
+            columns.append(db.select(func.count(model.id)).scalar_subquery())
+            columns.append(db.select(func.max(model.id)).scalar_subquery())
+            columns.append(db.select(func.max(model.updated_at)).scalar_subquery())
+        row = db.session.execute(db.select(*columns)).one()
+        stamp = '.'.join(str(v) for v in row)
+        changed = [v for v in row[2::3] if v]
+    # Pages also depend on today's date (overdue, default ranges)
+    midnight = datetime.combine(date.today(), time()).astimezone(timezone.utc)
+    last_modified = max([midnight] + [c.replace(tzinfo=timezone.utc) for c in changed])
+    return stamp, last_modified.replace(microsecond=0)
+
+
+def _etag(stamp: str) -> str:
+    parts = (request.full_path, str(current_user.get_id()), session.get('csrf_token', ''), date.today().isoformat(), stamp)
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def _not_modified(etag: str, last_modified: datetime) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _sync_report_cache(tables, stamp: str) -> None:
+    # Commits in this process already invalidate the report cache; a stamp
+    # that moved without one means another worker wrote these tables.
+    from app.reports.cache import report_cache
+
+    key = (str(db.engine.url), tuple(sorted(tables)))
+    seen = _seen.get(key)
+    _seen[key] = stamp
+    if seen is not None and seen != stamp:
+        report_cache.invalidate(tables)
+
+
+def _stamp(response, etag: str, last_modified: datetime):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Always revalidate; never share between users
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def skip_conditional() -> None:
+    """Called by a view whose response depends on more than the table stamps."""
+    g.skip_conditional = True
+
+
+def conditional(*tables):
+    """Answer 304 while ``tables`` are unchanged since the client's copy."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are consumed by rendering; never skip that
+            if request.method not in ('GET', 'HEAD') or '_flashes' in session:
+                return view(*args, **kwargs)
+            stamp, last_modified = data_version(tables)
+            _sync_report_cache(tables, stamp)
+            etag = _etag(stamp)
+            if _not_modified(etag, last_modified):
+                return _stamp(current_app.response_class(status=304), etag, last_modified)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed or '_flashes' in session or g.get('skip_conditional'):
+                return response
+            return _stamp(response, etag, last_modified)
+        return wrapper
+    return decorator
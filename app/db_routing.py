@@ -0,0 +1,113 @@
+"""Read-only bind for reports and list pages, so they stay off the write pool.
+
+With a read bind configured, ``SQLALCHEMY_BINDS['readonly']`` is a second
+engine with its own pool: a ``mode=ro`` URI with ``PRAGMA query_only`` on the
+same SQLite file, or ``READ_DATABASE_URL`` (a replica) on other databases.
+Checkout and return transactions keep the primary pool to themselves, and a
+long report cannot take the connection a desk write is waiting for.
+
+Routing is opt-in per request: the reports blueprint calls
+``use_read_bind()`` before every request, and list views are decorated with
+``@read_only``. Within such a request only SELECTs go to the read bind;
+flushes, ORM ``insert``/``update``/``delete`` and ``session.connection()``
+still use the primary. Streamed exports keep the flag, since the session
+lives until the response is finished.
+
+A replica may lag the primary. The SQLite read bind reads the same WAL file,
+so it sees every committed write.
+"""
+from functools import wraps
+
+from flask import Flask
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.selectable import CompoundSelect, Select
+
+READ_BIND = 'readonly'
+_READ_ONLY = 'read_only_bind'
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends SELECTs to the read bind when asked."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get(_READ_ONLY)
+            and not self._flushing
+            and isinstance(clause, (Select, CompoundSelect))
+        ):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def use_read_bind() -> None:
+    """Send this request's SELECTs to the read bind (if one is configured)."""
+    from app.extensions import db
+
+    db.session.info[_READ_ONLY] = True
+
+
+def read_only(view):
+    """Run ``view`` with its SELECTs on the read bind."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        use_read_bind()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _sqlite_file(uri: str) -> str | None:
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:' or url.database.startswith('file:'):
+        return None
+    return url.database
+
+
+def _pool_options(config, prefix: str) -> dict:
+    return {
+        'pool_size': int(config.get(f'{prefix}POOL_SIZE', 5)),
+        'max_overflow': int(config.get(f'{prefix}MAX_OVERFLOW', 10)),
+        'pool_timeout': float(config.get(f'{prefix}POOL_TIMEOUT', 30)),
+    }
+
+
+def _query_only(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA query_only=ON')
+    cursor.close()
+
+
+def configure_read_bind(app: Flask) -> None:
+    """Set pool sizes per role and add the read bind. Call before ``db.init_app``."""
+    config = app.config
+    primary = config['SQLALCHEMY_DATABASE_URI']
+    sqlite_path = _sqlite_file(primary)
+    pooled = sqlite_path is not None or make_url(primary).get_backend_name() != 'sqlite'
+    engine_options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if pooled:
+        # In-memory SQLite uses a per-thread pool without these settings
+        engine_options.update(_pool_options(config, 'DB_'))
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+    read_url = config.get('READ_DATABASE_URL')
+    if not read_url and sqlite_path and config.get('READ_BIND_ENABLED', True):
+        read_url = f'sqlite:///file:{sqlite_path}?mode=ro&uri=true'
+    if not read_url:
+        return
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    binds[READ_BIND] = dict(engine_options, url=read_url, **_pool_options(config, 'READ_DB_'))
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_read_bind(app: Flask) -> None:
+    """Make the SQLite read bind refuse writes. Call after ``db.init_app``."""
+    from app.extensions import db
+
+    with app.app_context():
+        engine = db.engines.get(READ_BIND)
+    if engine is not None and engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _query_only)
@@ -0,0 +1,129 @@
+"""EXPLAIN QUERY PLAN report for the hot circulation queries.
+
+Used by ``flask explain-hot-queries`` to confirm the loan indexes are picked
+up. On SQLite both sides are planned on in-memory copies of the database
+that have been through ``ANALYZE``, so they use the same statistics: the
+"after" copy as it is, the "before" copy with the composite/partial indexes
+swapped back for the original single-column ones. The live database is not
+modified.
+"""
+import sqlite3
+from datetime import date, timedelta
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import Book, Member, Loan, LoanStatus
+
+# Indexes added by the "hot loan predicate indexes" migration
+NEW_LOAN_INDEXES = (
+    'ix_loans_borrowed_due_date',
+    'ix_loans_member_id_status',
+    'ix_loans_book_id_status',
+    'ix_loans_borrow_date',
+    'ix_loans_unpaid_fines',
+)
+LEGACY_LOAN_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS ix_loans_book_id ON loans (book_id)',
+    'CREATE INDEX IF NOT EXISTS ix_loans_member_id ON loans (member_id)',
+)
+
+
+def hot_queries() -> list[tuple[str, object]]:
+    """(label, SQLAlchemy statement) pairs mirroring the app's hot paths."""
+    today = date.today()
+    start = today - timedelta(days=30)
+    member_id = book_id = 1
+    overdue = (Loan.status == LoanStatus.BORROWED, Loan.due_date < today)
+    return [
+        ('overdue count (main.index, reports.dashboard)',
+         db.select(func.count(Loan.id)).where(*overdue)),
+        ('overdue list (circulation.overdue)',
+         db.select(Loan).where(*overdue).order_by(Loan.due_date.asc(), Loan.id.asc()).limit(20)),
+        ('overdue fines total (circulation.overdue)',
+         db.select(func.sum(Loan.fine_amount - Loan.fine_paid)).where(*overdue)),
+        ('Member.has_overdue_loans',
+         db.select(func.count(Loan.id)).where(Loan.member_id == member_id, *overdue)),
+        ('Member.active_loans_count',
+         db.select(func.count(Loan.id)).where(Loan.member_id == member_id, Loan.status == LoanStatus.BORROWED)),
+        ('Member.has_unpaid_fines',
+         db.select(func.count(Loan.id)).where(Loan.member_id == member_id, Loan.fine_amount > Loan.fine_paid)),
+        ('active loans for a book (duplicate-loan check)',
+         db.select(Loan.id).where(Loan.book_id == book_id, Loan.member_id == member_id, Loan.status == LoanStatus.BORROWED)),
+        ('member history page',
+         db.select(Loan).where(Loan.member_id == member_id).order_by(Loan.borrow_date.desc(), Loan.id.desc()).limit(20)),
+        ('book history page',
+         db.select(Loan).where(Loan.book_id == book_id).order_by(Loan.borrow_date.desc(), Loan.id.desc()).limit(20)),
+        ('circulation trends (borrow_date BETWEEN)',
+         db.select(Loan.borrow_date, func.count(Loan.id)).where(Loan.borrow_date.between(start, today)).group_by(Loan.borrow_date)),
+        ('most borrowed books in range',
+         db.select(Loan.book_id, func.count(Loan.id)).where(Loan.borrow_date.between(start, today)).group_by(Loan.book_id)),
+        ('catalog availability filter',
+         db.select(Book.id).where(Book.available_quantity > 0)),
+        ('member picker lookup (lower(name) prefix)',
+         db.select(Member.id).where(func.lower(Member.name) >= 'jo', func.lower(Member.name) < 'jo\U0010ffff').limit(10)),
+        ('book picker lookup (lower(title) prefix)',
+         db.select(Book.id).where(func.lower(Book.title) >= 'cl', func.lower(Book.title) < 'cl\U0010ffff').limit(10)),
+        ('members list page',
+         db.select(Member).order_by(Member.registration_date.desc(), Member.id.desc()).limit(20)),
+    ]
+
+
+def _compile(stmt, dialect) -> str:
+    return str(stmt.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+
+def _plan(dbapi_connection, sql: str) -> list[str]:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN loans" is a table scan; "SCAN loans USING INDEX ..." walks an index
+    return detail.startswith('SCAN ') and ' USING ' not in detail and 'CONSTANT ROW' not in detail
+
+
+def _analyzed_copy(live, legacy_indexes: bool = False) -> sqlite3.Connection:
+    """In-memory copy of ``live`` with fresh statistics, optionally with the old indexes."""
+    conn = sqlite3.connect(':memory:')
+    live.backup(conn)
+    if legacy_indexes:
+        for name in NEW_LOAN_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+        for ddl in LEGACY_LOAN_INDEXES:
+            conn.execute(ddl)
+    conn.execute('ANALYZE')
+    return conn
+
+
+def explain_hot_queries(compare: bool = True) -> list[dict]:
+    """Return plans for each hot query; ``before`` is only filled on SQLite."""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        raise RuntimeError('EXPLAIN QUERY PLAN reporting is only implemented for SQLite.')
+    queries = [(label, _compile(stmt, engine.dialect)) for label, stmt in hot_queries()]
+    raw = engine.raw_connection()
+    try:
+        live = raw.driver_connection
+        after_conn = _analyzed_copy(live)
+        before_conn = _analyzed_copy(live, legacy_indexes=True) if compare else None
+    finally:
+        raw.close()
+    try:
+        return [
+            {
+                'label': label,
+                'sql': sql,
+                'before': _plan(before_conn, sql) if before_conn else None,
+                'after': _plan(after_conn, sql),
+            }
+            for label, sql in queries
+        ]
+    finally:
+        after_conn.close()
+        if before_conn is not None:
+            before_conn.close()
@@ -3,9 +3,12 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_wtf import CSRFProtect
 
+from app.db_routing import RoutingSession
+
 # Centralized extension instances to avoid circular imports
 
-db = SQLAlchemy()
+# Sessions can route report/list SELECTs to the read-only bind (app/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 csrf = CSRFProtect()
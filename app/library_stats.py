@@ -0,0 +1,395 @@
+"""Live library counters in one row, kept exact by triggers or session hooks.
+
+The home page and the reports dashboard read ``library_stats`` (book count,
+active members, loans out, overdue loans, unpaid fines) with one primary-key
+lookup instead of four COUNTs and a SUM over loans per view.
+
+On SQLite, triggers on ``books``, ``members`` and ``loans`` adjust the row in
+the statement that made the change, whichever code path ran it (views, batch
+endpoints, bulk or raw SQL). A checkout therefore costs no extra statement.
+
+Elsewhere, or on a SQLite database without the triggers, session hooks do
+the same work:
+
+* ``before_flush`` turns pending Book/Member/Loan inserts, deletes and
+  changes to ``Member.status`` and the loan status/due date/fine columns into
+  deltas.
+* ``after_flush`` writes them with one ``UPDATE ... SET x = x + :d`` in the
+  same transaction, so a rollback undoes them as well. ``before_commit``
+  writes deltas recorded outside a flush.
+* ORM bulk inserts are counted from their parameters. A bulk update or delete
+  of loans or members marks the affected counters stale; they are recomputed
+  with one aggregate before commit. Callers that know their delta (batch
+  return) pass it to ``record_delta`` and run the statement with
+  ``execution_options(library_stats_counted=True)``. Raw SQL is not seen.
+
+``flask reconcile-stats`` recomputes everything from the live tables. The
+overdue count depends on the date: writes adjust it during the day, and the
+first read on a new day recounts it with the ``ix_loans_borrowed_due_date``
+range scan.
+"""
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+
+from flask import Flask
+from sqlalchemy import case, event, func, inspect, text
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Book, Category, LibraryStats, Loan, LoanStatus, Member, MemberStatus
+
+STATS_ID = 1
+FIELDS = ('total_books', 'active_members', 'books_on_loan', 'overdue_books', 'unpaid_fines')
+LOAN_FIELDS = ('books_on_loan', 'overdue_books', 'unpaid_fines')
+# Execution option for bulk statements whose delta the caller recorded itself
+COUNTED = 'library_stats_counted'
+
+_DELTAS = 'library_stats_deltas'
+_STALE = 'library_stats_stale'
+_UNKNOWN = object()
+
+TRIGGER_PREFIX = 'library_stats'
+
+# Per-engine cache of whether the triggers are installed
+_triggers_enabled: dict = {}
+
+_BORROWED = LoanStatus.BORROWED.name
+_ACTIVE = MemberStatus.ACTIVE.name
+_TODAY = "date('now', 'localtime')"
+
+
+def _loan_terms(row: str) -> dict:
+    """SQL for what one loan ``row`` (new/old) contributes to each loan counter."""
+    borrowed = f"({row}.status = '{_BORROWED}')"
+    return {
+        'books_on_loan': borrowed,
+        'overdue_books': f"({borrowed} AND {row}.due_date < {_TODAY})",
+        'unpaid_fines': f"MAX({row}.fine_amount - {row}.fine_paid, 0)",
+    }
+
+
+def _loan_update(added: str | None = None, removed: str | None = None) -> str:
+    """One UPDATE adding the ``added`` row's counts and taking away the ``removed`` row's."""
+    plus = _loan_terms(added) if added else {}
+    minus = _loan_terms(removed) if removed else {}
+
+    def change(field):
+        return ''.join([f" + {plus[field]}" if plus else '', f" - {minus[field]}" if minus else ''])
+
+    return (
+        f"UPDATE library_stats SET "
+        f"books_on_loan = books_on_loan{change('books_on_loan')}, "
+        # A count from an earlier day is recounted on read; leave it alone
+        f"overdue_books = CASE WHEN overdue_as_of = {_TODAY} "
+        f"THEN overdue_books{change('overdue_books')} ELSE overdue_books END, "
+        f"unpaid_fines = ROUND(unpaid_fines{change('unpaid_fines')}, 2) "
+        f"WHERE id = {STATS_ID}; "
+    )
+
+
+def _ddl_statements() -> list[str]:
+    p = TRIGGER_PREFIX
+    new_active, old_active = f"(new.status = '{_ACTIVE}')", f"(old.status = '{_ACTIVE}')"
+    where = f"WHERE id = {STATS_ID}; "
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {p}_books_ai AFTER INSERT ON books BEGIN "
+        f"UPDATE library_stats SET total_books = total_books + 1 {where}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_books_ad AFTER DELETE ON books BEGIN "
+        f"UPDATE library_stats SET total_books = total_books - 1 {where}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_members_ai AFTER INSERT ON members BEGIN "
+        f"UPDATE library_stats SET active_members = active_members + {new_active} {where}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_members_ad AFTER DELETE ON members BEGIN "
+        f"UPDATE library_stats SET active_members = active_members - {old_active} {where}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_members_au AFTER UPDATE OF status ON members BEGIN "
+        f"UPDATE library_stats SET active_members = active_members + {new_active} - {old_active} {where}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_loans_ai AFTER INSERT ON loans BEGIN {_loan_update(added='new')}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_loans_ad AFTER DELETE ON loans BEGIN {_loan_update(removed='old')}END",
+        # Returns, renewals and fine changes; notes/updated_at writes do not fire this
+        f"CREATE TRIGGER IF NOT EXISTS {p}_loans_au AFTER UPDATE OF status, due_date, fine_amount, fine_paid "
+        f"ON loans BEGIN {_loan_update(added='new', removed='old')}END",
+    ]
+
+
+def create_stats_triggers(connection) -> bool:
+    """Install the counter triggers. Returns False on non-SQLite databases."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    for stmt in _ddl_statements():
+        connection.exec_driver_sql(stmt)
+    _triggers_enabled[str(connection.engine.url)] = True
+    return True
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_stats_triggers_after_create(target, connection, **kw):
+    create_stats_triggers(connection)
+
+
+def stats_triggers_enabled(engine) -> bool:
+    key = str(engine.url)
+    if key not in _triggers_enabled:
+        enabled = False
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as conn:
+                enabled = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+                    {'name': f'{TRIGGER_PREFIX}_loans_ai'},
+                ).first() is not None
+        _triggers_enabled[key] = enabled
+    return _triggers_enabled[key]
+
+
+def _maintained_by_triggers(session) -> bool:
+    return stats_triggers_enabled(session.get_bind())
+
+
+def _pending(session) -> Counter:
+    return session.info.setdefault(_DELTAS, Counter())
+
+
+def _stale(session) -> set:
+    return session.info.setdefault(_STALE, set())
+
+
+def record_delta(session, **deltas) -> None:
+    """Add known counter changes to the session's current transaction."""
+    pending = _pending(session)
+    for field, value in deltas.items():
+        if value:
+            pending[field] += value
+
+
+def unpaid(fine_amount, fine_paid) -> Decimal:
+    return max(Decimal(str(fine_amount or 0)) - Decimal(str(fine_paid or 0)), Decimal('0'))
+
+
+def loan_counts(status, due_date, fine_amount, fine_paid, today: date) -> dict:
+    """What one loan contributes to the counters."""
+    borrowed = status == LoanStatus.BORROWED
+    return {
+        'books_on_loan': int(borrowed),
+        'overdue_books': int(borrowed and due_date is not None and due_date < today),
+        'unpaid_fines': unpaid(fine_amount, fine_paid),
+    }
+
+
+def _add(delta: Counter, counts: dict, sign: int = 1) -> None:
+    for field, value in counts.items():
+        delta[field] += sign * value
+
+
+def _old_new(obj, key):
+    """(value before this flush, value now); old is _UNKNOWN if it was never loaded."""
+    added, unchanged, deleted = inspect(obj).attrs[key].history
+    if not added and not deleted:
+        value = getattr(obj, key)
+        return value, value
+    old = deleted[0] if deleted else (unchanged[0] if unchanged else _UNKNOWN)
+    return old, (added[0] if added else None)
+
+
+_LOAN_KEYS = ('status', 'due_date', 'fine_amount', 'fine_paid')
+
+
+def _collect_flush_deltas(session, flush_context, instances) -> None:
+    if _maintained_by_triggers(session):
+        return
+    today = date.today()
+    delta = _pending(session)
+    stale = _stale(session)
+    for obj in session.new:
+        if isinstance(obj, Book):
+            delta['total_books'] += 1
+        elif isinstance(obj, Member):
+            delta['active_members'] += int((obj.status or MemberStatus.ACTIVE) == MemberStatus.ACTIVE)
+        elif isinstance(obj, Loan):
+            _add(delta, loan_counts(obj.status or LoanStatus.BORROWED, obj.due_date, obj.fine_amount, obj.fine_paid, today))
+    for obj in session.deleted:
+        if isinstance(obj, Book):
+            delta['total_books'] -= 1
+            # Its loans go with it through the ORM cascade, unseen here
+            stale.update(LOAN_FIELDS)
+        elif isinstance(obj, Member):
+            old, _ = _old_new(obj, 'status')
+            if old is _UNKNOWN:
+                stale.add('active_members')
+            else:
+                delta['active_members'] -= int(old == MemberStatus.ACTIVE)
+            stale.update(LOAN_FIELDS)
+        elif isinstance(obj, Category):
+            stale.add('total_books')
+            stale.update(LOAN_FIELDS)
+        elif isinstance(obj, Loan):
+            olds = [_old_new(obj, key)[0] for key in _LOAN_KEYS]
+            if _UNKNOWN in olds:
+                stale.update(LOAN_FIELDS)
+            else:
+                _add(delta, loan_counts(*olds, today), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Member):
+            old, new = _old_new(obj, 'status')
+            if old is _UNKNOWN:
+                stale.add('active_members')
+            elif old != new:
+                delta['active_members'] += int(new == MemberStatus.ACTIVE) - int(old == MemberStatus.ACTIVE)
+        elif isinstance(obj, Loan):
+            pairs = [_old_new(obj, key) for key in _LOAN_KEYS]
+            if any(old is _UNKNOWN for old, _ in pairs):
+                stale.update(LOAN_FIELDS)
+            elif any(old != new for old, new in pairs):
+                _add(delta, loan_counts(*(old for old, _ in pairs), today), -1)
+                _add(delta, loan_counts(*(new for _, new in pairs), today))
+
+
+def _track_bulk(state) -> None:
+    if not (state.is_insert or state.is_update or state.is_delete) or state.execution_options.get(COUNTED):
+        return
+    table = getattr(getattr(state.statement, 'table', None), 'name', None)
+    if table not in ('books', 'members', 'loans'):
+        return
+    session = state.session
+    if _maintained_by_triggers(session):
+        return
+    params = state.parameters
+    rows = params if isinstance(params, list) else ([params] if params else [])
+    if state.is_insert and rows:
+        today = date.today()
+        delta = _pending(session)
+        for row in rows:
+            if table == 'books':
+                delta['total_books'] += 1
+            elif table == 'members':
+                delta['active_members'] += int(row.get('status', MemberStatus.ACTIVE) == MemberStatus.ACTIVE)
+            else:
+                _add(delta, loan_counts(row.get('status', LoanStatus.BORROWED), row.get('due_date'),
+                                        row.get('fine_amount'), row.get('fine_paid'), today))
+        return
+    if table == 'books':
+        # Bulk updates only move availability counters; the book count is unaffected
+        if not state.is_update:
+            _stale(session).add('total_books')
+    elif table == 'members':
+        _stale(session).add('active_members')
+    else:
+        _stale(session).update(LOAN_FIELDS)
+
+
+def _aggregates(today: date) -> dict:
+    borrowed = Loan.status == LoanStatus.BORROWED
+    return {
+        'total_books': db.select(func.count(Book.id)).scalar_subquery(),
+        'active_members': db.select(func.count(Member.id)).where(Member.status == MemberStatus.ACTIVE).scalar_subquery(),
+        'books_on_loan': db.select(func.count(Loan.id)).where(borrowed).scalar_subquery(),
+        'overdue_books': db.select(func.count(Loan.id)).where(borrowed, Loan.due_date < today).scalar_subquery(),
+        'unpaid_fines': db.select(func.coalesce(func.sum(Loan.fine_amount - Loan.fine_paid), 0))
+        .where(Loan.fine_amount > Loan.fine_paid).scalar_subquery(),
+    }
+
+
+def populate_library_stats(connection, today: date, fields=FIELDS) -> None:
+    """Recompute ``fields`` from the live tables (creating the row if missing)."""
+    table = LibraryStats.__table__
+    aggregates = _aggregates(today)
+    values = {f: aggregates[f] for f in fields}
+    if 'overdue_books' in fields:
+        values['overdue_as_of'] = today
+    result = connection.execute(db.update(table).where(table.c.id == STATS_ID).values(values))
+    if result.rowcount == 0:
+        connection.execute(db.insert(table).values(id=STATS_ID, overdue_as_of=today, **aggregates))
+
+
+def _apply(session) -> None:
+    deltas = session.info.pop(_DELTAS, None)
+    stale = session.info.pop(_STALE, None) or set()
+    if not any((deltas or {}).values()) and not stale:
+        return
+    if _maintained_by_triggers(session):
+        # The triggers already counted it (e.g. a batch return's record_delta)
+        return
+    today = date.today()
+    table = LibraryStats.__table__
+    values = {}
+    for field, value in (deltas or {}).items():
+        if not value or field in stale:
+            continue
+        column = table.c[field]
+        if field == 'unpaid_fines':
+            values[field] = func.round(column + value, 2)
+        elif field == 'overdue_books':
+            # A count from an earlier day is recounted on read; leave it alone
+            values[field] = case((table.c.overdue_as_of == today, column + value), else_=column)
+        else:
+            values[field] = column + value
+    connection = session.connection()
+    if values:
+        result = connection.execute(db.update(table).where(table.c.id == STATS_ID).values(values))
+        if result.rowcount == 0:
+            stale = set(FIELDS)
+    if stale:
+        populate_library_stats(connection, today, [f for f in FIELDS if f in stale])
+
+
+def _apply_after_flush(session, flush_context) -> None:
+    _apply(session)
+
+
+def _discard_after_rollback(session) -> None:
+    session.info.pop(_DELTAS, None)
+    session.info.pop(_STALE, None)
+
+
+_COLUMNS = (LibraryStats.total_books, LibraryStats.active_members, LibraryStats.books_on_loan,
+            LibraryStats.overdue_books, LibraryStats.overdue_as_of, LibraryStats.unpaid_fines)
+
+
+def _read(connection):
+    return connection.execute(db.select(*_COLUMNS).where(LibraryStats.id == STATS_ID)).first()
+
+
+def _as_dict(row) -> dict:
+    return {
+        'total_books': row.total_books,
+        'active_members': row.active_members,
+        'books_on_loan': row.books_on_loan,
+        'overdue_books': row.overdue_books,
+        'total_unpaid_fines': float(row.unpaid_fines or 0),
+    }
+
+
+def get_library_stats() -> dict:
+    """Dashboard counters: one primary-key lookup, plus a recount on a new day.
+
+    Call it from read-only views; the recount writes in its own transaction.
+    """
+    today = date.today()
+    row = _read(db.session.connection())
+    if row is None or row.overdue_as_of != today:
+        with db.engine.begin() as conn:
+            populate_library_stats(conn, today, FIELDS if row is None else ('overdue_books',))
+            row = _read(conn)
+    return _as_dict(row)
+
+
+def reconcile_library_stats() -> dict:
+    """Recompute every counter; returns {field: (stored, actual)} for those that drifted."""
+    with db.engine.begin() as conn:
+        before = _read(conn)
+        populate_library_stats(conn, date.today())
+        after = _read(conn)
+    return {
+        f: (getattr(before, f) if before is not None else None, getattr(after, f))
+        for f in FIELDS
+        if before is None or getattr(before, f) != getattr(after, f)
+    }
+
+
+def init_library_stats(app: Flask) -> None:
+    if getattr(init_library_stats, '_listening', False):
+        return
+    event.listen(Session, 'before_flush', _collect_flush_deltas)
+    event.listen(Session, 'after_flush', _apply_after_flush)
+    event.listen(Session, 'do_orm_execute', _track_bulk)
+    event.listen(Session, 'before_commit', _apply)
+    event.listen(Session, 'after_rollback', _discard_after_rollback)
+    init_library_stats._listening = True
@@ -1,31 +1,28 @@
 from flask import render_template
 from . import bp
-from app.models import Book, Category, Member, MemberStatus, Loan, LoanStatus
+from app.models import Book, Member, Loan, LoanStatus
+from app.library_stats import get_library_stats
 from datetime import date
-from sqlalchemy import func
-from decimal import Decimal
+from sqlalchemy.orm import joinedload
 
 
 @bp.route("/")
 @bp.route("/index")
 def index():
-    stats = {
-        "total_books": Book.query.count(),
-        "active_members": Member.query.filter_by(status=MemberStatus.ACTIVE).count(),
-        "books_on_loan": Loan.query.filter_by(status=LoanStatus.BORROWED).count(),
-        "overdue_books": Loan.query.filter(Loan.status == LoanStatus.BORROWED, Loan.due_date < date.today()).count(),
-    }
-    unpaid_fines_query = (
-        Book.query.session.query(func.sum(Loan.fine_amount - Loan.fine_paid))
-        .filter(Loan.fine_amount > Loan.fine_paid)
-        .scalar()
-    )
-    stats['total_unpaid_fines'] = float(unpaid_fines_query or 0)
+    stats = get_library_stats()
     recent_books = Book.query.order_by(Book.created_at.desc()).limit(5).all()
     recent_members = Member.query.order_by(Member.registration_date.desc()).limit(5).all()
-    recent_loans = Loan.query.filter_by(status=LoanStatus.BORROWED).order_by(Loan.borrow_date.desc()).limit(5).all()
+    recent_loans = (
+        Loan.query
+        .options(joinedload(Loan.book), joinedload(Loan.member))
+        .filter_by(status=LoanStatus.BORROWED)
+        .order_by(Loan.borrow_date.desc())
+        .limit(5)
+        .all()
+    )
     overdue_with_fines = (
         Loan.query
+        .options(joinedload(Loan.book), joinedload(Loan.member))
         .filter(Loan.status == LoanStatus.BORROWED, Loan.due_date < date.today(), Loan.fine_amount > Loan.fine_paid)
         .order_by(Loan.due_date.asc())
         .limit(5)
@@ -6,6 +6,8 @@ from sqlalchemy import or_
 
 from app.extensions import db
 from app.auth.decorators import librarian_required
+from app.db_routing import read_only
+from app.pagination import paginate_query
 from app.models import Member, MemberStatus, Loan, LoanStatus
 from . import bp
 from .forms import MemberForm, MemberSearchForm
@@ -15,8 +17,8 @@ from .forms import MemberForm, MemberSearchForm
 @bp.route('/list')
 @login_required
 @librarian_required
+@read_only
 def members():
-    page = request.args.get('page', 1, type=int)
     q = request.args.get('query', '', type=str)
     status = request.args.get('status', 'all', type=str)
 
@@ -37,8 +39,7 @@ def members():
         except KeyError:
             pass
 
-    base_query = base_query.order_by(Member.registration_date.desc())
-    pagination = base_query.paginate(page=page, per_page=20, error_out=False)
+    pagination = paginate_query(base_query, [Member.registration_date.desc(), Member.id.desc()], per_page=20)
 
     form = MemberSearchForm(request.args)
 
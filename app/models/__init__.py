@@ -4,6 +4,9 @@ from .book import Book
 from .category import Category
 from .member import Member, MemberStatus
 from .loan import Loan, LoanStatus
+from .rollup import DailyLoanStat, DailyBookLoanStat, DailyMemberLoanStat
+from .data_version import DataVersion
+from .library_stats import LibraryStats
 
 __all__ = [
     "User",
@@ -14,4 +17,9 @@ __all__ = [
     "MemberStatus",
     "Loan",
     "LoanStatus",
+    "DailyLoanStat",
+    "DailyBookLoanStat",
+    "DailyMemberLoanStat",
+    "DataVersion",
+    "LibraryStats",
 ]
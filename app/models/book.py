@@ -1,4 +1,7 @@
 from datetime import datetime
+
+from sqlalchemy.ext.hybrid import hybrid_property
+
 from app.extensions import db
 
 
@@ -17,6 +20,10 @@ class Book(db.Model):
     description = db.Column(db.Text, nullable=True)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True, index=True)
     quantity = db.Column(db.Integer, nullable=False, default=1)
+    # Denormalized count of BORROWED loans, maintained in the same transaction
+    # as borrow/return so availability never needs a COUNT over loans. Added
+    # to existing databases by migration b7c41e09d2f3, which also reconciles it.
+    active_loan_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shelf_location = db.Column(db.String(50), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -24,22 +31,74 @@ class Book(db.Model):
     # Circulation relationship: one book has many loans
     loans = db.relationship('Loan', backref='book', lazy='dynamic', cascade='all, delete-orphan')
 
+    # Expression index matching ``Book.available_quantity`` at class level so
+    # the catalog availability filter is a seek rather than a scan.
+    __table_args__ = (
+        db.Index('ix_books_available_copies', quantity - active_loan_count),
+        # Case-insensitive prefix lookups for the circulation book picker
+        db.Index('ix_books_title_lower', db.func.lower(title)),
+    )
+
     @property
     def is_available(self) -> bool:
         return self.available_quantity > 0
 
-    @property
+    @hybrid_property
     def available_quantity(self) -> int:
-        try:
-            # Lazy import to avoid circular dependency at import time
-            from app.models.loan import LoanStatus  # type: ignore
-        except Exception:
-            LoanStatus = None  # fallback if import cycle during migrations
-        active_loans_count = 0
-        if hasattr(self, 'loans') and self.loans is not None and LoanStatus is not None:
-            active_loans_count = self.loans.filter_by(status=LoanStatus.BORROWED).count()
         qty = self.quantity or 0
-        return max(0, qty - (active_loans_count or 0))
+        return max(0, qty - (self.active_loan_count or 0))
+
+    @available_quantity.inplace.expression
+    @classmethod
+    def _available_quantity_expression(cls):
+        return cls.quantity - cls.active_loan_count
+
+    @staticmethod
+    def adjust_active_loans(book_id: int, delta: int) -> None:
+        """Atomically shift the active loan counter inside the current transaction."""
+        if delta >= 0:
+            new_value = Book.active_loan_count + delta
+        else:
+            new_value = db.case(
+                (Book.active_loan_count + delta > 0, Book.active_loan_count + delta),
+                else_=0,
+            )
+        db.session.query(Book).filter(Book.id == book_id).update(
+            {Book.active_loan_count: new_value}, synchronize_session='fetch'
+        )
+
+    @staticmethod
+    def release_active_loans(counts: dict[int, int]) -> None:
+        """Decrement several books' counters (book_id -> loans returned) in one executemany."""
+        if not counts:
+            return
+        table = Book.__table__
+        remaining = table.c.active_loan_count - db.bindparam('n')
+        db.session.execute(
+            db.update(table)
+            .where(table.c.id == db.bindparam('b_id'))
+            .values(active_loan_count=db.case((remaining > 0, remaining), else_=0)),
+            [{'b_id': book_id, 'n': n} for book_id, n in counts.items()],
+        )
+
+    @staticmethod
+    def reconcile_active_loan_counts() -> int:
+        """Recompute every counter from the loans table; returns rows corrected."""
+        from app.models.loan import Loan, LoanStatus  # lazy import avoids cycle
+
+        actual = (
+            db.select(db.func.count(Loan.id))
+            .where(Loan.book_id == Book.id, Loan.status == LoanStatus.BORROWED)
+            .correlate(Book)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            db.update(Book)
+            .where(Book.active_loan_count != actual)
+            .values(active_loan_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount or 0
 
     def __repr__(self) -> str:
         return f"<Book {self.title} by {self.author}>"
@@ -59,6 +118,7 @@ class Book(db.Model):
             'category_id': self.category_id,
             'category': getattr(self.category, 'name', None) if hasattr(self, 'category') else None,
             'quantity': self.quantity,
+            'available_quantity': self.available_quantity,
             'shelf_location': self.shelf_location,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
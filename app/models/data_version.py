@@ -0,0 +1,15 @@
+from app.extensions import db
+
+
+# Write counters per table, bumped by SQLite triggers (see app/conditional.py).
+# They stamp ETag/Last-Modified validators without counting or scanning rows.
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_versions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    changed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<DataVersion {self.table_name} v{self.version}>"
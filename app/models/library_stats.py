@@ -0,0 +1,21 @@
+from app.extensions import db
+
+
+# Single-row live counters for the home page and reports dashboard. Kept exact
+# by triggers on SQLite and session hooks elsewhere (see app/library_stats.py);
+# ``flask reconcile-stats`` recomputes them from the live tables.
+
+class LibraryStats(db.Model):
+    __tablename__ = 'library_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    total_books = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    active_members = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    books_on_loan = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    overdue_books = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # overdue_books is only valid for this day; the first read on a new day recounts
+    overdue_as_of = db.Column(db.Date, nullable=True)
+    unpaid_fines = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default='0')
+
+    def __repr__(self) -> str:
+        return f"<LibraryStats books={self.total_books} on_loan={self.books_on_loan}>"
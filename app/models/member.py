@@ -20,12 +20,17 @@ class Member(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     phone = db.Column(db.String(20))
     address = db.Column(db.Text)
-    registration_date = db.Column(db.Date, nullable=False, default=date.today)
+    registration_date = db.Column(db.Date, nullable=False, default=date.today, index=True)
     status = db.Column(db.Enum(MemberStatus), nullable=False, default=MemberStatus.ACTIVE)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Case-insensitive prefix lookups for the circulation member picker
+    __table_args__ = (
+        db.Index('ix_members_name_lower', db.func.lower(name)),
+    )
+
     # Circulation relationship: one member has many loans
     loans = db.relationship('Loan', backref='member', lazy='dynamic', cascade='all, delete-orphan')
 
@@ -130,16 +135,53 @@ class Member(db.Model):
         )
         return (result or 0)
 
-    def can_borrow(self) -> tuple[bool, str | None]:
+    @staticmethod
+    def borrowing_summary_columns(member_pk) -> list:
+        """Labeled scalar subqueries for everything ``can_borrow`` needs.
+
+        ``member_pk`` is the members.id expression (or value) to correlate on,
+        so callers can fold eligibility into a query they already run.
+        """
+        from app.models.loan import Loan, LoanStatus  # type: ignore
+        from sqlalchemy import func, select
+
+        active = (
+            select(func.count(Loan.id))
+            .where(Loan.member_id == member_pk, Loan.status == LoanStatus.BORROWED)
+            .scalar_subquery()
+            .label('active_loans')
+        )
+        overdue = (
+            select(func.count(Loan.id))
+            .where(Loan.member_id == member_pk, Loan.status == LoanStatus.BORROWED, Loan.due_date < date.today())
+            .scalar_subquery()
+            .label('overdue_loans')
+        )
+        unpaid = (
+            select(func.coalesce(func.sum(Loan.fine_amount - Loan.fine_paid), 0))
+            .where(Loan.member_id == member_pk, Loan.fine_amount > Loan.fine_paid)
+            .scalar_subquery()
+            .label('unpaid_fines')
+        )
+        return [active, overdue, unpaid]
+
+    def borrowing_summary(self) -> dict:
+        """Active, overdue and unpaid-fine totals in a single round trip."""
+        row = db.session.execute(db.select(*Member.borrowing_summary_columns(self.id))).one()
+        return {'active_loans': row.active_loans, 'overdue_loans': row.overdue_loans, 'unpaid_fines': row.unpaid_fines}
+
+    def can_borrow(self, summary: dict | None = None) -> tuple[bool, str | None]:
         from flask import current_app
         if not self.is_active:
             return False, 'Member is not active.'
-        if self.has_overdue_loans():
+        if summary is None:
+            summary = self.borrowing_summary()
+        if summary['overdue_loans']:
             return False, 'Member has overdue books.'
-        if self.has_unpaid_fines():
-            total = self.total_unpaid_fines()
+        total = summary['unpaid_fines'] or 0
+        if total > 0:
             return False, f'Member has unpaid fines totaling ${total:.2f}.'
         max_active = current_app.config.get('MAX_ACTIVE_LOANS', 5)
-        if self.active_loans_count() >= max_active:
+        if summary['active_loans'] >= max_active:
             return False, f'Member has reached the limit of {max_active} active loans.'
         return True, None
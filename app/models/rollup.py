@@ -0,0 +1,38 @@
+from app.extensions import db
+
+
+# Daily circulation rollups. Maintained by triggers on ``loans`` (see
+# app/reports/rollups.py) and rebuilt with ``flask rebuild-rollups``; they have
+# no foreign keys so deleting a book or member never has to touch them first.
+
+class DailyLoanStat(db.Model):
+    __tablename__ = 'loan_stats_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    loans = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    returns = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self) -> str:
+        return f"<DailyLoanStat {self.day} loans={self.loans} returns={self.returns}>"
+
+
+class DailyBookLoanStat(db.Model):
+    __tablename__ = 'loan_stats_daily_book'
+
+    day = db.Column(db.Date, primary_key=True)
+    book_id = db.Column(db.Integer, primary_key=True, index=True)
+    loans = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self) -> str:
+        return f"<DailyBookLoanStat {self.day} book={self.book_id} loans={self.loans}>"
+
+
+class DailyMemberLoanStat(db.Model):
+    __tablename__ = 'loan_stats_daily_member'
+
+    day = db.Column(db.Date, primary_key=True)
+    member_id = db.Column(db.Integer, primary_key=True, index=True)
+    loans = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self) -> str:
+        return f"<DailyMemberLoanStat {self.day} member={self.member_id} loans={self.loans}>"
@@ -2,9 +2,8 @@ from datetime import datetime
 from enum import Enum
 
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-
 from app.extensions import db
+from app.passwords import hash_password, needs_rehash, verify_password
 
 
 class UserRole(Enum):
@@ -27,10 +26,13 @@ class User(db.Model, UserMixin):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password, method="pbkdf2:sha256")
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self) -> bool:
+        return needs_rehash(self.password_hash)
 
     def has_role(self, role: "UserRole") -> bool:
         if self.role == UserRole.ADMIN:
@@ -0,0 +1,207 @@
+"""Cursor (keyset) pagination shared by the list views.
+
+Offset pagination re-reads every skipped row and runs a full ``COUNT(*)`` per
+page view. Keyset pagination seeks on the sort key of the last row seen, so any
+page costs the same as the first one. ``paginate_query`` picks the mode from
+``PAGINATION_MODE`` (or from a ``cursor`` query arg) so templates can render
+either through ``macros/pagination.html``.
+"""
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import operators
+
+
+class KeysetPagination:
+    """Page of results positioned by an opaque cursor instead of a page number."""
+
+    is_keyset = True
+    page = None
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+    def iter_pages(self, *args, **kwargs):
+        return iter(())
+
+
+# ===== Cursor encoding =====
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return ['dt', value.isoformat()]
+    if isinstance(value, date):
+        return ['d', value.isoformat()]
+    if isinstance(value, Decimal):
+        return ['n', str(value)]
+    return ['v', value]
+
+
+def _decode_value(pair):
+    kind, raw = pair
+    if kind == 'dt':
+        return datetime.fromisoformat(raw)
+    if kind == 'd':
+        return date.fromisoformat(raw)
+    if kind == 'n':
+        return Decimal(raw)
+    return raw
+
+
+def encode_cursor(values, backwards: bool = False) -> str:
+    payload = {'k': [_encode_value(v) for v in values]}
+    if backwards:
+        payload['b'] = 1
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(token: str):
+    """Return ``(values, backwards)`` or ``None`` if the token is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return [_decode_value(p) for p in payload['k']], bool(payload.get('b'))
+    except Exception:
+        return None
+
+
+# ===== Cached totals =====
+class _CountCache:
+    """Small TTL/LRU cache of COUNT results keyed by the SQL being counted."""
+
+    def __init__(self, max_entries: int = 256):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get_or_compute(self, key, ttl: float, compute):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit and hit[0] > now:
+                self._data.move_to_end(key)
+                return hit[1]
+        value = compute()
+        with self._lock:
+            self._data[key] = (now + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+count_cache = _CountCache()
+
+
+def cached_count(query) -> int:
+    ttl = float(current_app.config.get('PAGINATION_COUNT_TTL', 60))
+    stmt = query.order_by(None).statement
+    compiled = stmt.compile()
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    return count_cache.get_or_compute(key, ttl, lambda: query.order_by(None).count())
+
+
+# ===== Seek predicates =====
+def _unwrap(key):
+    """Split an order_by expression like ``Loan.id.desc()`` into (column, descending)."""
+    modifier = getattr(key, 'modifier', None)
+    if modifier is operators.desc_op:
+        return key.element, True
+    if modifier is operators.asc_op:
+        return key.element, False
+    return key, False
+
+
+def _seek_predicate(columns, values):
+    """Rows strictly after ``values`` in the given (column, descending) order.
+
+    The leading ``>=``/``<=`` term lets the database seek on an index over the
+    first key before the tie-breaking OR chain is evaluated.
+    """
+    def after(col, desc, value):
+        return col < value if desc else col > value
+
+    clauses = []
+    for i, (col, desc) in enumerate(columns):
+        equal_prefix = [c == v for (c, _), v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, after(col, desc, values[i])))
+    first_col, first_desc = columns[0]
+    leading = first_col <= values[0] if first_desc else first_col >= values[0]
+    return and_(leading, or_(*clauses))
+
+
+def _row_key(item, columns):
+    return [getattr(item, col.key) for col, _ in columns]
+
+
+def keyset_paginate(query, sort_keys, per_page: int = 20, cursor: str | None = None, with_total: bool = False):
+    columns = [_unwrap(k) for k in sort_keys]
+    decoded = decode_cursor(cursor) if cursor else None
+    if decoded and len(decoded[0]) != len(columns):
+        decoded = None
+    backwards = bool(decoded and decoded[1])
+
+    total = cached_count(query) if with_total else None
+
+    # Walking backwards flips every sort direction, then the page is reversed.
+    effective = [(col, (not desc) if backwards else desc) for col, desc in columns]
+    q = query.order_by(None).order_by(*[col.desc() if desc else col.asc() for col, desc in effective])
+    if decoded:
+        q = q.filter(_seek_predicate(effective, decoded[0]))
+    rows = q.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        has_next = more if not backwards else True
+        has_prev = bool(decoded) if not backwards else more
+        if has_next:
+            next_cursor = encode_cursor(_row_key(rows[-1], columns))
+        if has_prev:
+            prev_cursor = encode_cursor(_row_key(rows[0], columns), backwards=True)
+    elif decoded and not backwards:
+        # Ran off the end; offer a way back to the last real page.
+        prev_cursor = encode_cursor(decoded[0], backwards=True)
+    return KeysetPagination(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor, total=total)
+
+
+def paginate_query(query, sort_keys, per_page: int = 20, with_total: bool | None = None, allow_keyset: bool = True):
+    """Order ``query`` by ``sort_keys`` and paginate it in the configured mode.
+
+    ``sort_keys`` must end with a unique column (usually the primary key) so
+    keyset cursors are unambiguous.
+    """
+    cursor = request.args.get('cursor', type=str)
+    keyset = allow_keyset and (cursor is not None or current_app.config.get('PAGINATION_MODE', 'offset') == 'keyset')
+    if keyset:
+        if with_total is None:
+            with_total = bool(current_app.config.get('PAGINATION_KEYSET_TOTALS', False))
+        return keyset_paginate(query, sort_keys, per_page=per_page, cursor=cursor, with_total=with_total)
+    page = request.args.get('page', 1, type=int)
+    return query.order_by(*sort_keys).paginate(page=page, per_page=per_page, error_out=False)
@@ -0,0 +1,101 @@
+"""Password hashing with a configurable cost, run on a bounded worker pool.
+
+``PASSWORD_HASH_METHOD`` (``pbkdf2:sha256`` or ``scrypt``) and
+``PASSWORD_HASH_COST`` (PBKDF2 iterations or the scrypt N; 0 keeps
+Werkzeug's default) choose the hash for new passwords. Hashing and
+verification run on a pool of ``PASSWORD_HASH_WORKERS`` threads (hashlib
+releases the GIL) or processes (0 hashes on the request thread), so a burst of logins at shift change costs at
+most that many cores, and the rest of the request workers keep running. A
+call that cannot get a pool slot within ``PASSWORD_HASH_TIMEOUT`` seconds
+raises ``PasswordHasherBusy`` instead of queueing without limit.
+
+Stored hashes carry their own method and cost, so changing the settings
+never locks anyone out: ``needs_rehash`` spots an old hash and the login
+view replaces it with the password the user just typed.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METHODS = ('pbkdf2:sha256', 'scrypt')
+DEFAULT_METHOD = 'pbkdf2:sha256'
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+# Method string -> the "method:params" prefix Werkzeug writes for it
+_prefixes: dict = {}
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Every pool slot stayed taken for ``PASSWORD_HASH_TIMEOUT`` seconds."""
+
+
+def method_string(method: str = DEFAULT_METHOD, cost: int = 0) -> str:
+    """Werkzeug ``method`` argument for ``method`` at ``cost``."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown PASSWORD_HASH_METHOD {method!r} (use {' or '.join(METHODS)}).")
+    if not cost:
+        return method
+    if method == 'scrypt':
+        return f'scrypt:{cost}:8:1'
+    return f'{method}:{cost}'
+
+
+def configured_method() -> str:
+    if not has_app_context():
+        return DEFAULT_METHOD
+    config = current_app.config
+    return method_string(config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD), int(config.get('PASSWORD_HASH_COST', 0)))
+
+
+def _prefix(method: str) -> str:
+    if method not in _prefixes:
+        # Werkzeug fills in its defaults; hashing once tells us exactly what it writes
+        _prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return _prefixes[method]
+
+
+def needs_rehash(pwhash: str) -> bool:
+    """True when ``pwhash`` was made with a different method or cost than configured."""
+    return pwhash.split('$', 1)[0] != _prefix(configured_method())
+
+
+def _get_pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            config = current_app.config
+            workers = int(config.get('PASSWORD_HASH_WORKERS', 2))
+            if config.get('PASSWORD_HASH_EXECUTOR', 'thread') == 'process':
+                # spawn, not fork: the web process has threads and open DB connections
+                _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+            _slots = threading.BoundedSemaphore(workers)
+    return _executor, _slots
+
+
+def _run(fn, *args):
+    if not has_app_context() or int(current_app.config.get('PASSWORD_HASH_WORKERS', 2)) <= 0:
+        return fn(*args)
+    executor, slots = _get_pool()
+    # One slot per worker: callers wait here, not in an unbounded pool queue
+    if not slots.acquire(timeout=float(current_app.config.get('PASSWORD_HASH_TIMEOUT', 10))):
+        raise PasswordHasherBusy('Password hashing pool is saturated.')
+    try:
+        return executor.submit(fn, *args).result()
+    finally:
+        slots.release()
+
+
+def hash_password(password: str) -> str:
+    return _run(generate_password_hash, password, configured_method())
+
+
+def verify_password(pwhash: str, password: str) -> bool:
+    return _run(check_password_hash, pwhash, password)
+
@@ -0,0 +1,100 @@
+"""Per-request SQL statement counting with an optional budget assertion.
+
+Views declare how many statements they are allowed with ``@query_budget(n)``.
+When ``QUERY_COUNT_ASSERT`` is enabled (the testing config turns it on) any
+request that exceeds its budget raises ``QueryBudgetExceeded`` so N+1
+regressions fail loudly instead of silently slowing pages down.
+"""
+import threading
+from contextlib import contextmanager
+
+from flask import Flask, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements: list[str] = []
+
+    def record(self, statement: str) -> None:
+        self.count += 1
+        self.statements.append(statement)
+
+
+_local = threading.local()
+
+
+def _active_counters() -> list:
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    return counters
+
+
+@contextmanager
+def count_queries():
+    """Count statements executed on this thread inside the block.
+
+    Usage in a test::
+
+        with count_queries() as counter:
+            client.post('/circulation/borrow', data=...)
+        assert counter.count <= 3
+    """
+    counter = QueryCounter()
+    counters = _active_counters()
+    counters.append(counter)
+    try:
+        yield counter
+    finally:
+        counters.remove(counter)
+
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of SQL statements a view may issue."""
+    def decorator(f):
+        # Outer decorators built with functools.wraps copy this attribute up
+        # to the function Flask registers.
+        f._query_budget = max_queries
+        return f
+
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for counter in _active_counters():
+        counter.record(statement)
+    if has_app_context():
+        counter = g.get('_request_query_counter')
+        if counter is not None:
+            counter.record(statement)
+
+
+def init_query_counter(app: Flask) -> None:
+    if not getattr(init_query_counter, '_listening', False):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        init_query_counter._listening = True
+
+    @app.before_request
+    def _start_request_counter():
+        g._request_query_counter = QueryCounter()
+
+    @app.after_request
+    def _check_query_budget(response):
+        counter = g.get('_request_query_counter')
+        if counter is None or not app.config.get('QUERY_COUNT_ASSERT', False):
+            return response
+        view = app.view_functions.get(request.endpoint) if request.endpoint else None
+        budget = getattr(view, '_query_budget', None)
+        if budget is not None and counter.count > budget:
+            raise QueryBudgetExceeded(
+                f"{request.endpoint} issued {counter.count} SQL statements (budget {budget}):\n"
+                + '\n'.join(counter.statements)
+            )
+        return response
@@ -0,0 +1,208 @@
+"""Token-bucket rate limiting for endpoints that scripted clients hammer.
+
+Views opt in with ``@rate_limit('10/minute')``. Each client gets a bucket per
+scope (the endpoint name unless ``scope=`` groups several views). The bucket
+holds up to the limit's count in tokens and refills at count/period per
+second; a request takes one token or gets ``429 Too Many Requests`` with a
+``Retry-After`` header. Clients are keyed by user id when signed in, so
+staff behind one NAT address do not share a bucket, and by IP address
+otherwise. Pass ``by='ip'`` or ``by='user'`` to choose explicitly.
+
+``RATE_LIMITS`` overrides a scope's limit without a code change, e.g.
+``"auth.login=5/minute,chart-data=0"`` (0 turns the limit off).
+
+Stores, chosen with ``RATE_LIMIT_STORAGE``:
+
+* ``memory`` (default): an in-process LRU of buckets, O(1) per check.
+  Each worker enforces the limit on its own, so N workers admit up to N
+  times the limit.
+* ``sqlite``: buckets in a SQLite file (``RATE_LIMIT_PATH``) shared by every
+  worker on the host, updated in one short write transaction per check.
+
+``flask bench-rate-limit`` measures the cost of one check.
+"""
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Flask, current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+_LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+
+def parse_limit(value: str) -> tuple[int, float] | None:
+    """``"10/minute"`` or ``"100/5 minutes"`` -> (capacity, tokens per second); "0" -> None."""
+    if str(value).strip() == '0':
+        return None
+    match = _LIMIT_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Bad rate limit {value!r} (use e.g. '10/minute' or '100/5 minutes').")
+    count, multiple, period = int(match.group(1)), int(match.group(2) or 1), match.group(3)
+    if count <= 0:
+        return None
+    return count, count / (multiple * _PERIODS[period])
+
+
+def _take(tokens: float, updated: float, now: float, capacity: int, rate: float) -> tuple[float, float]:
+    """(tokens left, seconds until one is available) after trying to take one."""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryStore:
+    """key -> [tokens, updated]; least recently used buckets are dropped past ``max_keys``."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def hit(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(capacity), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            bucket[0], wait = _take(bucket[0], bucket[1], now, capacity, rate)
+            bucket[1] = now
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file shared by all workers on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, capacity: int, rate: float) -> float:
+        conn = self._connect()
+        now = time.time()
+        # IMMEDIATE: read-modify-write without another worker slipping in between
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            tokens, wait = _take(*(row or (float(capacity), now)), now, capacity, rate)
+            conn.execute(
+                "INSERT INTO rate_limits(key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM rate_limits")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+class RateLimiter:
+    """The configured store plus per-scope limit overrides."""
+
+    def __init__(self):
+        self.store = MemoryStore()
+        self.storage_name = 'memory'
+        self.overrides: dict[str, tuple[int, float] | None] = {}
+
+    def configure(self, store, storage_name: str, overrides: dict) -> None:
+        self.store = store
+        self.storage_name = storage_name
+        self.overrides = overrides
+
+    def limit_for(self, scope: str, default: tuple[int, float] | None):
+        return self.overrides.get(scope, default)
+
+    def hit(self, key: str, capacity: int, rate: float) -> float:
+        """Take a token from ``key``'s bucket; returns 0 or the seconds to wait."""
+        return self.store.hit(key, capacity, rate)
+
+
+limiter = RateLimiter()
+
+
+def client_key(by: str = 'auto') -> str:
+    if by != 'ip' and current_user.is_authenticated:
+        return f'user:{current_user.get_id()}'
+    return f'ip:{request.remote_addr or "-"}'
+
+
+def rate_limit(limit: str, scope: str | None = None, by: str = 'auto', methods=None):
+    """Allow ``limit`` (e.g. ``'10/minute'``) requests per client to the view.
+
+    ``methods`` restricts counting to those HTTP methods (e.g. only POSTs to
+    a login form). Views sharing a ``scope`` share a bucket.
+    """
+    default = parse_limit(limit)
+    methods = {m.upper() for m in methods} if methods else None
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_app.config.get('RATE_LIMIT_ENABLED', True) and (methods is None or request.method in methods):
+                name = scope or request.endpoint
+                parsed = limiter.limit_for(name, default)
+                if parsed is not None:
+                    wait = limiter.hit(f'{name}|{client_key(by)}', *parsed)
+                    if wait:
+                        raise TooManyRequests(retry_after=math.ceil(wait))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _parse_overrides(value) -> dict:
+    """Accept a dict or ``"auth.login=5/minute,chart-data=0"``."""
+    items = value.items() if isinstance(value, dict) else (
+        part.split('=', 1) for part in (value or '').split(',') if '=' in part
+    )
+    return {name.strip(): parse_limit(spec) for name, spec in items}
+
+
+def init_rate_limit(app: Flask) -> None:
+    storage = str(app.config.get('RATE_LIMIT_STORAGE', 'memory')).lower()
+    if storage == 'sqlite':
+        store = SQLiteStore(app.config['RATE_LIMIT_PATH'])
+    elif storage == 'memory':
+        store = MemoryStore(max_keys=int(app.config.get('RATE_LIMIT_MAX_KEYS', 100_000)))
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_STORAGE {storage!r} (use memory or sqlite).")
+    limiter.configure(store, storage, _parse_overrides(app.config.get('RATE_LIMITS')))
@@ -1,5 +1,9 @@
 from flask import Blueprint
 
+from app.db_routing import use_read_bind
+
 bp = Blueprint('reports', __name__, url_prefix='/reports')
+# Report queries and exports read from the read-only bind
+bp.before_request(use_read_bind)
 
 from app.reports import routes  # noqa: E402
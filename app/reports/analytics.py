@@ -0,0 +1,273 @@
+"""Vectorized circulation analytics over an in-memory columnar loan snapshot.
+
+``LoanSnapshot`` keeps the loan columns the analyses need in contiguous
+NumPy arrays (dates as days since 1970-01-01, missing values as -1). The
+first use loads them in bulk. After that, each refresh reads only loans
+above the ``Loan.id`` high-water mark, plus rows whose ``updated_at`` moved
+(returns, fine accrual). It falls back to a full reload when rows were
+deleted. Refreshes are rate-limited by ``ANALYTICS_REFRESH_SECONDS``.
+
+NumPy is optional: without it ``analytics_available()`` is False and the
+analytics routes say so instead of failing.
+"""
+import threading
+import time
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import case, extract, func
+
+from app.extensions import db
+from app.models import Loan, LoanStatus
+from app.models.loan import days_between
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+EPOCH = date(1970, 1, 1)
+MISSING = -1
+
+# (column name, dtype, SQL expression) in SELECT order
+_FIELDS = (
+    ('id', 'i8', Loan.id),
+    ('book_id', 'i4', Loan.book_id),
+    ('member_id', 'i4', Loan.member_id),
+    ('borrow', 'i4', days_between(db.literal(EPOCH, db.Date), Loan.borrow_date)),
+    ('due', 'i4', days_between(db.literal(EPOCH, db.Date), Loan.due_date)),
+    ('returned', 'i4', func.coalesce(days_between(db.literal(EPOCH, db.Date), Loan.return_date), MISSING)),
+    ('is_returned', 'i1', case((Loan.status == LoanStatus.RETURNED, 1), else_=0)),
+    ('fine', 'f8', db.cast(Loan.fine_amount, db.Float)),
+    # 0 = Sunday, as strftime('%w') / extract(dow)
+    ('weekday', 'i1', func.coalesce(extract('dow', Loan.created_at), MISSING)),
+    ('hour', 'i1', func.coalesce(extract('hour', Loan.created_at), MISSING)),
+)
+
+LOAD_BATCH = 50_000
+
+
+def analytics_available() -> bool:
+    return np is not None
+
+
+def to_day(value: date) -> int:
+    return (value - EPOCH).days
+
+
+class LoanSnapshot:
+    """Columnar copy of ``loans``; read the arrays only after ``refresh()``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dtype = np.dtype([(name, dtype) for name, dtype, _ in _FIELDS])
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype, _ in _FIELDS}
+        self.id_hwm = 0
+        self.updated_hwm = None
+        self.refreshed_at = 0.0
+        self.stats = {'full_loads': 0, 'incremental': 0, 'rows_appended': 0, 'rows_patched': 0}
+
+    def __len__(self) -> int:
+        return len(self.columns['id'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def _fetch(self, *criteria):
+        """Rows matching ``criteria`` as one structured array, read in batches."""
+        stmt = db.select(*(expr for _, _, expr in _FIELDS)).where(*criteria).order_by(Loan.id)
+        parts = []
+        result = db.session.execute(stmt.execution_options(yield_per=LOAD_BATCH))
+        for partition in result.partitions():
+            parts.append(np.array([tuple(row) for row in partition], dtype=self._dtype))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=self._dtype)
+
+    def _append(self, rows) -> None:
+        for name in self.columns:
+            self.columns[name] = np.concatenate([self.columns[name], rows[name]])
+
+    def _patch(self, rows) -> int:
+        ids = self.columns['id']
+        pos = np.searchsorted(ids, rows['id'])
+        found = (pos < len(ids)) & (ids[np.minimum(pos, len(ids) - 1)] == rows['id'])
+        pos, rows = pos[found], rows[found]
+        for name in self.columns:
+            self.columns[name][pos] = rows[name]
+        return len(rows)
+
+    def _reset(self) -> None:
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype, _ in _FIELDS}
+        self.id_hwm = 0
+        self.updated_hwm = None
+
+    def refresh(self, force: bool = False) -> 'LoanSnapshot':
+        interval = float(current_app.config.get('ANALYTICS_REFRESH_SECONDS', 30))
+        with self._lock:
+            if not force and len(self) and time.monotonic() - self.refreshed_at < interval:
+                return self
+            # Taken before reading rows. Strictly-greater below: a bulk job
+            # stamps many rows with one timestamp, and >= would re-read all
+            # of them on every refresh.
+            updated_hwm = db.session.query(func.max(Loan.updated_at)).scalar()
+            if self.id_hwm and self.updated_hwm is not None:
+                changed = self._fetch(Loan.id <= self.id_hwm, Loan.updated_at > self.updated_hwm)
+                self.stats['rows_patched'] += self._patch(changed)
+                self.stats['incremental'] += 1
+            else:
+                self._reset()
+                self.stats['full_loads'] += 1
+            new_rows = self._fetch(Loan.id > self.id_hwm)
+            self._append(new_rows)
+            self.stats['rows_appended'] += len(new_rows)
+            if len(self):
+                self.id_hwm = int(self.columns['id'][-1])
+            self.updated_hwm = updated_hwm
+            # Deleted loans never show up as changes; a count mismatch means reload
+            count = db.session.query(func.count(Loan.id)).filter(Loan.id <= self.id_hwm).scalar()
+            if count != len(self):
+                self._reset()
+                self.stats['full_loads'] += 1
+                self._append(self._fetch())
+                if len(self):
+                    self.id_hwm = int(self.columns['id'][-1])
+                self.updated_hwm = updated_hwm
+            self.refreshed_at = time.monotonic()
+            return self
+
+
+_snapshots: dict = {}
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot() -> LoanSnapshot:
+    """This process's snapshot for the current database, refreshed if stale."""
+    key = str(db.engine.url)
+    with _snapshots_lock:
+        snap = _snapshots.get(key)
+        if snap is None:
+            snap = _snapshots[key] = LoanSnapshot()
+    return snap.refresh()
+
+
+# ===== Analyses (all take a refreshed snapshot and an optional borrow-date range) =====
+def _in_range(snap: LoanSnapshot, start_date=None, end_date=None):
+    mask = np.ones(len(snap), dtype=bool)
+    if start_date:
+        mask &= snap['borrow'] >= to_day(start_date)
+    if end_date:
+        mask &= snap['borrow'] <= to_day(end_date)
+    return mask
+
+
+def _returned(snap: LoanSnapshot, mask):
+    return mask & (snap['is_returned'] == 1) & (snap['returned'] != MISSING)
+
+
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+DURATION_BINS = ((0, 0, 'Same day'), (1, 3, '1-3'), (4, 7, '4-7'), (8, 14, '8-14'),
+                 (15, 21, '15-21'), (22, 30, '22-30'), (31, 60, '31-60'), (61, None, '60+'))
+LATENESS_BINS = ((None, -1, 'Early'), (0, 0, 'On time'), (1, 7, '1-7 days late'),
+                 (8, 14, '8-14 days late'), (15, 30, '15-30 days late'), (31, None, '30+ days late'))
+
+
+def _histogram(values, bins) -> dict:
+    counts = {}
+    for low, high, label in bins:
+        sel = np.ones(len(values), dtype=bool)
+        if low is not None:
+            sel &= values >= low
+        if high is not None:
+            sel &= values <= high
+        counts[label] = int(np.count_nonzero(sel))
+    return counts
+
+
+def _percentiles(values) -> dict:
+    if not len(values):
+        return {f'p{p}': None for p in PERCENTILES}
+    return {f'p{p}': round(float(v), 1) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def loan_duration_stats(snap: LoanSnapshot, start_date=None, end_date=None) -> dict:
+    """Days from borrow to return for returned loans borrowed in the range."""
+    sel = _returned(snap, _in_range(snap, start_date, end_date))
+    durations = snap['returned'][sel] - snap['borrow'][sel]
+    return {
+        'count': int(len(durations)),
+        'mean': round(float(durations.mean()), 1) if len(durations) else None,
+        'percentiles': _percentiles(durations),
+        'histogram': _histogram(durations, DURATION_BINS),
+    }
+
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def weekday_hour_heatmap(snap: LoanSnapshot, start_date=None, end_date=None) -> dict:
+    """Checkouts per weekday (Mon..Sun) and hour of day, from ``created_at``."""
+    sel = _in_range(snap, start_date, end_date) & (snap['weekday'] != MISSING) & (snap['hour'] != MISSING)
+    # dow counts from Sunday; shift so Monday is row 0
+    weekday = (snap['weekday'][sel].astype(np.int64) + 6) % 7
+    cells = np.bincount(weekday * 24 + snap['hour'][sel], minlength=7 * 24).reshape(7, 24)
+    return {
+        'weekdays': list(WEEKDAYS),
+        'hours': list(range(24)),
+        'values': cells.tolist(),
+        'max': int(cells.max()) if cells.size else 0,
+        'total': int(cells.sum()),
+    }
+
+
+ABC_THRESHOLDS = (('A', 0.80), ('B', 0.95), ('C', 1.0))
+
+
+def pareto_abc(snap: LoanSnapshot, start_date=None, end_date=None, top: int = 20, curve_points: int = 100) -> dict:
+    """ABC classes of books by share of loans, plus a downsampled Pareto curve."""
+    book_ids, counts = np.unique(snap['book_id'][_in_range(snap, start_date, end_date)], return_counts=True)
+    order = np.argsort(-counts, kind='stable')
+    book_ids, counts = book_ids[order], counts[order]
+    total = int(counts.sum())
+    n = len(counts)
+    result = {'books': n, 'loans': total, 'classes': {}, 'curve': {'labels': [], 'values': []}, 'top': []}
+    if not n:
+        return result
+    cum_share = np.cumsum(counts) / total
+    # A book belongs to the first class whose threshold its cumulative share
+    # (before adding itself) has not yet reached
+    prev_share = np.concatenate([[0.0], cum_share[:-1]])
+    classes = np.full(n, 'C', dtype='<U1')
+    for label, threshold in reversed(ABC_THRESHOLDS[:-1]):
+        classes[prev_share < threshold] = label
+    for label, _ in ABC_THRESHOLDS:
+        sel = classes == label
+        result['classes'][label] = {
+            'books': int(sel.sum()),
+            'share_of_books': round(float(sel.sum()) / n * 100, 1),
+            'share_of_loans': round(float(counts[sel].sum()) / total * 100, 1),
+        }
+    idx = np.unique(np.linspace(0, n - 1, min(n, curve_points)).astype(np.int64))
+    result['curve'] = {
+        'labels': [round(float(i + 1) / n * 100, 1) for i in idx],
+        'values': [round(float(cum_share[i]) * 100, 1) for i in idx],
+    }
+    result['top'] = [
+        {'book_id': int(b), 'loans': int(c), 'cumulative_share': round(float(s) * 100, 1), 'class': str(k)}
+        for b, c, s, k in zip(book_ids[:top], counts[:top], cum_share[:top], classes[:top])
+    ]
+    return result
+
+
+def lateness_distribution(snap: LoanSnapshot, start_date=None, end_date=None) -> dict:
+    """Days between due date and return for returned loans, with fines."""
+    sel = _returned(snap, _in_range(snap, start_date, end_date))
+    lateness = snap['returned'][sel] - snap['due'][sel]
+    fines = snap['fine'][sel]
+    late = lateness > 0
+    return {
+        'count': int(len(lateness)),
+        'on_time_rate': round(float((~late).mean()) * 100, 1) if len(lateness) else None,
+        'late_percentiles': _percentiles(lateness[late]),
+        'histogram': _histogram(lateness, LATENESS_BINS),
+        'fines_total': round(float(fines.sum()), 2),
+        'fine_per_late_return': round(float(fines[late].mean()), 2) if late.any() else None,
+    }
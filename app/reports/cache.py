@@ -0,0 +1,341 @@
+"""Report result cache with per-report TTLs and write-driven invalidation.
+
+Report functions in ``app.reports.utils`` are wrapped with
+``@cached_report(name, tables)``. Results are keyed by report name, today's
+date and the normalized arguments (date ranges as ISO dates), and dropped as
+soon as a session commit has written to one of the tables the report reads.
+Writes are detected from flushed objects and from ORM ``insert``/``update``/
+``delete`` statements run through a session. Raw SQL on the engine is not
+seen; it is picked up when the TTL expires.
+
+Backends, chosen with ``REPORT_CACHE_BACKEND``:
+
+* ``memory`` (default): in-process LRU. Invalidation only reaches the
+  process that committed, so other workers can serve stale results until
+  the TTL expires.
+* ``sqlite``: a local SQLite file (``REPORT_CACHE_PATH``) shared by every
+  worker on the host. Invalidation from any worker is seen by all.
+* ``none``: caching disabled; counters still record misses.
+
+Results must be plain data (tuples, dicts, dates, numbers), never ORM
+instances, since they outlive the session that loaded them.
+"""
+import functools
+import inspect
+import json
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MemoryBackend:
+    """LRU of (expires, tags, value), bounded by ``max_entries``."""
+
+    def __init__(self, max_entries: int = 256):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return False, None
+            if hit[0] <= now:
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, hit[2]
+
+    def set(self, key, value, ttl: float, tags) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, frozenset(tags), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, tags) -> int:
+        tags = set(tags)
+        with self._lock:
+            stale = [k for k, (_, entry_tags, _) in self._data.items() if entry_tags & tags]
+            for k in stale:
+                del self._data[k]
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Pickled entries in a SQLite file shared by all workers on the host."""
+
+    def __init__(self, path: str, max_entries: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS report_cache ("
+                "key TEXT PRIMARY KEY, tags TEXT NOT NULL, expires REAL NOT NULL, "
+                "used REAL NOT NULL, value BLOB NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_report_cache_used ON report_cache(used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute("SELECT expires, value FROM report_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] <= now:
+            return False, None
+        with conn:
+            conn.execute("UPDATE report_cache SET used = ? WHERE key = ?", (now, key))
+        return True, pickle.loads(row[1])
+
+    def set(self, key, value, ttl: float, tags) -> None:
+        conn = self._connect()
+        now = time.time()
+        # Tags are stored comma-delimited on both ends so LIKE '%,name,%' is exact
+        tag_str = ',' + ','.join(sorted(tags)) + ','
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO report_cache(key, tags, expires, used, value) VALUES (?, ?, ?, ?, ?)",
+                (key, tag_str, now + ttl, now, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+            conn.execute("DELETE FROM report_cache WHERE expires <= ?", (now,))
+            conn.execute(
+                "DELETE FROM report_cache WHERE key IN ("
+                "SELECT key FROM report_cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def invalidate(self, tags) -> int:
+        tags = sorted(set(tags))
+        if not tags:
+            return 0
+        conn = self._connect()
+        where = ' OR '.join('tags LIKE ?' for _ in tags)
+        with conn:
+            cur = conn.execute(f"DELETE FROM report_cache WHERE {where}", [f'%,{t},%' for t in tags])
+        return cur.rowcount
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM report_cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+
+
+class NullBackend:
+    def get(self, key):
+        return False, None
+
+    def set(self, key, value, ttl: float, tags) -> None:
+        pass
+
+    def invalidate(self, tags) -> int:
+        return 0
+
+    def clear(self) -> None:
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+
+class ReportCache:
+    """The configured backend plus per-report hit/miss counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.backend = MemoryBackend()
+        self.backend_name = 'memory'
+        self.default_ttl = 300.0
+        self.ttls: dict[str, float] = {}
+        self.reset_stats()
+
+    def configure(self, backend, backend_name: str, default_ttl: float, ttls: dict[str, float]) -> None:
+        self.backend = backend
+        self.backend_name = backend_name
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits: dict[str, int] = {}
+            self.misses: dict[str, int] = {}
+            self.invalidations = 0
+            self.evicted = 0
+
+    def _count(self, counter: dict, name: str) -> None:
+        with self._lock:
+            counter[name] = counter.get(name, 0) + 1
+
+    def get_or_compute(self, name: str, key: str, tables, compute):
+        ttl = self.ttls.get(name, self.default_ttl)
+        if ttl <= 0:
+            self._count(self.misses, name)
+            return compute()
+        found, value = self.backend.get(key)
+        if found:
+            self._count(self.hits, name)
+            return value
+        self._count(self.misses, name)
+        value = compute()
+        self.backend.set(key, value, ttl, tables)
+        return value
+
+    def invalidate(self, tables) -> int:
+        dropped = self.backend.invalidate(tables)
+        with self._lock:
+            self.invalidations += 1
+            self.evicted += dropped
+        return dropped
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            reports = {
+                n: {'hits': self.hits.get(n, 0), 'misses': self.misses.get(n, 0)} for n in names
+            }
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            stats = {
+                'backend': self.backend_name,
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+                'invalidations': self.invalidations,
+                'evicted': self.evicted,
+                'reports': reports,
+            }
+        stats['entries'] = len(self.backend)
+        return stats
+
+
+report_cache = ReportCache()
+
+
+def _normalize(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def cached_report(name: str, tables):
+    """Cache a report function's result until ``tables`` are written or the TTL passes."""
+    tables = frozenset(tables)
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            # Today is part of the key: default ranges and overdue ages move daily
+            params = {k: _normalize(v) for k, v in bound.arguments.items()}
+            key = f"{name}:{date.today().isoformat()}:{json.dumps(params, sort_keys=True, default=str)}"
+            return report_cache.get_or_compute(name, key, tables, lambda: fn(*args, **kwargs))
+
+        wrapper.uncached = fn
+        return wrapper
+
+    return decorator
+
+
+# ===== Write tracking =====
+_WRITTEN = 'report_cache_tables'
+
+
+def _written(session) -> set:
+    return session.info.setdefault(_WRITTEN, set())
+
+
+def _track_flush(session, flush_context) -> None:
+    written = _written(session)
+    for obj in session.new:
+        written.add(obj.__table__.name)
+    for obj in session.deleted:
+        written.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            written.add(obj.__table__.name)
+
+
+def _track_orm_execute(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _written(state.session).add(table.name)
+
+
+def _invalidate_after_commit(session) -> None:
+    written = session.info.pop(_WRITTEN, None)
+    if written:
+        report_cache.invalidate(written)
+
+
+def _discard_after_rollback(session) -> None:
+    session.info.pop(_WRITTEN, None)
+
+
+def _parse_ttls(value) -> dict[str, float]:
+    """Accept a dict or ``"most_borrowed=60,overdue_summary=30"``."""
+    if isinstance(value, dict):
+        return {k: float(v) for k, v in value.items()}
+    ttls = {}
+    for part in (value or '').split(','):
+        if '=' in part:
+            name, seconds = part.split('=', 1)
+            ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+def init_report_cache(app: Flask) -> None:
+    backend_name = str(app.config.get('REPORT_CACHE_BACKEND', 'memory')).lower()
+    max_entries = int(app.config.get('REPORT_CACHE_MAX_ENTRIES', 256))
+    if backend_name == 'sqlite':
+        backend = SQLiteBackend(app.config['REPORT_CACHE_PATH'], max_entries=max_entries)
+    elif backend_name == 'none':
+        backend = NullBackend()
+    elif backend_name == 'memory':
+        backend = MemoryBackend(max_entries=max_entries)
+    else:
+        raise ValueError(f"Unknown REPORT_CACHE_BACKEND {backend_name!r} (use memory, sqlite or none).")
+    report_cache.configure(
+        backend,
+        backend_name,
+        default_ttl=float(app.config.get('REPORT_CACHE_TTL', 300)),
+        ttls=_parse_ttls(app.config.get('REPORT_CACHE_TTLS')),
+    )
+    if not getattr(init_report_cache, '_listening', False):
+        event.listen(Session, 'after_flush', _track_flush)
+        event.listen(Session, 'do_orm_execute', _track_orm_execute)
+        event.listen(Session, 'after_commit', _invalidate_after_commit)
+        event.listen(Session, 'after_rollback', _discard_after_rollback)
+        init_report_cache._listening = True
@@ -1,7 +1,7 @@
 from datetime import date, timedelta
 
 from flask_wtf import FlaskForm
-from wtforms import DateField, SelectField, SubmitField
+from wtforms import BooleanField, DateField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Optional, ValidationError
 
 
@@ -20,6 +20,24 @@ class DateRangeForm(FlaskForm):
                 raise ValidationError('End date cannot be in the future.')
 
 
+class TrendsForm(DateRangeForm):
+    resolution = SelectField(
+        'Resolution',
+        validators=[Optional()],
+        coerce=str,
+        default='auto',
+        choices=[
+            ('auto', 'Automatic'),
+            ('day', 'Daily'),
+            ('week', 'Weekly'),
+            ('month', 'Monthly'),
+            ('year', 'Yearly'),
+        ],
+    )
+    returns = BooleanField('Returns')
+    overdue = BooleanField('Overdue')
+
+
 class ReportTypeForm(FlaskForm):
     report_type = SelectField(
         'Report Type',
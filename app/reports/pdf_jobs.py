@@ -0,0 +1,171 @@
+"""Background PDF rendering with an on-disk artifact cache.
+
+The request renders the report HTML (cheap; the data comes from the report
+cache) and hands it to a process pool for WeasyPrint, so no WSGI worker is
+pinned for seconds of CPU. A job is identified by the report name plus a
+digest of its parameters and rendered HTML. The HTML digest is the data
+version: the same report over unchanged data maps to the same job, and its
+PDF in ``PDF_CACHE_DIR`` is served as a static file until pruned.
+
+Job state lives next to the PDF as files (``<job>.json`` when submitted,
+``<job>.pdf`` when done, ``<job>.err`` on failure), so any worker on the
+host can answer a status poll or serve the download.
+"""
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from flask import current_app
+
+_JOB_ID_RE = re.compile(r'^[a-z_]+-[0-9a-f]{32}$')
+
+_executor = None
+_lock = threading.Lock()
+# Futures of jobs submitted by this process
+_pending: dict = {}
+
+
+@dataclass
+class PdfJob:
+    job_id: str
+    status: str  # pending | ready | failed
+    filename: str
+    path: str
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {'job_id': self.job_id, 'status': self.status, 'filename': self.filename, 'error': self.error}
+
+
+def weasyprint_available() -> bool:
+    return importlib.util.find_spec('weasyprint') is not None
+
+
+def render_pdf(html: str, base_url: str, out_path: str) -> str:
+    """Pool worker: render ``html`` to ``out_path``, atomically."""
+    from weasyprint import HTML
+
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    HTML(string=html, base_url=base_url).write_pdf(tmp_path)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        workers = int(current_app.config.get('PDF_WORKERS', 2))
+        if current_app.config.get('PDF_EXECUTOR', 'process') == 'thread':
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf')
+        else:
+            # spawn, not fork: the web process has threads and open DB connections
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    return _executor
+
+
+def _cache_dir() -> str:
+    path = current_app.config['PDF_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _paths(job_id: str) -> dict:
+    base = os.path.join(_cache_dir(), job_id)
+    return {'pdf': f'{base}.pdf', 'meta': f'{base}.json', 'err': f'{base}.err'}
+
+
+def job_id_for(report: str, params: dict, html: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(html.encode('utf-8'))
+    return f'{report}-{digest.hexdigest()[:32]}'
+
+
+def _read_meta(path: str) -> dict | None:
+    try:
+        with open(path, encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def get_job(job_id: str) -> PdfJob | None:
+    """Current state of a job, or None if the id is unknown or malformed."""
+    if not _JOB_ID_RE.match(job_id or ''):
+        return None
+    paths = _paths(job_id)
+    meta = _read_meta(paths['meta'])
+    if meta is None:
+        return None
+    job = PdfJob(job_id, 'pending', meta.get('filename', f'{job_id}.pdf'), paths['pdf'])
+    if os.path.exists(paths['pdf']):
+        job.status = 'ready'
+    elif os.path.exists(paths['err']):
+        job.status = 'failed'
+        with open(paths['err'], encoding='utf-8') as fh:
+            job.error = fh.read().strip() or 'PDF generation failed.'
+    elif job_id not in _pending and time.time() - meta.get('submitted', 0) > float(current_app.config.get('PDF_JOB_TIMEOUT', 300)):
+        # Submitted by a worker that is gone (restart, crash)
+        job.status = 'failed'
+        job.error = 'PDF generation timed out; please export again.'
+    return job
+
+
+def _finish(job_id: str, err_path: str, logger, future) -> None:
+    with _lock:
+        _pending.pop(job_id, None)
+    exc = future.exception()
+    if exc is not None:
+        logger.error('PDF job %s failed: %s', job_id, exc)
+        with open(err_path, 'w', encoding='utf-8') as fh:
+            fh.write('PDF generation failed. Check server logs for details.')
+
+
+def submit(report: str, params: dict, html: str, filename: str, base_url: str) -> PdfJob:
+    """Return the cached PDF's job if it exists, else queue rendering it."""
+    job_id = job_id_for(report, params, html)
+    job = get_job(job_id)
+    if job is not None and job.status in ('ready', 'pending'):
+        return job
+    paths = _paths(job_id)
+    logger = current_app.logger
+    with _lock:
+        if job_id in _pending:
+            return PdfJob(job_id, 'pending', filename, paths['pdf'])
+        if os.path.exists(paths['err']):
+            os.remove(paths['err'])
+        with open(paths['meta'], 'w', encoding='utf-8') as fh:
+            json.dump({'report': report, 'params': params, 'filename': filename, 'submitted': time.time()}, fh, default=str)
+        future = _get_executor().submit(render_pdf, html, base_url, paths['pdf'])
+        _pending[job_id] = future
+    future.add_done_callback(lambda f: _finish(job_id, paths['err'], logger, f))
+    prune_cache()
+    return PdfJob(job_id, 'pending', filename, paths['pdf'])
+
+
+def prune_cache(max_age_hours: float | None = None) -> int:
+    """Delete cached artifacts older than ``PDF_CACHE_MAX_AGE_HOURS``."""
+    if max_age_hours is None:
+        max_age_hours = float(current_app.config.get('PDF_CACHE_MAX_AGE_HOURS', 24))
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    with os.scandir(_cache_dir()) as entries:
+        for entry in entries:
+            name = entry.name.rsplit('.', 1)[0]
+            if name in _pending:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,152 @@
+"""Daily circulation rollups kept current by SQLite triggers on ``loans``.
+
+Every insert, return, delete or re-keying of a loan adjusts the per-day,
+per-day-and-book and per-day-and-member counters in the same transaction,
+whichever code path made the change (views, batch endpoints, bulk SQL, seed
+data). Reports then read O(days) or O(top-K) rows instead of scanning loans.
+On databases without the triggers the report functions fall back to
+aggregating ``loans`` directly.
+"""
+from sqlalchemy import event, text
+
+from app.extensions import db
+from app.models import Loan, LoanStatus, DailyLoanStat, DailyBookLoanStat, DailyMemberLoanStat
+
+TRIGGER_PREFIX = 'loans_rollup'
+
+# Per-engine cache of whether the triggers are installed
+_rollups_enabled: dict = {}
+
+_RETURNED = LoanStatus.RETURNED.name
+
+
+def _add_loan(row: str, sign: str) -> str:
+    """Statements adding (sign '+') or removing ('-') one loan ``row`` (new/old)."""
+    if sign == '+':
+        return (
+            f"INSERT INTO loan_stats_daily(day, loans, returns) VALUES ({row}.borrow_date, 1, 0) "
+            f"ON CONFLICT(day) DO UPDATE SET loans = loans + 1; "
+            f"INSERT INTO loan_stats_daily_book(day, book_id, loans) VALUES ({row}.borrow_date, {row}.book_id, 1) "
+            f"ON CONFLICT(day, book_id) DO UPDATE SET loans = loans + 1; "
+            f"INSERT INTO loan_stats_daily_member(day, member_id, loans) VALUES ({row}.borrow_date, {row}.member_id, 1) "
+            f"ON CONFLICT(day, member_id) DO UPDATE SET loans = loans + 1; "
+        )
+    return (
+        f"UPDATE loan_stats_daily SET loans = loans - 1 WHERE day = {row}.borrow_date; "
+        f"UPDATE loan_stats_daily_book SET loans = loans - 1 WHERE day = {row}.borrow_date AND book_id = {row}.book_id; "
+        f"UPDATE loan_stats_daily_member SET loans = loans - 1 WHERE day = {row}.borrow_date AND member_id = {row}.member_id; "
+    )
+
+
+def _add_return(row: str, sign: str) -> str:
+    returned = f"{row}.status = '{_RETURNED}' AND {row}.return_date IS NOT NULL"
+    if sign == '+':
+        # "WHERE" keeps the parser from reading ON CONFLICT as a join constraint
+        return (
+            f"INSERT INTO loan_stats_daily(day, loans, returns) SELECT {row}.return_date, 0, 1 WHERE {returned} "
+            f"ON CONFLICT(day) DO UPDATE SET returns = returns + 1; "
+        )
+    return f"UPDATE loan_stats_daily SET returns = returns - 1 WHERE {returned} AND day = {row}.return_date; "
+
+
+def _ddl_statements() -> list[str]:
+    p = TRIGGER_PREFIX
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {p}_ai AFTER INSERT ON loans BEGIN "
+        f"{_add_loan('new', '+')}{_add_return('new', '+')}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_ad AFTER DELETE ON loans BEGIN "
+        f"{_add_loan('old', '-')}{_add_return('old', '-')}END",
+        # Returns (and corrections to them); fine/notes updates do not fire this
+        f"CREATE TRIGGER IF NOT EXISTS {p}_au_return AFTER UPDATE OF status, return_date ON loans BEGIN "
+        f"{_add_return('old', '-')}{_add_return('new', '+')}END",
+        f"CREATE TRIGGER IF NOT EXISTS {p}_au_keys AFTER UPDATE OF borrow_date, book_id, member_id ON loans BEGIN "
+        f"{_add_loan('old', '-')}{_add_loan('new', '+')}END",
+    ]
+
+
+def create_rollup_triggers(connection) -> bool:
+    """Install the maintenance triggers. Returns False on non-SQLite databases."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    for stmt in _ddl_statements():
+        connection.exec_driver_sql(stmt)
+    _rollups_enabled.pop(str(connection.engine.url), None)
+    return True
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_rollup_triggers_after_create(target, connection, **kw):
+    create_rollup_triggers(connection)
+
+
+def _rebuild_statements() -> list:
+    borrow = (Loan.borrow_date, Loan.book_id, Loan.member_id)
+    loans_per_day = (
+        db.select(Loan.borrow_date.label('day'), db.func.count(Loan.id).label('loans'))
+        .group_by(Loan.borrow_date)
+        .subquery()
+    )
+    returns_per_day = (
+        db.select(Loan.return_date.label('day'), db.func.count(Loan.id).label('returns'))
+        .where(Loan.status == LoanStatus.RETURNED, Loan.return_date.isnot(None))
+        .group_by(Loan.return_date)
+        .subquery()
+    )
+    # Days that only saw returns still need a row, hence the UNION of days
+    days = db.union(db.select(loans_per_day.c.day), db.select(returns_per_day.c.day)).subquery()
+    daily = (
+        db.select(
+            days.c.day,
+            db.func.coalesce(loans_per_day.c.loans, 0),
+            db.func.coalesce(returns_per_day.c.returns, 0),
+        )
+        .select_from(days)
+        .outerjoin(loans_per_day, loans_per_day.c.day == days.c.day)
+        .outerjoin(returns_per_day, returns_per_day.c.day == days.c.day)
+    )
+    return [
+        db.delete(DailyLoanStat),
+        db.delete(DailyBookLoanStat),
+        db.delete(DailyMemberLoanStat),
+        db.insert(DailyLoanStat).from_select(['day', 'loans', 'returns'], daily),
+        db.insert(DailyBookLoanStat).from_select(
+            ['day', 'book_id', 'loans'],
+            db.select(borrow[0], borrow[1], db.func.count(Loan.id)).group_by(borrow[0], borrow[1]),
+        ),
+        db.insert(DailyMemberLoanStat).from_select(
+            ['day', 'member_id', 'loans'],
+            db.select(borrow[0], borrow[2], db.func.count(Loan.id)).group_by(borrow[0], borrow[2]),
+        ),
+    ]
+
+
+def populate_rollups(connection) -> dict:
+    """Replace the rollup rows with totals recomputed from ``loans``."""
+    for stmt in _rebuild_statements():
+        connection.execute(stmt)
+    return {
+        table: connection.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+        for table in (DailyLoanStat.__tablename__, DailyBookLoanStat.__tablename__, DailyMemberLoanStat.__tablename__)
+    }
+
+
+def rebuild_rollups() -> dict:
+    """Recreate the triggers if needed and recompute every rollup from ``loans``."""
+    with db.engine.begin() as conn:
+        create_rollup_triggers(conn)
+        return populate_rollups(conn)
+
+
+def rollups_enabled() -> bool:
+    engine = db.engine
+    key = str(engine.url)
+    if key not in _rollups_enabled:
+        enabled = False
+        if engine.dialect.name == 'sqlite':
+            with engine.connect() as conn:
+                enabled = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"),
+                    {'name': f'{TRIGGER_PREFIX}_ai'},
+                ).first() is not None
+        _rollups_enabled[key] = enabled
+    return _rollups_enabled[key]
@@ -1,12 +1,24 @@
 from datetime import date, timedelta
 
-from flask import render_template, request, url_for
+from flask import render_template, request, url_for, abort, redirect, make_response, send_file
 from flask_login import login_required, current_user
 
 from app.reports import bp
 from app.auth.decorators import librarian_required
-from app.reports.forms import DateRangeForm
-from app.reports import utils
+from app.reports.forms import DateRangeForm, TrendsForm
+from app.extensions import db
+from app.models import Book
+from app.reports import utils, pdf_jobs, analytics
+from app.reports.cache import report_cache
+from app.reports.exports import FORMATS, iter_rows, stream_export
+from app.pagination import paginate_query
+from app.conditional import conditional, skip_conditional
+from app.rate_limit import rate_limit
+from app.library_stats import get_library_stats
+
+# Tables the reports read; chart data and the dashboard depend on all of them
+REPORT_TABLES = ('loans', 'books', 'members', 'categories')
+MAX_BATCH_CHARTS = 10
 
 
 def _parse_dates_from_request(default_days=None):
@@ -23,34 +35,21 @@ def _parse_dates_from_request(default_days=None):
 @bp.route('/dashboard')
 @login_required
 @librarian_required
+@conditional(*REPORT_TABLES)
 def dashboard():
-    # Overview stats (basic, reuse logic similar to main index)
-    from app.models import Book, Member, Loan, LoanStatus, MemberStatus, Category
-    total_books = Book.query.count()
-    active_members = Member.query.filter_by(status=MemberStatus.ACTIVE).count()
-    books_on_loan = Loan.query.filter(Loan.status == LoanStatus.BORROWED).count()
-    overdue_books = Loan.query.filter(Loan.status == LoanStatus.BORROWED, Loan.due_date < date.today()).count()
-
     # Trends last 30 days
     s30, e30 = utils.get_date_range(days=30)
-    trend_rows = utils.get_circulation_trends(s30, e30)
-    trend_labels = [d.strftime('%Y-%m-%d') for d, _ in trend_rows]
-    trend_values = [c for _, c in trend_rows]
+    trends = utils.get_circulation_trends(s30, e30, resolution='day')
 
     # Books by category
-    cat_rows = utils.get_collection_statistics()['by_category']
+    cat_rows = utils.get_books_by_category()
     cat_labels = [name for name, _ in cat_rows]
     cat_values = [count for _, count in cat_rows]
 
     return render_template(
         'reports/dashboard.html',
-        stats={
-            'total_books': total_books,
-            'active_members': active_members,
-            'books_on_loan': books_on_loan,
-            'overdue_books': overdue_books,
-        },
-        circulation_trend_data={'labels': trend_labels, 'values': trend_values},
+        stats=get_library_stats(),
+        circulation_trend_data={'labels': trends['labels'], 'values': trends['loans']},
         books_by_category_data={'labels': cat_labels, 'values': cat_values},
     )
 
@@ -58,6 +57,7 @@ def dashboard():
 @bp.route('/most-borrowed')
 @login_required
 @librarian_required
+@conditional('loans', 'books', 'categories')
 def most_borrowed():
     form = DateRangeForm(request.args)
     if not (form.start_date.data and form.end_date.data):
@@ -72,6 +72,7 @@ def most_borrowed():
 @bp.route('/active-members')
 @login_required
 @librarian_required
+@conditional('loans', 'members')
 def active_members():
     form = DateRangeForm(request.args)
     if not (form.start_date.data and form.end_date.data):
@@ -86,8 +87,10 @@ def active_members():
 @bp.route('/overdue-summary')
 @login_required
 @librarian_required
+@conditional('loans', 'members', 'books')
 def overdue_summary():
     summary = utils.get_overdue_summary()
+    pagination = paginate_query(utils.overdue_details_query(), list(utils.OVERDUE_DETAILS_ORDER), per_page=25, with_total=False)
     by_member_labels = list(summary['overdue_by_member'].keys())
     by_member_values = list(summary['overdue_by_member'].values())
     ranges_labels = list(summary['overdue_by_days'].keys())
@@ -95,6 +98,7 @@ def overdue_summary():
     return render_template(
         'reports/overdue_summary.html',
         summary=summary,
+        pagination=pagination,
         overdue_by_member={'labels': by_member_labels, 'values': by_member_values},
         overdue_by_days={'labels': ranges_labels, 'values': ranges_values},
     )
@@ -103,6 +107,7 @@ def overdue_summary():
 @bp.route('/collection-stats')
 @login_required
 @librarian_required
+@conditional('loans', 'books', 'categories')
 def collection_stats():
     stats = utils.get_collection_statistics()
     cat_labels = [name for name, _ in stats['by_category']]
@@ -115,32 +120,58 @@ def collection_stats():
 @bp.route('/circulation-trends')
 @login_required
 @librarian_required
+@conditional('loans')
 def circulation_trends():
-    form = DateRangeForm(request.args)
+    form = TrendsForm(request.args)
     if not (form.start_date.data and form.end_date.data):
         s, e = utils.get_date_range(days=90)
         form.start_date.data, form.end_date.data = s, e
-    rows = utils.get_circulation_trends(form.start_date.data, form.end_date.data)
-    labels = [d.strftime('%Y-%m-%d') for d, _ in rows]
-    values = [int(c) for _, c in rows]
-    total = sum(values) if values else 0
-    avg = round(total / max(len(values), 1), 2)
-    peak_idx = values.index(max(values)) if values else 0
-    peak_day = labels[peak_idx] if values else None
-    return render_template('reports/circulation_trends.html', form=form, stats={'total_loans': total, 'avg_per_day': avg, 'peak_day': peak_day, 'peak_count': (max(values) if values else 0)}, chart_data={'labels': labels, 'values': values})
+    series = [name for name in utils.TREND_SERIES if form[name].data]
+    trends = utils.get_circulation_trends(form.start_date.data, form.end_date.data,
+                                          resolution=form.resolution.data, series=series)
+    values = trends['loans']
+    total = sum(values)
+    peak = max(values) if values else 0
+    stats = {
+        'total_loans': total,
+        'avg_per_bucket': round(total / max(len(values), 1), 2),
+        'peak_bucket': trends['labels'][values.index(peak)] if peak else None,
+        'peak_count': peak,
+    }
+    return render_template('reports/circulation_trends.html', form=form, stats=stats, trends=trends)
+
+
+def _export_options():
+    fmt = (request.args.get('format') or 'csv').lower()
+    if fmt not in FORMATS:
+        abort(400)
+    return fmt, request.args.get('gzip') in ('1', 'true', 'yes')
 
 
 @bp.route('/most-borrowed/export/csv')
 @login_required
 @librarian_required
 def export_most_borrowed_csv():
+    """Full ranking for the period (not just the on-screen top 20), streamed."""
     start_date, end_date = _parse_dates_from_request(default_days=30)
-    rows = utils.get_most_borrowed_books(start_date, end_date, limit=100)
-    data = []
-    for book, count in rows:
-        data.append([book.title, getattr(book, 'author', ''), getattr(book.category, 'name', 'Uncategorized'), int(count)])
-    filename = f"most_borrowed_books_{(end_date or date.today()).isoformat()}.csv"
-    return utils.export_to_csv(data, headers=['Title', 'Author', 'Category', 'Times Borrowed'], filename=filename)
+    fmt, gzip = _export_options()
+    rows = ((title, author or '', category or 'Uncategorized', int(count))
+            for _, title, author, category, count in iter_rows(utils.most_borrowed_query(start_date, end_date)))
+    columns = [('title', 'Title'), ('author', 'Author'), ('category', 'Category'), ('times_borrowed', 'Times Borrowed')]
+    filename = f"most_borrowed_books_{(end_date or date.today()).isoformat()}"
+    return stream_export(rows, columns, filename, fmt=fmt, gzip=gzip)
+
+
+def _pdf_export(report, params, html, filename):
+    """Serve a cached PDF, or queue it and send the browser to the job page."""
+    if not pdf_jobs.weasyprint_available():
+        return make_response('PDF generation dependency missing', 500)
+    job = pdf_jobs.submit(report, params, html, filename, base_url=request.host_url)
+    if job.status == 'ready':
+        return send_file(job.path, mimetype='application/pdf', as_attachment=True, download_name=job.filename)
+    if request.accept_mimetypes.best == 'application/json':
+        return {**job.to_dict(), 'status_url': url_for('reports.pdf_job_status', job_id=job.job_id)}, 202
+    return redirect(url_for('reports.pdf_job', job_id=job.job_id))
 
 
 @bp.route('/most-borrowed/export/pdf')
@@ -151,7 +182,7 @@ def export_most_borrowed_pdf():
     rows = utils.get_most_borrowed_books(start_date, end_date, limit=100)
     html = render_template('reports/most_borrowed_pdf.html', start_date=start_date, end_date=end_date, today=date.today(), rows=rows)
     filename = f"most_borrowed_books_{(end_date or date.today()).isoformat()}.pdf"
-    return utils.export_to_pdf(html, filename)
+    return _pdf_export('most_borrowed', {'start_date': start_date, 'end_date': end_date}, html, filename)
 
 
 @bp.route('/active-members/export/csv')
@@ -159,12 +190,33 @@ def export_most_borrowed_pdf():
 @librarian_required
 def export_active_members_csv():
     start_date, end_date = _parse_dates_from_request(default_days=30)
-    stats = utils.get_active_members_stats(start_date, end_date)
-    rows = []
-    for member, total in stats['top_borrowers']:
-        rows.append([member.member_id, member.name, member.email or '', int(total)])
-    filename = f"active_members_{(end_date or date.today()).isoformat()}.csv"
-    return utils.export_to_csv(rows, headers=['Member ID', 'Name', 'Email', 'Total Loans'], filename=filename)
+    fmt, gzip = _export_options()
+    rows = ((member_id, name, email or '', int(total))
+            for _, member_id, name, email, total in iter_rows(utils.top_borrowers_query(start_date, end_date)))
+    columns = [('member_id', 'Member ID'), ('name', 'Name'), ('email', 'Email'), ('total_loans', 'Total Loans')]
+    filename = f"active_members_{(end_date or date.today()).isoformat()}"
+    return stream_export(rows, columns, filename, fmt=fmt, gzip=gzip)
+
+
+# Full-table exports: dataset -> (query factory, (field, header) columns)
+EXPORT_DATASETS = {
+    'loans': (utils.loan_history_query, utils.LOAN_EXPORT_COLUMNS),
+    'members': (utils.member_list_query, utils.MEMBER_EXPORT_COLUMNS),
+    'books': (utils.catalogue_query, utils.BOOK_EXPORT_COLUMNS),
+}
+
+
+@bp.route('/export/<dataset>')
+@login_required
+@librarian_required
+def export_dataset(dataset):
+    """Stream a whole table: ?format=csv|jsonl, &gzip=1 to compress."""
+    if dataset not in EXPORT_DATASETS:
+        abort(404)
+    fmt, gzip = _export_options()
+    query_factory, columns = EXPORT_DATASETS[dataset]
+    filename = f"{dataset}_{date.today().isoformat()}"
+    return stream_export(iter_rows(query_factory()), columns, filename, fmt=fmt, gzip=gzip)
 
 
 @bp.route('/collection-stats/export/pdf')
@@ -172,23 +224,143 @@ def export_active_members_csv():
 @librarian_required
 def export_collection_stats_pdf():
     stats = utils.get_collection_statistics()
-    # Reuse the HTML from the collection_stats page for PDF-friendly simple table
-    html = render_template('reports/collection_stats.html', stats=stats, books_by_category={'labels': [n for n, _ in stats['by_category']],'values': [c for _, c in stats['by_category']]}, availability={'labels': ['Available', 'On Loan'], 'values': [stats['available'], stats['on_loan']]})
+    html = render_template('reports/collection_stats_pdf.html', stats=stats, today=date.today())
     filename = f"collection_stats_{date.today().isoformat()}.pdf"
-    return utils.export_to_pdf(html, filename)
+    return _pdf_export('collection_stats', {}, html, filename)
 
 
-@bp.route('/api/chart-data/<chart_type>')
+@bp.route('/pdf-jobs/<job_id>')
 @login_required
 @librarian_required
-def chart_data(chart_type):
-    start_date, end_date = _parse_dates_from_request()
+def pdf_job(job_id):
+    job = pdf_jobs.get_job(job_id)
+    if job is None:
+        abort(404)
+    return render_template('reports/pdf_job.html', job=job)
+
+
+@bp.route('/pdf-jobs/<job_id>/status')
+@login_required
+@librarian_required
+def pdf_job_status(job_id):
+    job = pdf_jobs.get_job(job_id)
+    if job is None:
+        return {'error': 'Unknown PDF job.'}, 404
+    data = job.to_dict()
+    if job.status == 'ready':
+        data['download_url'] = url_for('reports.pdf_job_download', job_id=job_id)
+    return data
+
+
+@bp.route('/pdf-jobs/<job_id>/download')
+@login_required
+@librarian_required
+def pdf_job_download(job_id):
+    job = pdf_jobs.get_job(job_id)
+    if job is None or job.status != 'ready':
+        abort(404)
+    return send_file(job.path, mimetype='application/pdf', as_attachment=True, download_name=job.filename)
+
+
+_ANALYSES = {
+    'duration': analytics.loan_duration_stats,
+    'heatmap': analytics.weekday_hour_heatmap,
+    'pareto': analytics.pareto_abc,
+    'lateness': analytics.lateness_distribution,
+}
+
+
+def _analytics(start_date, end_date):
+    """All vectorized analyses for the range, or None without NumPy."""
+    if not analytics.analytics_available():
+        return None
+    snap = analytics.get_snapshot()
+    return {key: analyse(snap, start_date, end_date) for key, analyse in _ANALYSES.items()}
+
+
+@bp.route('/analytics')
+@login_required
+@librarian_required
+def circulation_analytics():
+    form = DateRangeForm(request.args)
+    if not (form.start_date.data and form.end_date.data):
+        s, e = utils.get_date_range(days=365)
+        form.start_date.data, form.end_date.data = s, e
+    results = _analytics(form.start_date.data, form.end_date.data)
+    titles = {}
+    if results and results['pareto']['top']:
+        ids = [row['book_id'] for row in results['pareto']['top']]
+        titles = dict(db.session.query(Book.id, Book.title).filter(Book.id.in_(ids)))
+    return render_template('reports/analytics.html', form=form, results=results, titles=titles)
+
+
+# Analytics chart-data types: chart_type -> (analysis key, payload builder)
+_ANALYTICS_CHARTS = {
+    'loan-duration': ('duration', lambda r: {'labels': list(r['histogram']), 'values': list(r['histogram'].values()), 'percentiles': r['percentiles']}),
+    'weekday-hour': ('heatmap', lambda r: {'labels': r['weekdays'], 'hours': r['hours'], 'values': r['values']}),
+    'pareto': ('pareto', lambda r: {'labels': r['curve']['labels'], 'values': r['curve']['values'], 'classes': r['classes']}),
+    'lateness': ('lateness', lambda r: {'labels': list(r['histogram']), 'values': list(r['histogram'].values())}),
+}
+
+
+def _chart_payload(chart_type, start_date, end_date):
     if chart_type == 'circulation-trends':
         if not (start_date and end_date):
             start_date, end_date = utils.get_date_range(days=30)
-        rows = utils.get_circulation_trends(start_date, end_date)
-        return {'labels': [d.strftime('%Y-%m-%d') for d, _ in rows], 'values': [int(c) for _, c in rows]}
+        requested = request.args.get('series', '').split(',')
+        series = [name for name in utils.TREND_SERIES if name in requested]
+        resolution = request.args.get('resolution')
+        if resolution not in utils.RESOLUTIONS:
+            resolution = 'auto'
+        trends = utils.get_circulation_trends(start_date, end_date, resolution=resolution, series=series)
+        payload = {'labels': trends['labels'], 'values': trends['loans'], 'resolution': trends['resolution']}
+        payload.update((name, trends[name]) for name in series)
+        return payload
     if chart_type == 'books-by-category':
-        stats = utils.get_collection_statistics()
-        return {'labels': [n for n, _ in stats['by_category']], 'values': [int(c) for _, c in stats['by_category']]}
+        rows = utils.get_books_by_category()
+        return {'labels': [n for n, _ in rows], 'values': [int(c) for _, c in rows]}
+    if chart_type in _ANALYTICS_CHARTS:
+        if not analytics.analytics_available():
+            return {'labels': [], 'values': [], 'error': 'NumPy is not installed.'}
+        # The snapshot refreshes on its own timer, not with the table stamps
+        skip_conditional()
+        key, build = _ANALYTICS_CHARTS[chart_type]
+        if not (start_date and end_date):
+            start_date, end_date = utils.get_date_range(days=365)
+        return build(_ANALYSES[key](analytics.get_snapshot(), start_date, end_date))
     return {'labels': [], 'values': []}
+
+
+@bp.route('/api/chart-data/<chart_type>')
+@login_required
+@librarian_required
+@rate_limit('240/minute', scope='chart-data')
+@conditional(*REPORT_TABLES)
+def chart_data(chart_type):
+    start_date, end_date = _parse_dates_from_request()
+    return _chart_payload(chart_type, start_date, end_date)
+
+
+@bp.route('/api/chart-data')
+@login_required
+@librarian_required
+@rate_limit('240/minute', scope='chart-data')
+@conditional(*REPORT_TABLES)
+def chart_data_batch():
+    """Several charts in one response: ``?charts=circulation-trends,books-by-category``.
+
+    The date range and other query parameters apply to every chart.
+    """
+    start_date, end_date = _parse_dates_from_request()
+    names = dict.fromkeys(n.strip() for n in request.args.get('charts', '').split(',') if n.strip())
+    if len(names) > MAX_BATCH_CHARTS:
+        abort(400)
+    return {name: _chart_payload(name, start_date, end_date) for name in names}
+
+
+@bp.route('/api/cache-stats')
+@login_required
+@librarian_required
+def cache_stats():
+    """Report cache hit/miss counters for this worker process."""
+    return report_cache.snapshot()
@@ -1,12 +1,25 @@
-import csv
-import io
+from collections import namedtuple
 from datetime import date, timedelta
 
-from flask import make_response, current_app, request
-from sqlalchemy import func
+from flask import current_app
+from sqlalchemy import case, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.sql.visitors import InternalTraversal
 
 from app.extensions import db
 from app.models import Book, Category, Member, MemberStatus, Loan, LoanStatus
+from app.models import DailyLoanStat, DailyBookLoanStat, DailyMemberLoanStat
+from app.models.loan import days_between
+from .cache import cached_report
+from .rollups import rollups_enabled
+
+# Plain rows for cached reports: ORM instances cannot outlive their session
+BookSummary = namedtuple('BookSummary', 'id title author category_name')
+MemberSummary = namedtuple('MemberSummary', 'id member_id name email')
+
+_BOOK_COLUMNS = (Book.id, Book.title, Book.author, Category.name)
+_MEMBER_COLUMNS = (Member.id, Member.member_id, Member.name, Member.email)
 
 
 def get_date_range(start_date=None, end_date=None, days=30):
@@ -17,139 +30,364 @@ def get_date_range(start_date=None, end_date=None, days=30):
     return None, None
 
 
-def get_most_borrowed_books(start_date=None, end_date=None, limit=10):
-    q = db.session.query(Book, func.count(Loan.id).label('borrow_count'))\
-        .join(Loan, Book.id == Loan.book_id)
+def most_borrowed_query(start_date=None, end_date=None, limit=None):
+    """Flat (id, title, author, category_name, borrow_count) rows, most borrowed first."""
+    if rollups_enabled():
+        # Top-K over the per-day-and-book rollup, then load only those books
+        borrow_count = func.sum(DailyBookLoanStat.loans)
+        top = db.session.query(DailyBookLoanStat.book_id, borrow_count.label('borrow_count'))
+        if start_date and end_date:
+            top = top.filter(DailyBookLoanStat.day.between(start_date, end_date))
+        top = top.group_by(DailyBookLoanStat.book_id).having(borrow_count > 0)\
+            .order_by(borrow_count.desc()).limit(limit).subquery()
+        return db.session.query(*_BOOK_COLUMNS, top.c.borrow_count)\
+            .join(top, top.c.book_id == Book.id)\
+            .outerjoin(Category, Category.id == Book.category_id)\
+            .order_by(top.c.borrow_count.desc(), Book.id.asc())
+    q = db.session.query(*_BOOK_COLUMNS, func.count(Loan.id).label('borrow_count'))\
+        .join(Loan, Book.id == Loan.book_id)\
+        .outerjoin(Category, Category.id == Book.category_id)
     if start_date and end_date:
         q = q.filter(Loan.borrow_date.between(start_date, end_date))
-    q = q.group_by(Book.id).order_by(func.count(Loan.id).desc()).limit(limit)
-    return q.all()
+    return q.group_by(Book.id, Category.name).order_by(func.count(Loan.id).desc(), Book.id.asc()).limit(limit)
+
+
+@cached_report('most_borrowed', tables=('loans', 'books', 'categories'))
+def get_most_borrowed_books(start_date=None, end_date=None, limit=10):
+    """[(BookSummary, borrow_count)], most borrowed first."""
+    return [(BookSummary(*row[:4]), int(row[4])) for row in most_borrowed_query(start_date, end_date, limit)]
+
+
+def _member_loan_counts(start_date=None, end_date=None):
+    if rollups_enabled():
+        loan_count = func.sum(DailyMemberLoanStat.loans)
+        per_member = db.session.query(DailyMemberLoanStat.member_id, loan_count.label('loan_count'))
+        if start_date and end_date:
+            per_member = per_member.filter(DailyMemberLoanStat.day.between(start_date, end_date))
+        return per_member.group_by(DailyMemberLoanStat.member_id).having(loan_count > 0), loan_count
+    loan_count = func.count(Loan.id)
+    per_member = db.session.query(Loan.member_id, loan_count.label('loan_count'))
+    if start_date and end_date:
+        per_member = per_member.filter(Loan.borrow_date.between(start_date, end_date))
+    return per_member.group_by(Loan.member_id), loan_count
 
 
+def top_borrowers_query(start_date=None, end_date=None, limit=None):
+    """Flat (id, member_id, name, email, loan_count) rows, busiest borrowers first."""
+    per_member, loan_count = _member_loan_counts(start_date, end_date)
+    top = per_member.order_by(loan_count.desc()).limit(limit).subquery()
+    return db.session.query(*_MEMBER_COLUMNS, top.c.loan_count)\
+        .join(top, top.c.member_id == Member.id)\
+        .order_by(top.c.loan_count.desc(), Member.id.asc())
+
+
+@cached_report('active_members', tables=('loans', 'members'))
 def get_active_members_stats(start_date=None, end_date=None):
-    stats = {
+    """Member totals plus top_borrowers as [(MemberSummary, loan_count)]."""
+    per_member, _ = _member_loan_counts(start_date, end_date)
+    return {
         'total_members': Member.query.count(),
         'active_members': Member.query.filter_by(status=MemberStatus.ACTIVE).count(),
-        'members_with_loans': 0,
-        'top_borrowers': [],
+        'members_with_loans': per_member.count(),
+        'top_borrowers': [
+            (MemberSummary(*row[:4]), int(row[4])) for row in top_borrowers_query(start_date, end_date, limit=20)
+        ],
     }
-    loan_q = db.session.query(Loan.member_id).distinct()
-    if start_date and end_date:
-        loan_q = loan_q.filter(Loan.borrow_date.between(start_date, end_date))
-    stats['members_with_loans'] = loan_q.count()
 
-    top_q = db.session.query(Member, func.count(Loan.id).label('loan_count'))\
-        .join(Loan, Member.id == Loan.member_id)
-    if start_date and end_date:
-        top_q = top_q.filter(Loan.borrow_date.between(start_date, end_date))
-    top_q = top_q.group_by(Member.id).order_by(func.count(Loan.id).desc()).limit(20)
-    stats['top_borrowers'] = top_q.all()
-    return stats
+
+# Upper bounds (inclusive) of the days-overdue buckets; the last one is open-ended
+OVERDUE_BUCKETS = (('1-7', 7), ('8-14', 14), ('15-30', 30), ('30+', None))
+
+
+def _days_overdue(today):
+    return days_between(Loan.due_date, db.literal(today, db.Date))
 
 
-def get_overdue_summary():
+@cached_report('overdue_summary', tables=('loans', 'members'))
+def get_overdue_summary(top_members=20):
+    """Overdue totals, day buckets and the members with most overdue loans.
+
+    Everything is aggregated in SQL (one statement for the totals and
+    buckets, one GROUP BY for members), so memory use does not depend on how
+    many loans are overdue. The loans themselves are listed page by page via
+    ``overdue_details_query``.
+    """
     today = date.today()
-    overdue_loans = Loan.query\
-        .filter(Loan.status == LoanStatus.BORROWED, Loan.due_date < today)\
-        .join(Book).join(Member).all()
-
-    total_overdue = len(overdue_loans)
-    by_member = {}
-    days_buckets = {'1-7': 0, '8-14': 0, '15-30': 0, '30+': 0}
-
-    details = []
-    for loan in overdue_loans:
-        days_overdue = (today - loan.due_date).days
-        details.append({
-            'loan': loan,
-            'book': loan.book,
-            'member': loan.member,
-            'due_date': loan.due_date,
-            'days_overdue': days_overdue,
-        })
-        key = loan.member.name
-        by_member[key] = by_member.get(key, 0) + 1
-        if days_overdue <= 7:
-            days_buckets['1-7'] += 1
-        elif days_overdue <= 14:
-            days_buckets['8-14'] += 1
-        elif days_overdue <= 30:
-            days_buckets['15-30'] += 1
-        else:
-            days_buckets['30+'] += 1
-
-    unique_members = len(set(d['member'].id for d in details))
-    avg_days = 0
-    if total_overdue:
-        avg_days = sum(d['days_overdue'] for d in details) / total_overdue
+    days = _days_overdue(today)
+    overdue = (Loan.status == LoanStatus.BORROWED, Loan.due_date < today)
+
+    bucket_columns = []
+    lower = 0
+    for label, upper in OVERDUE_BUCKETS:
+        cond = days > lower if upper is None else days.between(lower + 1, upper)
+        bucket_columns.append(func.coalesce(func.sum(case((cond, 1), else_=0)), 0).label(f'bucket_{len(bucket_columns)}'))
+        lower = upper or lower
+    totals = db.session.query(
+        func.count(Loan.id).label('total'),
+        func.count(func.distinct(Loan.member_id)).label('members'),
+        func.avg(days).label('avg_days'),
+        *bucket_columns,
+    ).filter(*overdue).one()
+
+    member_count = func.count(Loan.id).label('overdue_count')
+    by_member_rows = (
+        db.session.query(Member.name, member_count)
+        .join(Loan, Loan.member_id == Member.id)
+        .filter(*overdue)
+        .group_by(Loan.member_id, Member.name)
+        .order_by(member_count.desc(), Member.name.asc())
+        .limit(top_members)
+        .all()
+    )
 
     return {
-        'total_overdue': total_overdue,
-        'unique_members_with_overdue': unique_members,
-        'avg_days_overdue': round(avg_days, 1),
-        'overdue_by_member': by_member,
-        'overdue_by_days': days_buckets,
-        'details': details,
+        'total_overdue': totals.total or 0,
+        'unique_members_with_overdue': totals.members or 0,
+        'avg_days_overdue': round(float(totals.avg_days or 0), 1),
+        'overdue_by_member': {name: int(count) for name, count in by_member_rows},
+        'overdue_by_days': {label: int(getattr(totals, f'bucket_{i}')) for i, (label, _) in enumerate(OVERDUE_BUCKETS)},
     }
 
 
-def get_collection_statistics():
-    total_books = Book.query.count()
-    total_quantity = db.session.query(func.sum(Book.quantity)).scalar() or 0
-    by_category = db.session.query(Category.name, func.count(Book.id))\
-        .join(Book).group_by(Category.id).all()
+def overdue_details_query():
+    """Flat rows (no ORM objects) for the overdue list, for pagination or streaming.
+
+    Sort with ``OVERDUE_DETAILS_ORDER`` (most overdue first).
+    """
+    today = date.today()
+    return (
+        db.session.query(
+            Loan.id.label('id'),
+            Loan.due_date.label('due_date'),
+            _days_overdue(today).label('days_overdue'),
+            Book.id.label('book_id'),
+            Book.title.label('title'),
+            Member.id.label('member_id'),
+            Member.name.label('member_name'),
+        )
+        .join(Book, Book.id == Loan.book_id)
+        .join(Member, Member.id == Loan.member_id)
+        .filter(Loan.status == LoanStatus.BORROWED, Loan.due_date < today)
+    )
+
+
+OVERDUE_DETAILS_ORDER = (Loan.due_date.asc(), Loan.id.asc())
 
-    on_loan_count = Loan.query.filter(Loan.status == LoanStatus.BORROWED).count()
-    available = max(total_quantity - on_loan_count, 0)
+
+@cached_report('books_by_category', tables=('books', 'categories'))
+def get_books_by_category():
+    return [tuple(row) for row in db.session.query(Category.name, func.count(Book.id))
+            .join(Book).group_by(Category.id)]
+
+
+@cached_report('collection_stats', tables=('loans', 'books', 'categories'))
+def get_collection_statistics():
+    # All totals in one statement; the category breakdown is a second GROUP BY
+    totals = db.session.query(
+        db.select(func.count(Book.id)).scalar_subquery().label('total_books'),
+        db.select(func.coalesce(func.sum(Book.quantity), 0)).scalar_subquery().label('total_quantity'),
+        db.select(func.count(Loan.id)).where(Loan.status == LoanStatus.BORROWED).scalar_subquery().label('on_loan'),
+        db.select(func.count(Category.id)).scalar_subquery().label('total_categories'),
+    ).one()
+    total_books = totals.total_books or 0
+    total_quantity = int(totals.total_quantity or 0)
+    on_loan_count = totals.on_loan or 0
 
     return {
         'total_books': total_books,
-        'total_quantity': int(total_quantity),
-        'by_category': by_category,
-        'available': available,
+        'total_quantity': total_quantity,
+        'by_category': get_books_by_category(),
+        'available': max(total_quantity - on_loan_count, 0),
         'on_loan': on_loan_count,
-        'total_categories': Category.query.count(),
-        'avg_books_per_category': round(total_books / max(Category.query.count(), 1), 2),
+        'total_categories': totals.total_categories or 0,
+        'avg_books_per_category': round(total_books / max(totals.total_categories or 0, 1), 2),
     }
 
 
-def get_circulation_trends(start_date, end_date):
-    q = db.session.query(Loan.borrow_date, func.count(Loan.id).label('cnt'))\
-        .filter(Loan.borrow_date.between(start_date, end_date))\
-        .group_by(Loan.borrow_date)\
-        .order_by(Loan.borrow_date.asc())
-    return q.all()
-
-
-def export_to_csv(data, headers, filename):
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(headers)
-    for row in data:
-        writer.writerow(row)
-    resp = make_response(output.getvalue())
-    resp.headers['Content-Type'] = 'text/csv'
-    resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    return resp
-
-
-def export_to_pdf(html_content, filename):
-    try:
-        from weasyprint import HTML
-    except Exception:  # pragma: no cover - runtime dependency
-        HTML = None
-    if HTML is None:
-        resp = make_response('PDF generation dependency missing', 500)
-        return resp
-    try:
-        # Provide base_url so relative URLs (static files, images, CSS) resolve correctly
-        pdf_bytes = HTML(string=html_content, base_url=request.host_url).write_pdf()
-    except Exception:
-        # Log full traceback for debugging (commonly missing Windows deps for WeasyPrint)
-        current_app.logger.exception('WeasyPrint PDF generation failed')
-        resp = make_response('PDF generation failed. Check server logs for details.', 500)
-        return resp
-    resp = make_response(pdf_bytes)
-    resp.headers['Content-Type'] = 'application/pdf'
-    resp.headers['Content-Disposition'] = f'attachment; filename={filename}'
-    return resp
+# ===== Circulation trends =====
+RESOLUTIONS = ('day', 'week', 'month', 'year')
+TREND_SERIES = ('returns', 'overdue')
+
+
+class date_bucket(FunctionElement):
+    """First day of the day/week (Monday)/month/year containing a DATE."""
+    type = db.Date()
+    inherit_cache = True
+    name = 'date_bucket'
+    # resolution changes the SQL, so it has to be part of the statement cache key
+    _traverse_internals = FunctionElement._traverse_internals + [('resolution', InternalTraversal.dp_string)]
+
+    def __init__(self, resolution, expr):
+        self.resolution = resolution
+        super().__init__(expr)
+
+
+@compiles(date_bucket)
+def _date_bucket_default(element, compiler, **kw):
+    # PostgreSQL
+    expr = compiler.process(list(element.clauses)[0], **kw)
+    return f"CAST(date_trunc('{element.resolution}', {expr}) AS DATE)"
+
+
+@compiles(date_bucket, 'sqlite')
+def _date_bucket_sqlite(element, compiler, **kw):
+    expr = compiler.process(list(element.clauses)[0], **kw)
+    return {
+        'day': f"date({expr})",
+        # 'weekday 0' moves forward to Sunday; six days back is that week's Monday
+        'week': f"date({expr}, 'weekday 0', '-6 days')",
+        'month': f"strftime('%Y-%m-01', {expr})",
+        'year': f"strftime('%Y-01-01', {expr})",
+    }[element.resolution]
+
+
+def _bucket_start(day: date, resolution: str) -> date:
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return day.replace(day=1)
+    if resolution == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def _next_bucket(day: date, resolution: str) -> date:
+    if resolution == 'day':
+        return day + timedelta(days=1)
+    if resolution == 'week':
+        return day + timedelta(days=7)
+    if resolution == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return date(day.year + 1, 1, 1)
+
+
+def _buckets(start_date: date, end_date: date, resolution: str) -> list:
+    out, day = [], _bucket_start(start_date, resolution)
+    while day <= end_date:
+        out.append(day)
+        day = _next_bucket(day, resolution)
+    return out
+
+
+def _bucket_count(start_date: date, end_date: date, resolution: str) -> int:
+    days = (end_date - start_date).days
+    if resolution == 'day':
+        return days + 1
+    if resolution == 'week':
+        return (_bucket_start(end_date, 'week') - _bucket_start(start_date, 'week')).days // 7 + 1
+    if resolution == 'month':
+        return (end_date.year - start_date.year) * 12 + end_date.month - start_date.month + 1
+    return end_date.year - start_date.year + 1
+
+
+def trend_resolution(start_date: date, end_date: date, resolution: str | None = None, max_points: int | None = None) -> str:
+    """The requested resolution (finest when 'auto'), coarsened until it fits ``max_points``."""
+    if max_points is None:
+        max_points = int(current_app.config.get('TRENDS_MAX_POINTS', 400))
+    first = RESOLUTIONS.index(resolution) if resolution in RESOLUTIONS else 0
+    for candidate in RESOLUTIONS[first:]:
+        if _bucket_count(start_date, end_date, candidate) <= max_points:
+            return candidate
+    return RESOLUTIONS[-1]
+
+
+def _trend_label(day: date, resolution: str) -> str:
+    if resolution == 'month':
+        return day.strftime('%Y-%m')
+    if resolution == 'year':
+        return day.strftime('%Y')
+    return day.isoformat()
+
+
+@cached_report('circulation_trends', tables=('loans',))
+def get_circulation_trends(start_date, end_date, resolution='auto', series=(), max_points=None):
+    """Zero-filled loans per bucket, plus any of ``TREND_SERIES``, from one grouped query.
+
+    Returns ``{'resolution', 'labels', 'loans'[, 'returns'][, 'overdue']}``.
+    ``overdue`` counts loans falling due in the bucket that came back late or
+    are still out past due.
+    """
+    resolution = trend_resolution(start_date, end_date, resolution, max_points)
+    series = [name for name in TREND_SERIES if name in series]
+    zero = db.literal(0)
+    if rollups_enabled():
+        parts = [db.select(DailyLoanStat.day.label('day'), DailyLoanStat.loans.label('loans'),
+                           DailyLoanStat.returns.label('returns'), zero.label('overdue'))
+                 .where(DailyLoanStat.day.between(start_date, end_date))]
+    else:
+        parts = [db.select(Loan.borrow_date.label('day'), func.count(Loan.id).label('loans'),
+                           zero.label('returns'), zero.label('overdue'))
+                 .where(Loan.borrow_date.between(start_date, end_date)).group_by(Loan.borrow_date)]
+        if 'returns' in series:
+            parts.append(db.select(Loan.return_date, zero, func.count(Loan.id), zero)
+                         .where(Loan.status == LoanStatus.RETURNED, Loan.return_date.between(start_date, end_date))
+                         .group_by(Loan.return_date))
+    if 'overdue' in series:
+        today = date.today()
+        late = db.or_(Loan.return_date > Loan.due_date,
+                      db.and_(Loan.status == LoanStatus.BORROWED, Loan.due_date < today))
+        parts.append(db.select(Loan.due_date, zero, zero, func.count(Loan.id))
+                     .where(Loan.due_date.between(start_date, end_date), late)
+                     .group_by(Loan.due_date))
+    events = db.union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    bucket = date_bucket(resolution, events.c.day)
+    stmt = db.select(bucket, func.sum(events.c.loans), func.sum(events.c.returns), func.sum(events.c.overdue))\
+        .group_by(bucket)
+    totals = {}
+    for day, loans, returns, overdue in db.session.execute(stmt):
+        # SQLite hands the bucket back as text
+        day = date.fromisoformat(str(day)[:10])
+        totals[day] = (int(loans or 0), int(returns or 0), int(overdue or 0))
+    buckets = _buckets(start_date, end_date, resolution)
+    result = {
+        'resolution': resolution,
+        'labels': [_trend_label(day, resolution) for day in buckets],
+        'loans': [totals.get(day, (0, 0, 0))[0] for day in buckets],
+    }
+    for name in series:
+        i = 1 + TREND_SERIES.index(name)
+        result[name] = [totals.get(day, (0, 0, 0))[i] for day in buckets]
+    return result
+
+
+# ===== Full-table exports (flat rows, streamed by app.reports.exports) =====
+LOAN_EXPORT_COLUMNS = (
+    ('loan_id', 'Loan ID'), ('member_id', 'Member ID'), ('member_name', 'Member'),
+    ('book_id', 'Book ID'), ('isbn', 'ISBN'), ('title', 'Title'),
+    ('borrow_date', 'Borrowed'), ('due_date', 'Due'), ('return_date', 'Returned'),
+    ('status', 'Status'), ('fine_amount', 'Fine'), ('fine_paid', 'Fine Paid'),
+)
+
+
+def loan_history_query():
+    return db.session.query(
+        Loan.id, Member.member_id, Member.name, Book.id, Book.isbn, Book.title,
+        Loan.borrow_date, Loan.due_date, Loan.return_date, Loan.status, Loan.fine_amount, Loan.fine_paid,
+    ).join(Member, Member.id == Loan.member_id).join(Book, Book.id == Loan.book_id).order_by(Loan.id.asc())
+
+
+MEMBER_EXPORT_COLUMNS = (
+    ('member_id', 'Member ID'), ('name', 'Name'), ('email', 'Email'), ('phone', 'Phone'),
+    ('address', 'Address'), ('registration_date', 'Registered'), ('status', 'Status'),
+)
+
+
+def member_list_query():
+    return db.session.query(
+        Member.member_id, Member.name, Member.email, Member.phone, Member.address,
+        Member.registration_date, Member.status,
+    ).order_by(Member.id.asc())
+
+
+BOOK_EXPORT_COLUMNS = (
+    ('book_id', 'Book ID'), ('isbn', 'ISBN'), ('title', 'Title'), ('author', 'Author'),
+    ('publisher', 'Publisher'), ('publication_year', 'Year'), ('category', 'Category'),
+    ('quantity', 'Copies'), ('on_loan', 'On Loan'), ('shelf_location', 'Shelf'),
+)
+
+
+def catalogue_query():
+    return db.session.query(
+        Book.id, Book.isbn, Book.title, Book.author, Book.publisher, Book.publication_year,
+        Category.name, Book.quantity, Book.active_loan_count, Book.shelf_location,
+    ).outerjoin(Category, Category.id == Book.category_id).order_by(Book.id.asc())
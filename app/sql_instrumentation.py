@@ -0,0 +1,164 @@
+"""Opt-in per-request SQL timing: Server-Timing, a log line, N+1 and slow queries.
+
+With ``SQL_INSTRUMENTATION`` on, every statement is timed between
+``before_cursor_execute`` and ``after_cursor_execute``. For each request:
+
+* the response gets ``Server-Timing: db;dur=<ms>;desc="<n> queries",
+  app;dur=<ms>``, which browser dev tools show next to the request;
+* the ``app.sql`` logger writes one JSON line with the endpoint, status,
+  query count, DB and total time, the slowest statements and any N+1
+  suspects;
+* a statement run ``SQL_N_PLUS_ONE_THRESHOLD`` or more times with
+  different parameters (a query per row of something already loaded) is
+  flagged as an N+1 suspect, and logged as a warning.
+
+Statements slower than ``SQL_SLOW_QUERY_MS`` are logged as they finish,
+inside a request or not, to ``app.sql.slow`` and to ``SQL_SLOW_QUERY_LOG``
+when that is set. The hooks are only installed when instrumentation is on;
+``@query_budget`` counting in ``app.query_counter`` is separate.
+"""
+import json
+import logging
+import time
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('app.sql')
+slow_logger = logging.getLogger('app.sql.slow')
+
+_START = 'sql_instrumentation_start'
+_SQL_PREVIEW = 200
+
+
+class RequestProfile:
+    """Statements of one request, grouped by SQL text."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_ms = 0.0
+        # statement -> [executions, total ms, distinct parameter sets]
+        self.by_statement: dict[str, list] = {}
+        self.slowest: list[tuple[float, str]] = []
+
+    def record(self, statement: str, parameters, elapsed_ms: float, keep: int) -> None:
+        self.count += 1
+        self.db_ms += elapsed_ms
+        entry = self.by_statement.setdefault(statement, [0, 0.0, set()])
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2].add(repr(parameters))
+        self.slowest.append((elapsed_ms, statement))
+        if len(self.slowest) > keep:
+            self.slowest.sort(reverse=True)
+            del self.slowest[keep:]
+
+    def n_plus_one(self, threshold: int) -> list[dict]:
+        return [
+            {'sql': _preview(sql), 'count': n, 'distinct_params': len(params), 'ms': round(ms, 2)}
+            for sql, (n, ms, params) in self.by_statement.items()
+            if n >= threshold and len(params) > 1
+        ]
+
+    def top(self, keep: int) -> list[dict]:
+        return [{'sql': _preview(sql), 'ms': round(ms, 2)} for ms, sql in sorted(self.slowest, reverse=True)[:keep]]
+
+
+def _preview(statement: str) -> str:
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= _SQL_PREVIEW else statement[:_SQL_PREVIEW] + '...'
+
+
+class _Settings:
+    slow_ms = 100.0
+    n_plus_one = 3
+    keep = 5
+
+
+_settings = _Settings()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_START)
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    endpoint = None
+    if has_request_context():
+        endpoint = request.endpoint
+        profile = g.get('_sql_profile')
+        if profile is not None:
+            profile.record(statement, parameters, elapsed_ms, _settings.keep)
+    if _settings.slow_ms and elapsed_ms >= _settings.slow_ms:
+        slow_logger.warning(json.dumps({
+            'ms': round(elapsed_ms, 2),
+            'endpoint': endpoint,
+            'sql': ' '.join(statement.split()),
+            'params': repr(parameters)[:_SQL_PREVIEW],
+        }))
+
+
+def _handle_error(exception_context) -> None:
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get(_START):
+        conn.info[_START].pop()
+
+
+def server_timing(profile: RequestProfile, total_ms: float) -> str:
+    return f'db;dur={profile.db_ms:.1f};desc="{profile.count} queries", app;dur={total_ms:.1f}'
+
+
+def init_sql_instrumentation(app: Flask) -> None:
+    if not app.config.get('SQL_INSTRUMENTATION', False):
+        return
+    _settings.slow_ms = float(app.config.get('SQL_SLOW_QUERY_MS', 100))
+    _settings.n_plus_one = int(app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 3))
+    _settings.keep = int(app.config.get('SQL_SLOWEST_PER_REQUEST', 5))
+    # Propagates to the Flask app logger's handler; make INFO lines visible
+    app.logger  # noqa: B018 - creates the "app" logger's default handler
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    slow_log = app.config.get('SQL_SLOW_QUERY_LOG')
+    if slow_log and not any(getattr(h, 'baseFilename', None) == slow_log for h in slow_logger.handlers):
+        handler = logging.FileHandler(slow_log)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_logger.addHandler(handler)
+
+    if not getattr(init_sql_instrumentation, '_listening', False):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        init_sql_instrumentation._listening = True
+
+    @app.before_request
+    def _start_sql_profile():
+        g._sql_profile = RequestProfile()
+
+    @app.after_request
+    def _report_sql_profile(response):
+        profile = g.pop('_sql_profile', None)
+        if profile is None:
+            return response
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        response.headers.add('Server-Timing', server_timing(profile, total_ms))
+        suspects = profile.n_plus_one(_settings.n_plus_one)
+        line = {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': profile.count,
+            'db_ms': round(profile.db_ms, 2),
+            'request_ms': round(total_ms, 2),
+            'slowest': profile.top(_settings.keep),
+            'n_plus_one': suspects,
+        }
+        logger.log(logging.WARNING if suspects else logging.INFO, json.dumps(line))
+        return response
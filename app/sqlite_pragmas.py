@@ -0,0 +1,218 @@
+"""Per-connection SQLite tuning: named presets, config overrides and a benchmark.
+
+``SQLITE_PRAGMA_PRESET`` picks a starting point; any of ``SQLITE_CACHE_SIZE``
+(pages, or KiB when negative), ``SQLITE_MMAP_SIZE`` (bytes),
+``SQLITE_TEMP_STORE``, ``SQLITE_WAL_AUTOCHECKPOINT`` (pages) and
+``SQLITE_SYNCHRONOUS`` overrides it. ``busy_timeout`` comes from
+``SQLITE_BUSY_TIMEOUT_MS``.
+
+``journal_mode=WAL`` is stored in the database file, so it is only set when a
+new connection finds the file in another mode. With
+``SQLITE_OPTIMIZE_ON_CLOSE`` each connection runs ``PRAGMA optimize`` as
+it is closed, which refreshes the planner statistics that changed enough to
+matter. The first connection to each database logs the values SQLite
+reports back.
+
+``flask bench-sqlite-presets`` times the catalog search and report queries
+under each preset on fresh connections.
+"""
+import logging
+import sqlite3
+import statistics
+import time
+
+from flask import Flask
+
+logger = logging.getLogger(__name__)
+
+PRESETS = {
+    # Moderate caches; the default
+    'balanced': {'cache_size': -16000, 'mmap_size': 134217728, 'temp_store': 'MEMORY',
+                 'wal_autocheckpoint': 1000, 'synchronous': 'NORMAL'},
+    # Reports and catalog browsing: big page cache, the whole file memory-mapped
+    'read-heavy': {'cache_size': -65536, 'mmap_size': 1073741824, 'temp_store': 'MEMORY',
+                   'wal_autocheckpoint': 1000, 'synchronous': 'NORMAL'},
+    # Circulation desks: fewer, larger checkpoints so commits rarely pay for one
+    'write-heavy': {'cache_size': -32000, 'mmap_size': 268435456, 'temp_store': 'MEMORY',
+                    'wal_autocheckpoint': 10000, 'synchronous': 'NORMAL'},
+    # Small hosts: SQLite's own 2 MB cache, no mmap, temp tables on disk
+    'low-memory': {'cache_size': -2000, 'mmap_size': 0, 'temp_store': 'DEFAULT',
+                   'wal_autocheckpoint': 1000, 'synchronous': 'NORMAL'},
+}
+DEFAULT_PRESET = 'balanced'
+
+# Config key -> pragma name
+_OVERRIDES = {
+    'SQLITE_CACHE_SIZE': 'cache_size',
+    'SQLITE_MMAP_SIZE': 'mmap_size',
+    'SQLITE_TEMP_STORE': 'temp_store',
+    'SQLITE_WAL_AUTOCHECKPOINT': 'wal_autocheckpoint',
+    'SQLITE_SYNCHRONOUS': 'synchronous',
+}
+_TEMP_STORE = {'0': 'DEFAULT', '1': 'FILE', '2': 'MEMORY'}
+_SYNCHRONOUS = {'0': 'OFF', '1': 'NORMAL', '2': 'FULL', '3': 'EXTRA'}
+
+
+def preset_pragmas(name: str) -> dict:
+    if name not in PRESETS:
+        raise ValueError(f"Unknown SQLITE_PRAGMA_PRESET {name!r} (use {', '.join(PRESETS)}).")
+    return dict(PRESETS[name])
+
+
+def configured_pragmas(config) -> dict:
+    """Pragmas for ``config``: the preset, then overrides, then busy_timeout."""
+    pragmas = preset_pragmas(str(config.get('SQLITE_PRAGMA_PRESET') or DEFAULT_PRESET).lower())
+    for key, pragma in _OVERRIDES.items():
+        value = config.get(key)
+        if value not in (None, ''):
+            pragmas[pragma] = str(value).upper() if pragma in ('temp_store', 'synchronous') else int(value)
+    pragmas['busy_timeout'] = int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    return pragmas
+
+
+def apply_pragmas(dbapi_connection, pragmas: dict) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        # Persistent in the file: only switch when it is not WAL already
+        mode = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+        if mode.lower() not in ('wal', 'memory'):
+            cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA foreign_keys=ON')
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def effective_pragmas(dbapi_connection) -> dict:
+    """What SQLite reports for each tuned pragma on this connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        values = {}
+        for name in ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store',
+                     'wal_autocheckpoint', 'busy_timeout', 'foreign_keys'):
+            row = cursor.execute(f'PRAGMA {name}').fetchone()
+            values[name] = row[0] if row else None
+    finally:
+        cursor.close()
+    values['temp_store'] = _TEMP_STORE.get(str(values['temp_store']), values['temp_store'])
+    values['synchronous'] = _SYNCHRONOUS.get(str(values['synchronous']), values['synchronous'])
+    return values
+
+
+def optimize(dbapi_connection) -> None:
+    try:
+        dbapi_connection.execute('PRAGMA optimize')
+    except sqlite3.Error:
+        # A read-only or already broken connection; nothing to refresh
+        pass
+
+
+def format_pragmas(values: dict) -> str:
+    return ', '.join(f'{k}={v}' for k, v in values.items())
+
+
+def init_sqlite_pragmas(app: Flask) -> None:
+    """Apply this app's pragmas to every new connection of its own SQLite engines.
+
+    Listeners go on the app's engines rather than on ``Engine``, so each app
+    (and the engines of tests, benchmarks and stress runs) keeps its own
+    preset. Call after ``db.init_app``.
+    """
+    from sqlalchemy import event
+
+    from app.extensions import db
+
+    pragmas = configured_pragmas(app.config)
+    preset = str(app.config.get('SQLITE_PRAGMA_PRESET') or DEFAULT_PRESET).lower()
+    optimize_on_close = bool(app.config.get('SQLITE_OPTIMIZE_ON_CLOSE', True))
+    logged = set()
+
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, pragmas)
+        database = dbapi_connection.execute('PRAGMA database_list').fetchone()[2] or ':memory:'
+        if database not in logged:
+            logged.add(database)
+            app.logger.info('SQLite %s (preset %s): %s', database, preset,
+                            format_pragmas(effective_pragmas(dbapi_connection)))
+
+    def optimize_sqlite(dbapi_connection, connection_record):
+        optimize(dbapi_connection)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name != 'sqlite':
+            continue
+        # Pool events on an engine follow its pool across dispose()
+        event.listen(engine, 'connect', set_sqlite_pragma)
+        if optimize_on_close:
+            event.listen(engine, 'close', optimize_sqlite)
+
+
+# ===== Benchmark =====
+def benchmark_queries(dialect) -> list[tuple[str, str]]:
+    """(label, SQL) for catalog search and report queries, with literal parameters."""
+    from datetime import date, timedelta
+
+    from sqlalchemy import func, or_
+
+    from app.extensions import db
+    from app.explain import _compile
+    from app.models import Book, Category, Loan, LoanStatus
+    from app.catalog.search import apply_search
+
+    today = date.today()
+    year_ago = today - timedelta(days=365)
+    searches = [
+        ('catalog search "history"', apply_search(db.select(Book.id), 'history')[0].limit(20)),
+        ('catalog search "man" (LIKE)',
+         db.select(Book.id).where(or_(Book.title.ilike('%man%'), Book.author.ilike('%man%'))).order_by(Book.title).limit(20)),
+        ('catalog page by category',
+         db.select(Book).join(Category).where(Category.id == 1).order_by(Book.title, Book.id).limit(20)),
+    ]
+    reports = [
+        ('most borrowed (1 year)',
+         db.select(Book.title, func.count(Loan.id).label('n')).join(Loan, Loan.book_id == Book.id)
+         .where(Loan.borrow_date.between(year_ago, today)).group_by(Book.id).order_by(db.desc('n')).limit(10)),
+        ('circulation trends by day (1 year)',
+         db.select(Loan.borrow_date, func.count(Loan.id)).where(Loan.borrow_date.between(year_ago, today))
+         .group_by(Loan.borrow_date)),
+        ('overdue summary',
+         db.select(Loan.member_id, func.count(Loan.id), func.sum(Loan.fine_amount))
+         .where(Loan.status == LoanStatus.BORROWED, Loan.due_date < today).group_by(Loan.member_id)),
+        ('books by category',
+         db.select(Category.name, func.count(Book.id)).join(Book, Book.category_id == Category.id).group_by(Category.id)),
+    ]
+    return [(label, _compile(stmt, dialect)) for label, stmt in searches + reports]
+
+
+def _time(conn, sql: str) -> float:
+    started = time.perf_counter()
+    conn.execute(sql).fetchall()
+    return (time.perf_counter() - started) * 1000
+
+
+def benchmark_presets(path: str, queries: list[tuple[str, str]], presets=None, repeat: int = 5,
+                      busy_timeout_ms: int = 5000) -> list[dict]:
+    """Per preset: first-run and median warm time (ms) per query on a fresh connection."""
+    results = []
+    for name in presets or PRESETS:
+        pragmas = dict(preset_pragmas(name), busy_timeout=busy_timeout_ms)
+        conn = sqlite3.connect(path)
+        try:
+            apply_pragmas(conn, pragmas)
+            rows = []
+            for label, sql in queries:
+                first = _time(conn, sql)
+                warm = statistics.median(_time(conn, sql) for _ in range(repeat))
+                rows.append({'label': label, 'first_ms': round(first, 2), 'warm_ms': round(warm, 2)})
+        finally:
+            conn.close()
+        results.append({
+            'preset': name,
+            'queries': rows,
+            'first_total_ms': round(sum(r['first_ms'] for r in rows), 1),
+            'warm_total_ms': round(sum(r['warm_ms'] for r in rows), 1),
+        })
+    return results
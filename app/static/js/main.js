@@ -91,10 +91,100 @@
     url.searchParams.delete('query');
     url.searchParams.delete('status');
     url.searchParams.delete('member_id');
+    url.searchParams.delete('member_search');
     url.searchParams.delete('page');
     window.location.href = url.pathname;
   };
 
+  // ===== Typeahead pickers =====
+  // Markup: .typeahead[data-typeahead-url] wrapping .typeahead-input (visible
+  // text), .typeahead-value (hidden id) and .typeahead-menu. The endpoint
+  // returns {results: [{id, label, available?}]}.
+  function initTypeahead(root) {
+    const input = root.querySelector('.typeahead-input');
+    const hidden = root.querySelector('.typeahead-value');
+    const menu = root.querySelector('.typeahead-menu');
+    const url = root.getAttribute('data-typeahead-url');
+    if (!input || !hidden || !menu || !url) return;
+    let timer = null;
+    let controller = null;
+    let active = -1;
+
+    function hide() { menu.classList.add('d-none'); menu.innerHTML = ''; active = -1; }
+    function items() { return Array.from(menu.querySelectorAll('.list-group-item')); }
+    function highlight(idx) {
+      const list = items();
+      if (!list.length) return;
+      active = (idx + list.length) % list.length;
+      list.forEach((el, i) => el.classList.toggle('active', i === active));
+    }
+    function choose(el) {
+      input.value = el.getAttribute('data-label');
+      hidden.value = el.getAttribute('data-id');
+      input.classList.remove('is-invalid');
+      hide();
+    }
+    function render(results) {
+      menu.innerHTML = '';
+      active = -1;
+      if (!results.length) {
+        const empty = document.createElement('div');
+        empty.className = 'list-group-item text-muted small typeahead-empty';
+        empty.textContent = 'No matches';
+        menu.appendChild(empty);
+      }
+      results.forEach(function (r) {
+        const btn = document.createElement('button');
+        btn.type = 'button';
+        btn.className = 'list-group-item list-group-item-action';
+        btn.setAttribute('role', 'option');
+        btn.setAttribute('data-id', r.id);
+        btn.setAttribute('data-label', r.label);
+        btn.textContent = r.label;
+        if (r.available === false) {
+          const badge = document.createElement('span');
+          badge.className = 'badge bg-secondary ms-2';
+          badge.textContent = 'Unavailable';
+          btn.appendChild(badge);
+        }
+        btn.addEventListener('mousedown', function (e) { e.preventDefault(); choose(btn); });
+        menu.appendChild(btn);
+      });
+      menu.classList.remove('d-none');
+    }
+    function search(q) {
+      if (controller) controller.abort();
+      controller = new AbortController();
+      const target = new URL(url, window.location.origin);
+      target.searchParams.set('q', q);
+      fetch(target, { credentials: 'same-origin', signal: controller.signal, headers: { Accept: 'application/json' } })
+        .then((res) => (res.ok ? res.json() : { results: [] }))
+        .then((data) => { if (input.value.trim() === q) render(data.results || []); })
+        .catch(function (e) { if (e.name !== 'AbortError') console.error(e); });
+    }
+
+    input.addEventListener('input', function () {
+      // Typing invalidates the previous pick until a new one is chosen
+      hidden.value = '';
+      if (timer) clearTimeout(timer);
+      const q = input.value.trim();
+      if (!q) { if (controller) controller.abort(); hide(); return; }
+      timer = setTimeout(function () { search(q); }, 200);
+    });
+    input.addEventListener('keydown', function (e) {
+      if (menu.classList.contains('d-none')) return;
+      if (e.key === 'ArrowDown') { e.preventDefault(); highlight(active + 1); }
+      else if (e.key === 'ArrowUp') { e.preventDefault(); highlight(active - 1); }
+      else if (e.key === 'Enter' && active >= 0) { e.preventDefault(); choose(items()[active]); }
+      else if (e.key === 'Escape') { hide(); }
+    });
+    input.addEventListener('blur', hide);
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.typeahead[data-typeahead-url]').forEach(initTypeahead);
+  });
+
   // ===== Members helpers =====
   window.confirmStatusChange = function (memberId, currentStatus, newStatus) {
     const friendly = {
@@ -0,0 +1,159 @@
+"""Serialized write transactions for circulation, with retry on lock contention.
+
+Checkout and return read availability and eligibility, then write. To keep two
+librarians from both issuing the last copy, the read and the write run in one
+transaction that holds the write lock from its first statement: ``BEGIN
+IMMEDIATE`` on SQLite, and ``SELECT ... FOR UPDATE`` on the rows involved
+everywhere else. Busy/locked errors are retried a bounded number of times
+with exponential backoff, and retries and lock waits are recorded in
+``write_metrics``.
+"""
+import random
+import threading
+import time
+
+from flask import Flask, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, DBAPIError
+
+from app.extensions import db
+
+# Execution option that makes the next transaction on a connection start with
+# BEGIN IMMEDIATE on SQLite. Ignored by other dialects.
+BEGIN_IMMEDIATE = 'sqlite_begin_immediate'
+
+# SQLSTATEs worth retrying on other databases: serialization failure, deadlock
+_RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+
+class WriteConflictError(Exception):
+    """The write lock could not be obtained within the retry budget."""
+
+
+class WriteMetrics:
+    """Process-wide counters for serialized write transactions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.transactions = 0
+            self.retries = 0
+            self.failures = 0
+            self.lock_wait_total = 0.0
+            self.lock_wait_max = 0.0
+
+    def record_lock_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.lock_wait_total += seconds
+            self.lock_wait_max = max(self.lock_wait_max, seconds)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'transactions': self.transactions,
+                'retries': self.retries,
+                'failures': self.failures,
+                'lock_wait_total_ms': round(self.lock_wait_total * 1000, 3),
+                'lock_wait_max_ms': round(self.lock_wait_max * 1000, 3),
+            }
+
+
+write_metrics = WriteMetrics()
+
+
+def is_busy_error(exc: DBAPIError) -> bool:
+    orig = getattr(exc, 'orig', None)
+    if getattr(orig, 'pgcode', None) in _RETRYABLE_SQLSTATES:
+        return True
+    message = str(orig or exc).lower()
+    return 'database is locked' in message or 'database is busy' in message or 'deadlock' in message
+
+
+def _begin_immediate(conn) -> None:
+    if conn.dialect.name == 'sqlite' and conn.get_execution_options().get(BEGIN_IMMEDIATE):
+        # Issued on the DBAPI connection: pysqlite then sees an open
+        # transaction and does not emit its own deferred BEGIN.
+        try:
+            conn.connection.driver_connection.execute('BEGIN IMMEDIATE')
+        except conn.dialect.dbapi.OperationalError as exc:
+            # Wrap like any other statement error so callers see "database is locked"
+            raise OperationalError('BEGIN IMMEDIATE', None, exc) from exc
+
+
+def _end_read_only(session) -> None:
+    """Close a transaction that wrote nothing without expiring loaded objects."""
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
+
+
+def _begin_write() -> None:
+    session = db.session()
+    if session.in_transaction():
+        if session.new or session.dirty or session.deleted:
+            raise RuntimeError('write_transaction() cannot start with unflushed changes in the session.')
+        # Only reads so far (e.g. the user loader); end that snapshot so the
+        # write transaction starts with the lock held.
+        _end_read_only(session)
+    started = time.perf_counter()
+    session.connection(execution_options={BEGIN_IMMEDIATE: True})
+    write_metrics.record_lock_wait(time.perf_counter() - started)
+
+
+def write_transaction(work, retries: int | None = None):
+    """Run ``work()`` in a serialized write transaction and commit it.
+
+    ``work`` must do all of its reads (with ``with_for_update`` where rows
+    decide what is written) and writes inside the call, since it is re-run
+    from scratch if the database reports lock contention. Returning None
+    means nothing was written (validation failed, no copy left): the
+    transaction is then closed without expiring what ``work`` loaded, so the
+    caller can re-render it. Raises ``WriteConflictError`` once
+    ``WRITE_RETRY_ATTEMPTS`` retries are used up.
+    """
+    if retries is None:
+        retries = int(current_app.config.get('WRITE_RETRY_ATTEMPTS', 3))
+    backoff = float(current_app.config.get('WRITE_RETRY_BACKOFF', 0.05))
+    attempt = 0
+    while True:
+        write_metrics.incr('transactions')
+        try:
+            _begin_write()
+            result = work()
+            if result is None:
+                _end_read_only(db.session())
+            else:
+                db.session.commit()
+            return result
+        except (OperationalError, DBAPIError) as exc:
+            db.session.rollback()
+            if not is_busy_error(exc):
+                raise
+            if attempt >= retries:
+                write_metrics.incr('failures')
+                raise WriteConflictError('The database is busy; please try again.') from exc
+            attempt += 1
+            write_metrics.incr('retries')
+            delay = backoff * (2 ** (attempt - 1)) * (1 + random.random())
+            current_app.logger.warning('Write lock contention, retry %d/%d in %.3fs', attempt, retries, delay)
+            time.sleep(delay)
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def init_write_transactions(app: Flask) -> None:
+    if not getattr(init_write_transactions, '_listening', False):
+        event.listen(Engine, 'begin', _begin_immediate)
+        init_write_transactions._listening = True
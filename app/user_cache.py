@@ -0,0 +1,177 @@
+"""Per-process cache of the signed-in user's identity for Flask-Login.
+
+``load_user`` runs on every authenticated request, including chart-data and
+other report API calls. Instead of loading a ``User`` row each time it
+returns a ``UserSnapshot``: id, names, email, role and the active flag, kept
+in a bounded LRU for ``USER_CACHE_TTL`` seconds. ``current_user`` is then the
+snapshot, so ``admin_required``/``librarian_required`` and the templates'
+role checks never touch the database.
+
+A commit that inserts, updates or deletes a user (profile edits, password
+changes, role or status changes) drops that user's entry, as does an ORM bulk
+``update``/``delete`` on ``users`` (which drops every entry). Like the
+report cache this only reaches the process that committed; other workers
+pick up the change when the TTL expires. Views that change the user load
+the row with ``db.session.get(User, current_user.id)``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Flask
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import User
+
+
+class UserSnapshot(UserMixin):
+    """Detached, read-only stand-in for ``User`` as ``current_user``."""
+
+    # Same role rules as the model; they only read ``self.role``
+    has_role = User.has_role
+    is_admin = User.is_admin
+    is_librarian = User.is_librarian
+    is_member = User.is_member
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.full_name = user.full_name
+        self.role = user.role
+        self._is_active = bool(user._is_active)
+
+    @property
+    def is_active(self) -> bool:  # type: ignore[override]
+        return self._is_active
+
+    def __repr__(self) -> str:
+        return f"<UserSnapshot {self.username}>"
+
+
+class UserCache:
+    """LRU of (expires, snapshot) keyed by (database URL, user id), with hit/miss counters."""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1024):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.reset_stats()
+
+    def configure(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def get(self, user_id: int):
+        """The user's snapshot, loading it on a miss; None if there is no such user."""
+        key = (str(db.engine.url), user_id)
+        if self.ttl > 0:
+            now = time.monotonic()
+            with self._lock:
+                hit = self._data.get(key)
+                if hit is not None and hit[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return hit[1]
+                self.misses += 1
+        else:
+            with self._lock:
+                self.misses += 1
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user)
+        if self.ttl > 0:
+            with self._lock:
+                self._data[key] = (time.monotonic() + self.ttl, snapshot)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_ids) -> int:
+        user_ids = set(user_ids)
+        with self._lock:
+            stale = [k for k in self._data if k[1] in user_ids]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += 1
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'ttl': self.ttl,
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+            }
+
+
+user_cache = UserCache()
+
+
+# ===== Write tracking =====
+_WRITTEN = 'user_cache_ids'
+_ALL = 'user_cache_all'
+
+
+def _written(session) -> set:
+    return session.info.setdefault(_WRITTEN, set())
+
+
+def _track_flush(session, flush_context) -> None:
+    for objects in (session.new, session.dirty, session.deleted):
+        for obj in objects:
+            if isinstance(obj, User) and obj.id is not None:
+                _written(session).add(obj.id)
+
+
+def _track_orm_execute(state) -> None:
+    if (state.is_update or state.is_delete) and getattr(getattr(state.statement, 'table', None), 'name', None) == 'users':
+        state.session.info[_ALL] = True
+
+
+def _invalidate_after_commit(session) -> None:
+    written = session.info.pop(_WRITTEN, None)
+    if session.info.pop(_ALL, False):
+        user_cache.clear()
+    elif written:
+        user_cache.invalidate(written)
+
+
+def _discard_after_rollback(session) -> None:
+    session.info.pop(_WRITTEN, None)
+    session.info.pop(_ALL, None)
+
+
+def init_user_cache(app: Flask) -> None:
+    user_cache.configure(
+        ttl=float(app.config.get('USER_CACHE_TTL', 60)),
+        max_entries=int(app.config.get('USER_CACHE_MAX_ENTRIES', 1024)),
+    )
+    if not getattr(init_user_cache, '_listening', False):
+        event.listen(Session, 'after_flush', _track_flush)
+        event.listen(Session, 'do_orm_execute', _track_orm_execute)
+        event.listen(Session, 'after_commit', _invalidate_after_commit)
+        event.listen(Session, 'after_rollback', _discard_after_rollback)
+        init_user_cache._listening = True
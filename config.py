@@ -22,6 +22,92 @@ class Config:
     # Fine rate per day for overdue books (in dollars)
     FINE_RATE_PER_DAY = float(os.getenv('FINE_RATE_PER_DAY', '1.0'))
 
+    # List pagination: "offset" (numbered pages) or "keyset" (cursor seek)
+    PAGINATION_MODE = os.getenv("PAGINATION_MODE", "offset").lower()
+    # In keyset mode, show totals from a short-lived cached COUNT
+    PAGINATION_KEYSET_TOTALS = os.getenv("PAGINATION_KEYSET_TOTALS", "0") == "1"
+    PAGINATION_COUNT_TTL = int(os.getenv("PAGINATION_COUNT_TTL", 60))
+
+    # Raise when a view exceeds its @query_budget (catches N+1 regressions)
+    QUERY_COUNT_ASSERT = os.getenv("QUERY_COUNT_ASSERT", "0") == "1"
+
+    # Per-request SQL timing (Server-Timing header + JSON log line on the
+    # "app.sql" logger). Statements run N+ times with different parameters are
+    # flagged as N+1; statements slower than SQL_SLOW_QUERY_MS go to the slow
+    # log ("app.sql.slow", plus SQL_SLOW_QUERY_LOG if set)
+    SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "0") == "1"
+    SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", 100))
+    SQL_SLOW_QUERY_LOG = os.getenv("SQL_SLOW_QUERY_LOG")
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 3))
+    SQL_SLOWEST_PER_REQUEST = int(os.getenv("SQL_SLOWEST_PER_REQUEST", 5))
+
+    # Largest batch accepted by the bulk checkout/return desk screens
+    BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 50))
+
+    # Checkout/return write transactions: retries with exponential backoff
+    # (seconds) when the database reports lock contention
+    WRITE_RETRY_ATTEMPTS = int(os.getenv("WRITE_RETRY_ATTEMPTS", 3))
+    WRITE_RETRY_BACKOFF = float(os.getenv("WRITE_RETRY_BACKOFF", 0.05))
+    # How long SQLite waits for a competing writer before "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+    # SQLite per-connection tuning: preset "balanced", "read-heavy",
+    # "write-heavy" or "low-memory"; the settings below override single
+    # pragmas (unset = preset value). Cache size in pages, or KiB if negative
+    SQLITE_PRAGMA_PRESET = os.getenv("SQLITE_PRAGMA_PRESET", "balanced").lower()
+    SQLITE_CACHE_SIZE = os.getenv("SQLITE_CACHE_SIZE")
+    SQLITE_MMAP_SIZE = os.getenv("SQLITE_MMAP_SIZE")
+    SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE")
+    SQLITE_WAL_AUTOCHECKPOINT = os.getenv("SQLITE_WAL_AUTOCHECKPOINT")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS")
+    # Run PRAGMA optimize as pooled connections close
+    SQLITE_OPTIMIZE_ON_CLOSE = os.getenv("SQLITE_OPTIMIZE_ON_CLOSE", "1") == "1"
+
+    # Report result cache: "memory" (per-process LRU), "sqlite" (file shared
+    # by all workers on the host) or "none". TTLs in seconds; REPORT_CACHE_TTLS
+    # overrides per report, e.g. "dashboard=60,overdue_summary=30" (0 disables)
+    REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory").lower()
+    REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 300))
+    REPORT_CACHE_TTLS = os.getenv("REPORT_CACHE_TTLS", "")
+    REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", 256))
+
+    # Background PDF rendering: "process" pool (default) or "thread" pool,
+    # jobs older than PDF_JOB_TIMEOUT seconds without a result count as failed
+    PDF_EXECUTOR = os.getenv("PDF_EXECUTOR", "process").lower()
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", 2))
+    PDF_JOB_TIMEOUT = int(os.getenv("PDF_JOB_TIMEOUT", 300))
+    PDF_CACHE_MAX_AGE_HOURS = float(os.getenv("PDF_CACHE_MAX_AGE_HOURS", 24))
+
+    # NumPy analytics snapshot: refresh at most this often (seconds)
+    ANALYTICS_REFRESH_SECONDS = int(os.getenv("ANALYTICS_REFRESH_SECONDS", 30))
+
+    # Circulation trends: most points per series; longer ranges use a coarser resolution
+    TRENDS_MAX_POINTS = int(os.getenv("TRENDS_MAX_POINTS", 400))
+
+    # Password hashing: "pbkdf2:sha256" or "scrypt"; cost is PBKDF2 iterations
+    # or scrypt N (0 = Werkzeug default). Older hashes are upgraded on login.
+    # Hashing runs on a pool of PASSWORD_HASH_WORKERS ("thread" or "process",
+    # 0 = on the request thread);
+    # a login waiting longer than PASSWORD_HASH_TIMEOUT seconds gets a 503
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256")
+    PASSWORD_HASH_COST = int(os.getenv("PASSWORD_HASH_COST", 0))
+    PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+
+    # Token-bucket rate limits on login, catalog search and chart data.
+    # RATE_LIMITS overrides per scope, e.g. "auth.login=5/minute,chart-data=0"
+    # (0 disables). Storage "memory" (per process) or "sqlite" (shared file)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory").lower()
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+    # Signed-in user identity cache (per process): seconds before a snapshot
+    # is reloaded (0 disables) and how many users to keep
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 60))
+    USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 1024))
+
     # Database
     # Build an absolute path to the instance database by default to avoid
     # sqlite3 "unable to open database file" when CWD is different.
@@ -31,9 +117,24 @@ class Config:
     _DEFAULT_DB_PATH = _INSTANCE_DIR / "library.db"
     # Use forward slashes for SQLAlchemy URI on Windows
     _DEFAULT_DB = f"sqlite:///{_DEFAULT_DB_PATH.as_posix()}"
+    REPORT_CACHE_PATH = os.getenv("REPORT_CACHE_PATH", str(_INSTANCE_DIR / "report_cache.db"))
+    PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", str(_INSTANCE_DIR / "pdf_cache"))
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", str(_INSTANCE_DIR / "rate_limits.db"))
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", _DEFAULT_DB)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Connection pools per role: the primary (writes) and the read-only bind
+    # used by reports and list pages. The read bind is the same SQLite file
+    # opened read-only, or READ_DATABASE_URL (a replica) when set
+    READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+    READ_BIND_ENABLED = os.getenv("READ_BIND_ENABLED", "1") == "1"
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    READ_DB_POOL_SIZE = int(os.getenv("READ_DB_POOL_SIZE", 10))
+    READ_DB_MAX_OVERFLOW = int(os.getenv("READ_DB_MAX_OVERFLOW", 10))
+    READ_DB_POOL_TIMEOUT = float(os.getenv("READ_DB_POOL_TIMEOUT", 10))
+
     # SQLAlchemy engine options
     SQLALCHEMY_ENGINE_OPTIONS = {
         # For SQLite in multi-threaded environments
@@ -65,6 +166,10 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     SQLALCHEMY_ECHO = False
+    QUERY_COUNT_ASSERT = True
+    # Keep seeded logins fast
+    PASSWORD_HASH_COST = 1000
+    RATE_LIMIT_ENABLED = False
 
 
 config = {
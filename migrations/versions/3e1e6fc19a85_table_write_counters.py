@@ -0,0 +1,59 @@
+"""table write counters
+
+One row per loans/books/members/categories, bumped by triggers on every
+insert, update or delete (SQLite). Stamps ETags for conditional GETs.
+
+Revision ID: 3e1e6fc19a85
+Revises: 1d62863ff714
+Create Date: 2026-10-17 04:59:34.334102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e1e6fc19a85'
+down_revision = '1d62863ff714'
+branch_labels = None
+depends_on = None
+
+VERSIONED_TABLES = ('loans', 'books', 'members', 'categories')
+OPERATIONS = (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))
+
+_BUMP = (
+    "INSERT INTO data_versions(table_name, version, changed_at) VALUES ('{table}', 1, CURRENT_TIMESTAMP) "
+    "ON CONFLICT(table_name) DO UPDATE SET version = version + 1, changed_at = CURRENT_TIMESTAMP; "
+)
+
+
+def upgrade():
+    op.create_table('data_versions',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    for table in VERSIONED_TABLES:
+        for suffix, operation in OPERATIONS:
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {operation} ON {table} "
+                f"BEGIN {_BUMP.format(table=table)}END"
+            )
+        op.execute(
+            "INSERT OR IGNORE INTO data_versions(table_name, version, changed_at) "
+            f"VALUES ('{table}', 0, CURRENT_TIMESTAMP)"
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for table in VERSIONED_TABLES:
+            for suffix, _ in OPERATIONS:
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_version_{suffix}')
+    op.drop_table('data_versions')
@@ -0,0 +1,126 @@
+"""daily circulation rollups
+
+Per-day, per-day-and-book and per-day-and-member loan counts, kept current by
+triggers on loans (SQLite) and seeded from the existing loans here.
+
+Revision ID: 57e64789ab1a
+Revises: 8895efe64c8d
+Create Date: 2026-10-17 04:39:39.588004
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '57e64789ab1a'
+down_revision = '8895efe64c8d'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = ('loans_rollup_ai', 'loans_rollup_ad', 'loans_rollup_au_return', 'loans_rollup_au_keys')
+
+# One loan (new/old row) added to, or removed from, the loan counts
+_ADD_LOAN = (
+    "INSERT INTO loan_stats_daily(day, loans, returns) VALUES ({row}.borrow_date, 1, 0) "
+    "ON CONFLICT(day) DO UPDATE SET loans = loans + 1; "
+    "INSERT INTO loan_stats_daily_book(day, book_id, loans) VALUES ({row}.borrow_date, {row}.book_id, 1) "
+    "ON CONFLICT(day, book_id) DO UPDATE SET loans = loans + 1; "
+    "INSERT INTO loan_stats_daily_member(day, member_id, loans) VALUES ({row}.borrow_date, {row}.member_id, 1) "
+    "ON CONFLICT(day, member_id) DO UPDATE SET loans = loans + 1; "
+)
+_REMOVE_LOAN = (
+    "UPDATE loan_stats_daily SET loans = loans - 1 WHERE day = {row}.borrow_date; "
+    "UPDATE loan_stats_daily_book SET loans = loans - 1 WHERE day = {row}.borrow_date AND book_id = {row}.book_id; "
+    "UPDATE loan_stats_daily_member SET loans = loans - 1 WHERE day = {row}.borrow_date AND member_id = {row}.member_id; "
+)
+# "WHERE" keeps the parser from reading ON CONFLICT as a join constraint
+_ADD_RETURN = (
+    "INSERT INTO loan_stats_daily(day, loans, returns) SELECT {row}.return_date, 0, 1 "
+    "WHERE {row}.status = 'RETURNED' AND {row}.return_date IS NOT NULL "
+    "ON CONFLICT(day) DO UPDATE SET returns = returns + 1; "
+)
+_REMOVE_RETURN = (
+    "UPDATE loan_stats_daily SET returns = returns - 1 "
+    "WHERE {row}.status = 'RETURNED' AND {row}.return_date IS NOT NULL AND day = {row}.return_date; "
+)
+
+TRIGGER_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS loans_rollup_ai AFTER INSERT ON loans BEGIN "
+    + _ADD_LOAN.format(row='new') + _ADD_RETURN.format(row='new') + "END",
+    "CREATE TRIGGER IF NOT EXISTS loans_rollup_ad AFTER DELETE ON loans BEGIN "
+    + _REMOVE_LOAN.format(row='old') + _REMOVE_RETURN.format(row='old') + "END",
+    "CREATE TRIGGER IF NOT EXISTS loans_rollup_au_return AFTER UPDATE OF status, return_date ON loans BEGIN "
+    + _REMOVE_RETURN.format(row='old') + _ADD_RETURN.format(row='new') + "END",
+    "CREATE TRIGGER IF NOT EXISTS loans_rollup_au_keys AFTER UPDATE OF borrow_date, book_id, member_id ON loans BEGIN "
+    + _REMOVE_LOAN.format(row='old') + _ADD_LOAN.format(row='new') + "END",
+]
+
+# Seed the rollups from the loans already there. Days that only saw returns
+# still need a row, hence the UNION of days.
+BACKFILL = [
+    "INSERT INTO loan_stats_daily(day, loans, returns) "
+    "SELECT days.day, COALESCE(l.loans, 0), COALESCE(r.returns, 0) FROM ("
+    "SELECT borrow_date AS day FROM loans "
+    "UNION SELECT return_date FROM loans WHERE status = 'RETURNED' AND return_date IS NOT NULL"
+    ") AS days "
+    "LEFT OUTER JOIN (SELECT borrow_date AS day, COUNT(id) AS loans FROM loans GROUP BY borrow_date) AS l "
+    "ON l.day = days.day "
+    "LEFT OUTER JOIN (SELECT return_date AS day, COUNT(id) AS returns FROM loans "
+    "WHERE status = 'RETURNED' AND return_date IS NOT NULL GROUP BY return_date) AS r "
+    "ON r.day = days.day",
+    "INSERT INTO loan_stats_daily_book(day, book_id, loans) "
+    "SELECT borrow_date, book_id, COUNT(id) FROM loans GROUP BY borrow_date, book_id",
+    "INSERT INTO loan_stats_daily_member(day, member_id, loans) "
+    "SELECT borrow_date, member_id, COUNT(id) FROM loans GROUP BY borrow_date, member_id",
+]
+
+
+def upgrade():
+    op.create_table('loan_stats_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('loans', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('returns', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table('loan_stats_daily_book',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('loans', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'book_id')
+    )
+    with op.batch_alter_table('loan_stats_daily_book', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_loan_stats_daily_book_book_id'), ['book_id'], unique=False)
+
+    op.create_table('loan_stats_daily_member',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('member_id', sa.Integer(), nullable=False),
+    sa.Column('loans', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'member_id')
+    )
+    with op.batch_alter_table('loan_stats_daily_member', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_loan_stats_daily_member_member_id'), ['member_id'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for stmt in TRIGGER_DDL:
+            op.execute(stmt)
+    for stmt in BACKFILL:
+        op.execute(stmt)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for name in TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+    with op.batch_alter_table('loan_stats_daily_member', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loan_stats_daily_member_member_id'))
+
+    op.drop_table('loan_stats_daily_member')
+    with op.batch_alter_table('loan_stats_daily_book', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_loan_stats_daily_book_book_id'))
+
+    op.drop_table('loan_stats_daily_book')
+    op.drop_table('loan_stats_daily')
@@ -0,0 +1,90 @@
+"""library stats triggers
+
+Moves library_stats maintenance on SQLite from session hooks to triggers on
+books, members and loans, so the counters change inside the statement that
+changed the data and a checkout no longer issues its own library_stats
+UPDATE. The row is recounted from the live tables once the triggers exist.
+
+Revision ID: 5c0e8a7d1b42
+Revises: 222c1ccb9472
+Create Date: 2026-10-17 06:02:41.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import date
+
+
+# revision identifiers, used by Alembic.
+revision = '5c0e8a7d1b42'
+down_revision = '222c1ccb9472'
+branch_labels = None
+depends_on = None
+
+TODAY = "date('now', 'localtime')"
+WHERE = "WHERE id = 1; "
+
+# What one loan row (new/old) contributes to each loan counter
+_ON_LOAN = "({row}.status = 'BORROWED')"
+_OVERDUE = "(({row}.status = 'BORROWED') AND {row}.due_date < " + TODAY + ")"
+_UNPAID = "MAX({row}.fine_amount - {row}.fine_paid, 0)"
+
+
+def _loan_update(change: str) -> str:
+    """``change`` is e.g. "+ {new} - {old}", filled in per counter."""
+    def term(template):
+        return change.format(new=template.format(row='new'), old=template.format(row='old'))
+
+    return (
+        f"UPDATE library_stats SET books_on_loan = books_on_loan {term(_ON_LOAN)}, "
+        f"overdue_books = CASE WHEN overdue_as_of = {TODAY} "
+        f"THEN overdue_books {term(_OVERDUE)} ELSE overdue_books END, "
+        f"unpaid_fines = ROUND(unpaid_fines {term(_UNPAID)}, 2) {WHERE}"
+    )
+
+
+TRIGGERS = {
+    'library_stats_books_ai': "AFTER INSERT ON books BEGIN "
+    "UPDATE library_stats SET total_books = total_books + 1 " + WHERE,
+    'library_stats_books_ad': "AFTER DELETE ON books BEGIN "
+    "UPDATE library_stats SET total_books = total_books - 1 " + WHERE,
+    'library_stats_members_ai': "AFTER INSERT ON members BEGIN "
+    "UPDATE library_stats SET active_members = active_members + (new.status = 'ACTIVE') " + WHERE,
+    'library_stats_members_ad': "AFTER DELETE ON members BEGIN "
+    "UPDATE library_stats SET active_members = active_members - (old.status = 'ACTIVE') " + WHERE,
+    'library_stats_members_au': "AFTER UPDATE OF status ON members BEGIN "
+    "UPDATE library_stats SET active_members = active_members + (new.status = 'ACTIVE') "
+    "- (old.status = 'ACTIVE') " + WHERE,
+    'library_stats_loans_ai': "AFTER INSERT ON loans BEGIN " + _loan_update("+ {new}"),
+    'library_stats_loans_ad': "AFTER DELETE ON loans BEGIN " + _loan_update("- {old}"),
+    'library_stats_loans_au': "AFTER UPDATE OF status, due_date, fine_amount, fine_paid ON loans BEGIN "
+    + _loan_update("+ {new} - {old}"),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    for name, body in TRIGGERS.items():
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}END")
+    # The hooks kept it exact; recount anyway so the triggers start from truth
+    op.execute(
+        sa.text(
+            "INSERT OR REPLACE INTO library_stats(id, total_books, active_members, books_on_loan, "
+            "overdue_books, overdue_as_of, unpaid_fines) SELECT 1, "
+            "(SELECT COUNT(id) FROM books), "
+            "(SELECT COUNT(id) FROM members WHERE status = 'ACTIVE'), "
+            "(SELECT COUNT(id) FROM loans WHERE status = 'BORROWED'), "
+            "(SELECT COUNT(id) FROM loans WHERE status = 'BORROWED' AND due_date < :today), "
+            ":today, "
+            "(SELECT COALESCE(SUM(fine_amount - fine_paid), 0) FROM loans WHERE fine_amount > fine_paid)"
+        ).bindparams(sa.bindparam('today', date.today(), type_=sa.Date()))
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for name in TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {name}')
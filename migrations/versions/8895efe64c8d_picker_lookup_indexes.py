@@ -0,0 +1,29 @@
+"""picker lookup indexes
+
+Expression indexes on lower(name)/lower(title) so the circulation member and
+book pickers can answer case-insensitive prefix lookups with a range scan.
+
+Revision ID: 8895efe64c8d
+Revises: 4408be722ab3
+Create Date: 2026-10-17 04:28:55.935602
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8895efe64c8d'
+down_revision = '4408be722ab3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_members_name_lower', 'members', [sa.text('lower(name)')], unique=False)
+    op.create_index('ix_books_title_lower', 'books', [sa.text('lower(title)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_books_title_lower', table_name='books')
+    op.drop_index('ix_members_name_lower', table_name='members')
@@ -0,0 +1,66 @@
+import pytest
+
+import config
+from app import create_app
+from app.extensions import db
+from app.models import Book, Member, User, UserRole
+
+LIBRARIAN_PASSWORD = 'librarian-pass-123'
+
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    app.config.update(WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """An app on a temporary SQLite file, for tests that use several connections."""
+    monkeypatch.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'library.db'}")
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def librarian_login(app, client):
+    user = User(username='librarian', email='librarian@example.invalid', full_name='Test Librarian',
+                role=UserRole.LIBRARIAN)
+    user.set_password(LIBRARIAN_PASSWORD)
+    db.session.add(user)
+    db.session.commit()
+    res = client.post('/auth/login', data={'username': 'librarian', 'password': LIBRARIAN_PASSWORD})
+    assert res.status_code == 302
+    return user.id
+
+
+@pytest.fixture
+def member(app):
+    member = Member(member_id='M-0001', name='Test Member', email='member@example.invalid')
+    db.session.add(member)
+    db.session.commit()
+    return member.id
+
+
+@pytest.fixture
+def book(app):
+    book = Book(title='Test Book', author='Test Author', quantity=2)
+    db.session.add(book)
+    db.session.commit()
+    return book.id
@@ -0,0 +1,30 @@
+import pytest
+
+from app.models import User
+from app.passwords import PasswordHasherBusy
+
+
+@pytest.fixture
+def busy_hasher(monkeypatch):
+    def busy(*args, **kwargs):
+        raise PasswordHasherBusy('all hashing slots taken')
+
+    monkeypatch.setattr('app.models.user.hash_password', busy)
+    monkeypatch.setattr('app.models.user.verify_password', busy)
+
+
+def test_register_when_hasher_busy(client, busy_hasher):
+    res = client.post('/auth/register', data={
+        'username': 'newreader', 'email': 'newreader@example.com', 'full_name': 'New Reader',
+        'password': 'reader-pass-123', 'password2': 'reader-pass-123',
+    })
+    assert res.status_code == 503
+    assert User.query.filter_by(username='newreader').count() == 0
+
+
+def test_change_password_when_hasher_busy(client, librarian_login, busy_hasher):
+    res = client.post('/auth/change-password', data={
+        'current_password': 'librarian-pass-123', 'new_password': 'another-pass-456',
+        'new_password2': 'another-pass-456',
+    })
+    assert res.status_code == 503
@@ -0,0 +1,39 @@
+from app.circulation.services import CHECKOUT_STATEMENTS
+from app.circulation.stress import run_checkout_stress
+from app.extensions import db
+from app.library_stats import get_library_stats
+from app.models import Book, Loan, LoanStatus
+from app.query_counter import count_queries
+from app.transactions import write_metrics
+
+
+def _borrow(client, member, book):
+    return client.post('/circulation/borrow', data={'member_id': member, 'book_id': book})
+
+
+def test_checkout_is_three_statements(client, librarian_login, member, book):
+    with count_queries() as counter:
+        res = _borrow(client, member, book)
+    assert res.status_code == 302
+    # Flask-Login's user lookup is outside the checkout (and cached when warm)
+    checkout = [s for s in counter.statements if 'FROM users' not in s]
+    assert len(checkout) == CHECKOUT_STATEMENTS == 3, checkout
+
+
+def test_checkout_updates_counters(client, librarian_login, member, book):
+    before = get_library_stats()
+    assert _borrow(client, member, book).status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Book, book).active_loan_count == 1
+    assert Loan.query.filter_by(book_id=book, status=LoanStatus.BORROWED).count() == 1
+    assert get_library_stats()['books_on_loan'] == before['books_on_loan'] + 1
+
+
+def test_concurrent_checkouts_never_over_issue(file_app):
+    results = run_checkout_stress(file_app, threads=8, copies=2, rounds=3)
+    for res in results:
+        assert not res['errors'], res
+        assert res['issued'] <= 2, res
+        assert res['checkout_statements'] <= CHECKOUT_STATEMENTS, res
+        assert res['passed'], res
+    assert write_metrics.snapshot()['failures'] == 0